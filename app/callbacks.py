@@ -0,0 +1,204 @@
+# app/callbacks.py
+"""
+Compact, versioned inline-keyboard payloads.
+
+Every payload is an aiogram CallbackData whose prefix carries the codec
+version (`t1`, `d1`, ...). Fields are base-encoded and validated on unpack,
+so the dispatch table decodes a payload once and handlers receive a typed
+object instead of re-parsing `split(":")` strings.
+
+    book:time:1767241800                            -> t1:3itjf6
+    my:cancel:84db3cdc-62c4-407e-a951-415bfc416e81  -> mx1:hNs83GLEQH6pUUFb_EFugQ
+"""
+import base64
+import binascii
+import string
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from aiogram.filters.callback_data import CallbackData
+from pydantic import field_validator
+
+from app.config import UZ_TZ
+
+CODEC_VERSION = 1
+
+# Time slots are addressed in 5-minute quanta from local midnight
+SLOT_QUANTUM_MIN = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_QUANTUM_MIN
+
+_B36 = string.digits + string.ascii_lowercase
+
+def b36encode(n: int) -> str:
+    if n < 0:
+        raise ValueError("negative value")
+    out = []
+    while True:
+        n, r = divmod(n, 36)
+        out.append(_B36[r])
+        if not n:
+            return "".join(reversed(out))
+
+def b36decode(s: str) -> int:
+    if not s or any(ch not in _B36 for ch in s):
+        raise ValueError(f"bad base36 value {s!r}")
+    return int(s, 36)
+
+# ---- ids ----
+# UUIDs shrink from 36 to 22 chars; anything else is kept verbatim behind '~'
+def pack_id(raw: str) -> str:
+    try:
+        return base64.urlsafe_b64encode(uuid.UUID(str(raw)).bytes).rstrip(b"=").decode()
+    except ValueError:
+        return "~" + str(raw)
+
+def unpack_id(ref: str) -> str:
+    if ref.startswith("~"):
+        return ref[1:]
+    try:
+        raw = base64.urlsafe_b64decode(ref + "=" * (-len(ref) % 4))
+        return str(uuid.UUID(bytes=raw))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"bad id ref {ref!r}") from e
+
+def _check_ref(v: str) -> str:
+    unpack_id(v)
+    return v
+
+# ---- dates / slots ----
+def pack_day(d: date) -> str:
+    return b36encode(d.toordinal())
+
+def unpack_day(s: str) -> date:
+    try:
+        return date.fromordinal(b36decode(s))
+    except OverflowError as e:
+        raise ValueError(f"bad day {s!r}") from e
+
+def pack_slot(start: datetime) -> str:
+    local = start.astimezone(UZ_TZ)
+    minutes = local.hour * 60 + local.minute
+    if minutes % SLOT_QUANTUM_MIN or local.second or local.microsecond:
+        raise ValueError(f"{start} is not on a {SLOT_QUANTUM_MIN}-minute boundary")
+    return b36encode(local.date().toordinal() * SLOTS_PER_DAY + minutes // SLOT_QUANTUM_MIN)
+
+def unpack_slot(s: str) -> datetime:
+    day_ord, idx = divmod(b36decode(s), SLOTS_PER_DAY)
+    try:
+        day = date.fromordinal(day_ord)
+    except (OverflowError, ValueError) as e:
+        raise ValueError(f"bad slot {s!r}") from e
+    return datetime.combine(day, time(0, 0), UZ_TZ) + timedelta(minutes=idx * SLOT_QUANTUM_MIN)
+
+# ---- payloads ----
+class ServiceCB(CallbackData, prefix=f"s{CODEC_VERSION}"):
+    ref: str
+
+    _check = field_validator("ref")(_check_ref)
+
+    @classmethod
+    def of(cls, service_id: str) -> "ServiceCB":
+        return cls(ref=pack_id(service_id))
+
+    @property
+    def service_id(self) -> str:
+        return unpack_id(self.ref)
+
+class EarliestCB(ServiceCB, prefix=f"e{CODEC_VERSION}"):
+    """Earliest free starts for a service across the booking horizon."""
+
+class DayCB(CallbackData, prefix=f"d{CODEC_VERSION}"):
+    d: str
+
+    @field_validator("d")
+    @classmethod
+    def _check_day(cls, v: str) -> str:
+        unpack_day(v)
+        return v
+
+    @classmethod
+    def of(cls, day: date) -> "DayCB":
+        return cls(d=pack_day(day))
+
+    @property
+    def day(self) -> date:
+        return unpack_day(self.d)
+
+class AdminDayCB(DayCB, prefix=f"a{CODEC_VERSION}"):
+    pass
+
+class TimeCB(CallbackData, prefix=f"t{CODEC_VERSION}"):
+    slot: str
+
+    @field_validator("slot")
+    @classmethod
+    def _check_slot(cls, v: str) -> str:
+        unpack_slot(v)
+        return v
+
+    @classmethod
+    def of(cls, start: datetime) -> "TimeCB":
+        return cls(slot=pack_slot(start))
+
+    @property
+    def start(self) -> datetime:
+        return unpack_slot(self.slot)
+
+class CancelCB(CallbackData, prefix=f"bx{CODEC_VERSION}"):
+    """Cancel from the booking flow's active-booking gate."""
+    ref: str
+
+    _check = field_validator("ref")(_check_ref)
+
+    @classmethod
+    def of(cls, booking_id: str) -> "CancelCB":
+        return cls(ref=pack_id(booking_id))
+
+    @property
+    def booking_id(self) -> str:
+        return unpack_id(self.ref)
+
+class MyCancelCB(CancelCB, prefix=f"mx{CODEC_VERSION}"):
+    """Cancel from the "my appointments" list."""
+
+class WaitJoinCB(CallbackData, prefix=f"wj{CODEC_VERSION}"):
+    """Join the waitlist for a service on a full day."""
+    d: str
+    ref: str
+
+    _check = field_validator("ref")(_check_ref)
+
+    @field_validator("d")
+    @classmethod
+    def _check_day(cls, v: str) -> str:
+        unpack_day(v)
+        return v
+
+    @classmethod
+    def of(cls, day: date, service_id: str) -> "WaitJoinCB":
+        return cls(d=pack_day(day), ref=pack_id(service_id))
+
+    @property
+    def day(self) -> date:
+        return unpack_day(self.d)
+
+    @property
+    def service_id(self) -> str:
+        return unpack_id(self.ref)
+
+class HoldAcceptCB(CallbackData, prefix=f"wa{CODEC_VERSION}"):
+    """Take the slot held for a waitlisted user."""
+    ref: str
+
+    _check = field_validator("ref")(_check_ref)
+
+    @classmethod
+    def of(cls, booking_id: str) -> "HoldAcceptCB":
+        return cls(ref=pack_id(booking_id))
+
+    @property
+    def booking_id(self) -> str:
+        return unpack_id(self.ref)
+
+class HoldDeclineCB(HoldAcceptCB, prefix=f"wd{CODEC_VERSION}"):
+    """Give the held slot to the next user in line."""
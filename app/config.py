@@ -1,20 +1,99 @@
 import os
+import threading
+from typing import TYPE_CHECKING, Optional
 from dotenv import load_dotenv
-from supabase import create_client, Client
 from zoneinfo import ZoneInfo
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 AWARD_CSV = os.getenv("AWARD_CSV", "award_holders.csv")
+# Several rosters side by side ("round1=award_holders.csv,round2=round2.csv"); empty = AWARD_CSV only.
+# Changed files are re-read every ROSTER_WATCH_INTERVAL seconds (0 disables; /roster reload still works)
+AWARD_ROSTERS = os.getenv("AWARD_ROSTERS", "")
+ROSTER_WATCH_INTERVAL = float(os.getenv("ROSTER_WATCH_INTERVAL", "10"))
+# In-memory set of registered names (app/whitelist.py RegisteredNames), reloaded after this many seconds
+REGISTERED_NAMES_TTL = float(os.getenv("REGISTERED_NAMES_TTL", "300"))
+# Working hours, capacity, holidays and closures (app/schedule.py); built-in defaults if the file is missing
+SCHEDULE_RULES = os.getenv("SCHEDULE_RULES", "schedule.json")
+SCHEDULE_WATCH_INTERVAL = float(os.getenv("SCHEDULE_WATCH_INTERVAL", "10"))
 SUPPORT_CONTACT = os.getenv("SUPPORT_CONTACT", "Iltimos, har qanday muammolarni, jumladan texnik muammolarni, guruhga yozing: EYUF 2025 1-TANLOV")
 UZ_TZ = ZoneInfo("Asia/Tashkent")
 
+# Outbound Telegram rate limits (Bot API: ~30 msg/s overall, ~1 msg/s per chat)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "3"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+# Last screen rendered per (chat, message) (app/screen_cache.py); identical edits are not sent. Size 0 disables
+SCREEN_CACHE_SIZE = int(os.getenv("SCREEN_CACHE_SIZE", "20000"))
+SCREEN_CACHE_TTL = float(os.getenv("SCREEN_CACHE_TTL", "3600"))
+
+# Storage backend: "supabase" (production) or "sqlite" (embedded, for offline runs and benchmarks)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "eyufbot.sqlite3")
+
+# Local read replica of the Supabase tables (reads served from SQLite while fresh enough)
+DB_REPLICA = os.getenv("DB_REPLICA", "0") == "1"
+REPLICA_PATH = os.getenv("REPLICA_PATH", "replica.sqlite3")
+REPLICA_MAX_STALENESS = float(os.getenv("REPLICA_MAX_STALENESS", "30"))
+REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "5"))
+# each sync re-pulls this many seconds behind the watermark: rows commit out of updated_at order
+REPLICA_SAFETY_LAG = float(os.getenv("REPLICA_SAFETY_LAG", "60"))
+
+# Named thread pools for blocking work (app/executors.py); a task queued longer than the threshold is logged
+EXECUTOR_DB_READ_WORKERS = int(os.getenv("EXECUTOR_DB_READ_WORKERS", "16"))
+EXECUTOR_DB_WRITE_WORKERS = int(os.getenv("EXECUTOR_DB_WRITE_WORKERS", "4"))
+EXECUTOR_CPU_WORKERS = int(os.getenv("EXECUTOR_CPU_WORKERS", "2"))
+EXECUTOR_SLOW_WAIT = float(os.getenv("EXECUTOR_SLOW_WAIT", "0.5"))
+
+# Prometheus /metrics endpoint (local only by default; port 0 disables it)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Data-layer tracing: calls slower than SLOW_QUERY_MS go to the slow-query log ("" = main log only)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.log")
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "1000"))
+
+# Waitlist: minutes a freed slot is held for the next user in line, and how often expired holds are swept
+WAITLIST_HOLD_MIN = int(os.getenv("WAITLIST_HOLD_MIN", "15"))
+WAITLIST_SWEEP_INTERVAL = float(os.getenv("WAITLIST_SWEEP_INTERVAL", "60"))
+
+# Circuit breaker around the primary: per-call deadline, failures before opening, seconds before a probe
+DB_BREAKER = os.getenv("DB_BREAKER", "1") == "1"
+DB_CALL_TIMEOUT = float(os.getenv("DB_CALL_TIMEOUT", "5"))
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+DB_BREAKER_RESET = float(os.getenv("DB_BREAKER_RESET", "15"))
+CANCEL_JOURNAL_PATH = os.getenv("CANCEL_JOURNAL_PATH", "cancel_journal.jsonl")
+
 if not BOT_TOKEN:
     raise SystemExit("Missing BOT_TOKEN in .env")
-if not SUPABASE_URL or not SUPABASE_KEY:
+if DB_BACKEND == "supabase" and (not SUPABASE_URL or not SUPABASE_KEY):
     raise SystemExit("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY in .env")
 
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
\ No newline at end of file
+# The Supabase SDK (httpx, realtime, websockets, ...) is a large import; build the client on first use
+_sb: Optional["Client"] = None
+_sb_lock = threading.Lock()
+
+def get_supabase() -> Optional["Client"]:
+    global _sb
+    if _sb is None and DB_BACKEND == "supabase":
+        with _sb_lock:
+            if _sb is None:
+                from supabase import create_client, ClientOptions
+                # the HTTP timeout frees the worker thread soon after the breaker's deadline gives up on it
+                _sb = create_client(SUPABASE_URL, SUPABASE_KEY,
+                                    options=ClientOptions(postgrest_client_timeout=DB_CALL_TIMEOUT * 2))
+    return _sb
+
+def __getattr__(name: str):
+    # keeps `from app.config import sb` working without creating the client at import time
+    if name == "sb":
+        return get_supabase()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
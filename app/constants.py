@@ -7,4 +7,12 @@ BTN_SPECIAL_SERVICE = "🌐 Moliyaviy kafolat xatini masofadan turib olish"
 
 BTN_ALL_APPTS = "📊 Barcha navbatlar"
 BTN_ALL_STUDENTS = "👥 Barcha talabalar"
-BTN_NOTIFY_ALL = "📣 Hammaga xabar berish"
\ No newline at end of file
+BTN_NOTIFY_ALL = "📣 Hammaga xabar berish"
+
+# sent after a booking is confirmed (Markdown)
+ARRIVAL_NOTE = (
+    "📍 Manzil: https://maps.app.goo.gl/phhE5byYBabpnfx97\n"
+    "⏰ Iltimos, *30 daqiqa oldin* keling.\n"
+    "🏢 Xona: *302*.\n\n"
+    "⚠️ Belgilangan vaqtda kelmasangiz, bu keyingi navbatlaringiz va KPI ko‘rsatkichingizga salbiy ta’sir qiladi."
+)
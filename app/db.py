@@ -1,61 +1,109 @@
-from datetime import datetime
-from typing import Dict, List, Optional
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
 
-from app.config import sb
+from app.config import REGISTERED_NAMES_TTL, UZ_TZ
+from app.repository import Repository, UniqueViolation, get_repository
+from app.whitelist import RegisteredNames
+
+# Sync entry points used by the handlers (always called via run_in_executor).
+# The actual queries live in app/repository; DB_BACKEND picks the backend.
+
+_names: Optional[Tuple[Repository, RegisteredNames]] = None
+_names_lock = threading.Lock()
+
+def registered_names() -> RegisteredNames:
+    """Name index for the current repository (rebuilt if set_repository swapped it)."""
+    global _names
+    repo = get_repository()
+    if _names is None or _names[0] is not repo:
+        with _names_lock:
+            if _names is None or _names[0] is not repo:
+                _names = (repo, RegisteredNames(repo.fetch_registered_names, REGISTERED_NAMES_TTL))
+    return _names[1]
 
 # --- Users ---
 def is_registered_sync(telegram_user_id: int) -> bool:
-    res = sb.table("app_user").select("id").eq("telegram_user_id", telegram_user_id).limit(1).execute()
-    return bool(res.data)
+    return get_repository().is_registered(telegram_user_id)
 
 def is_name_taken_sync(canonical_full_name: str) -> bool:
-    res = sb.table("app_user").select("id").ilike("full_name", canonical_full_name).limit(1).execute()
-    return bool(res.data)
+    return canonical_full_name in registered_names()
 
 def register_user_sync(telegram_user_id: int, full_name: str, phone: str, email: str, country: str, university: str) -> Dict:
-    res = sb.table("app_user").insert({
-        "telegram_user_id": telegram_user_id,
-        "full_name": full_name.strip(),
-        "phone": phone,
-        "email": email.lower(),
-        "country": country.strip(),
-        "university": university.strip(),
-    }).execute()
-    if not res.data:
-        raise RuntimeError("Insert returned no data")
-    return res.data[0]
+    """Raises UniqueViolation ("telegram_user_id" or "full_name_key") instead of pre-checking."""
+    names = registered_names()
+    try:
+        row = get_repository().register_user(telegram_user_id, full_name, phone, email, country, university)
+    except UniqueViolation as e:
+        if e.field == "full_name_key":
+            names.add(full_name)
+        raise
+    names.add(full_name)
+    return row
 
 def get_user_record_sync(telegram_user_id: int) -> Optional[Dict]:
-    res = sb.table("app_user").select("*").eq("telegram_user_id", telegram_user_id).single().execute()
-    return res.data if res else None
+    return get_repository().get_user_record(telegram_user_id)
+
+def fetch_user_names_sync(user_ids: List[str]) -> Dict[str, str]:
+    return get_repository().fetch_user_names(user_ids)
+
+def fetch_all_users_sync() -> List[Dict]:
+    return get_repository().fetch_all_users()
+
+def fetch_user_telegram_ids_sync() -> List[int]:
+    return get_repository().fetch_user_telegram_ids()
 
 # --- Services ---
 def fetch_services_sync() -> List[Dict]:
-    return (sb.table("service").select("id,name,duration_min").order("name").execute().data) or []
+    return get_repository().fetch_services()
 
 def get_service_sync(svc_id: str) -> Optional[Dict]:
-    try:
-        return sb.table("service").select("id,name,duration_min").eq("id", svc_id).single().execute().data
-    except Exception:
-        return None
+    return get_repository().get_service(svc_id)
+
+def fetch_service_names_sync(svc_ids: List[str]) -> Dict[str, str]:
+    return get_repository().fetch_service_names(svc_ids)
 
 # --- Bookings ---
 def fetch_bookings_for_day_sync(day_start: datetime, day_end: datetime) -> List[Dict]:
-    return (sb.table("booking")
-              .select("id,user_id,service_id,start_at,end_at")
-              .lt("start_at", day_end.isoformat())
-              .gt("end_at", day_start.isoformat())
-              .execute()
-              .data) or []
-
-def create_booking_sync(user_id: str, service_id: str, start_at: datetime, end_at: datetime) -> Dict:
-    res = sb.table("booking").insert({
-        "user_id": user_id,
-        "service_id": service_id,
-        "start_at": start_at.isoformat(),
-        "end_at": end_at.isoformat(),
-        "status": "booked",
-    }).execute()
-    if not res.data:
-        raise RuntimeError("Booking insert returned no data")
-    return res.data[0]
\ No newline at end of file
+    return get_repository().fetch_bookings_overlapping(day_start, day_end)
+
+def fetch_bookings_starting_between_sync(start: datetime, end: datetime) -> List[Dict]:
+    return get_repository().fetch_bookings_starting_between(start, end)
+
+def fetch_user_bookings_sync(user_id: str) -> List[Dict]:
+    return get_repository().fetch_user_bookings(user_id)
+
+def get_user_booking_sync(booking_id: str, user_id: str) -> Optional[Dict]:
+    return get_repository().get_user_booking(booking_id, user_id)
+
+def get_active_booking_sync(user_id: str) -> Optional[Dict]:
+    return get_repository().get_active_booking(user_id, datetime.now(UZ_TZ))
+
+def has_service_booking_between_sync(user_id: str, service_id: str, start: datetime, end: datetime) -> bool:
+    return get_repository().has_service_booking_between(user_id, service_id, start, end)
+
+def create_booking_sync(user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                        status: str = "booked", resource_id: Optional[str] = None) -> Dict:
+    return get_repository().create_booking(user_id, service_id, start_at, end_at, status, resource_id)
+
+def set_booking_status_sync(booking_id: str, from_status: str, to_status: str) -> Optional[Dict]:
+    return get_repository().set_booking_status(booking_id, from_status, to_status)
+
+def cancel_booking_sync(booking_id: str, user_id: str, ends_after: Optional[datetime] = None) -> Optional[Dict]:
+    return get_repository().cancel_booking(booking_id, user_id, ends_after)
+
+# --- Waitlist ---
+def join_waitlist_sync(user_id: str, telegram_user_id: int, service_id: str, day: date) -> Dict:
+    return get_repository().join_waitlist(user_id, telegram_user_id, service_id, day)
+
+def fetch_waitlist_sync(day: Optional[date] = None) -> List[Dict]:
+    return get_repository().fetch_waitlist(day)
+
+def update_waitlist_sync(entry_id: str, from_status: str, changes: Dict) -> Optional[Dict]:
+    return get_repository().update_waitlist(entry_id, from_status, changes)
+
+def get_waitlist_offer_sync(booking_id: str) -> Optional[Dict]:
+    return get_repository().get_waitlist_offer(booking_id)
+
+def fetch_expired_offers_sync() -> List[Dict]:
+    return get_repository().fetch_expired_offers(datetime.now(UZ_TZ))
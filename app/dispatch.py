@@ -0,0 +1,167 @@
+# app/dispatch.py
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Message
+
+logger = logging.getLogger(__name__)
+
+Route = Tuple[CallableObject, Optional[Type[CallbackData]]]
+
+class DispatchTable:
+    """
+    Hash-map router for stateless entry points.
+
+    Exact reply-button texts and callback-data keys are looked up in dicts,
+    so an update costs one lookup instead of walking every `F.text == ...` /
+    `F.data.startswith(...)` filter of every router. Registering the same
+    text or key twice raises at import time instead of silently shadowing.
+
+    Callback keys are matched on ':'-separated segments: `"book:svc"` handles
+    `book:svc:<anything>`, while `exact=True` only handles the literal data.
+    Passing a CallbackData class keys the route on its prefix; the payload is
+    unpacked once here and handed to the handler as `callback_data`.
+
+    The table router is included first, so its routes would also win over
+    FSM handlers waiting for typed input (registration answers, the
+    broadcast text). States passed to `defer_to` keep their input: text
+    routes do not match while the user is in one, unless registered with
+    `any_state=True`. The picking_* states have no message handlers, so
+    menu buttons simply keep working there. BookingFlow.uploading_zip does
+    catch every message ("send a ZIP only") but is deliberately not
+    deferred to: a menu button typed there runs the button, as BTN_BOOK and
+    BTN_SPECIAL_SERVICE already did before this table, and nothing else
+    (/menu included) leaves that state. Callbacks are not affected; no
+    state handler consumes callback queries.
+    """
+
+    MAX_DEPTH = 3
+
+    def __init__(self, name: str = "dispatch-table"):
+        self.router = Router(name=name)
+        self._texts: Dict[str, Route] = {}
+        self._cb_exact: Dict[str, Route] = {}
+        self._cb_prefix: Dict[str, Route] = {}
+        self._input_states: Set[str] = set()
+        self._any_state: Set[str] = set()
+        self._bad_payload = CallableObject(self._on_bad_payload)
+        self.router.message.register(self._on_message, self._match_message)
+        self.router.callback_query.register(self._on_callback, self._match_callback)
+
+    # ---- registration ----
+    @staticmethod
+    def _claim(index: Dict[str, Route], key: str, fn: Callable, kind: str,
+               codec: Optional[Type[CallbackData]] = None) -> None:
+        existing = index.get(key)
+        if existing is not None:
+            raise RuntimeError(
+                f"Duplicate {kind} route {key!r}: "
+                f"{existing[0].callback.__module__}.{existing[0].callback.__qualname__} and "
+                f"{fn.__module__}.{fn.__qualname__}"
+            )
+        index[key] = (CallableObject(fn), codec)
+
+    def text(self, *texts: str, any_state: bool = False):
+        def decorator(fn):
+            for t in texts:
+                self._claim(self._texts, t, fn, "text")
+                if any_state:
+                    self._any_state.add(t)
+            return fn
+        return decorator
+
+    def defer_to(self, *states: Union[State, Type[StatesGroup]]) -> None:
+        """States whose message handlers read free text; button texts typed there are their input."""
+        for st in states:
+            if isinstance(st, State):
+                self._input_states.add(st.state)
+            else:
+                self._input_states.update(st.__all_states_names__)
+
+    def callback(self, key: Union[str, Type[CallbackData]], exact: bool = False):
+        codec = None
+        if isinstance(key, type) and issubclass(key, CallbackData):
+            codec, key = key, key.__prefix__
+        key = key.rstrip(":")
+        if not exact and key.count(":") >= self.MAX_DEPTH:
+            raise ValueError(f"Callback prefix {key!r} is deeper than {self.MAX_DEPTH} segments")
+
+        def decorator(fn):
+            if exact:
+                self._claim(self._cb_exact, key, fn, "callback", codec)
+            else:
+                self._claim(self._cb_prefix, key, fn, "callback prefix", codec)
+            return fn
+        return decorator
+
+    def retire(self, *keys: str) -> None:
+        """Answer payloads from a retired callback format (old keyboards still on screen) with a hint."""
+        for key in keys:
+            self.callback(key)(self._on_bad_payload)
+
+    def routes(self) -> List[Tuple[str, str, str]]:
+        out = []
+        for kind, index in (("text", self._texts), ("callback", self._cb_exact), ("prefix", self._cb_prefix)):
+            for key, (obj, _) in index.items():
+                out.append((kind, key, f"{obj.callback.__module__}.{obj.callback.__qualname__}"))
+        return out
+
+    # ---- lookup ----
+    def resolve_text(self, text: Optional[str]) -> Optional[Route]:
+        if text is None:
+            return None
+        return self._texts.get(text)
+
+    def resolve_callback(self, data: Optional[str]) -> Optional[Route]:
+        if data is None:
+            return None
+        route = self._cb_exact.get(data)
+        if route is not None:
+            return route
+        parts = data.split(":", self.MAX_DEPTH)
+        # longest prefix first, bounded by MAX_DEPTH lookups
+        for depth in range(min(len(parts) - 1, self.MAX_DEPTH), 0, -1):
+            route = self._cb_prefix.get(":".join(parts[:depth]))
+            if route is not None:
+                return route
+        return None
+
+    def _match_message(self, m: Message, raw_state: Optional[str] = None):
+        route = self.resolve_text(m.text)
+        if route is None:
+            return False
+        if raw_state in self._input_states and m.text not in self._any_state:
+            return False
+        return {"dispatch_route": route[0]}
+
+    def _match_callback(self, cq: CallbackQuery):
+        route = self.resolve_callback(cq.data)
+        if route is None:
+            return False
+        handler, codec = route
+        if codec is None:
+            return {"dispatch_route": handler}
+        try:
+            return {"dispatch_route": handler, "callback_data": codec.unpack(cq.data)}
+        except (TypeError, ValueError) as e:
+            logger.warning("Bad %s payload %r: %s", codec.__name__, cq.data, e)
+            return {"dispatch_route": self._bad_payload}
+
+    @staticmethod
+    async def _on_bad_payload(cq: CallbackQuery) -> None:
+        await cq.answer("Tugma eskirgan yoki noto‘g‘ri. Iltimos, menyudan qaytadan boshlang.", show_alert=True)
+
+    @staticmethod
+    async def _on_message(m: Message, dispatch_route: CallableObject, **kwargs: Any) -> Any:
+        return await dispatch_route.call(m, **kwargs)
+
+    @staticmethod
+    async def _on_callback(cq: CallbackQuery, dispatch_route: CallableObject, **kwargs: Any) -> Any:
+        return await dispatch_route.call(cq, **kwargs)
+
+# Shared table; bot.py includes `table.router` ahead of the per-module routers
+table = DispatchTable()
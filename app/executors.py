@@ -0,0 +1,103 @@
+# app/executors.py
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Pool names. Reads and writes are split so a burst of slow day-occupancy
+# reads cannot hold up bookings and cancellations; "cpu" takes fuzzy
+# matching, phone parsing and file loading off the event loop.
+DB_READ = "db-read"
+DB_WRITE = "db-write"
+CPU = "cpu"
+
+EXEC_QUEUED = REGISTRY.gauge("executor_queued_tasks", "Tasks submitted but not yet started")
+EXEC_ACTIVE = REGISTRY.gauge("executor_active_workers", "Workers currently running a task")
+EXEC_WAIT = REGISTRY.histogram("executor_wait_seconds", "Time a task spent queued before a worker picked it up")
+EXEC_RUN = REGISTRY.histogram("executor_run_seconds", "Time a task spent running")
+EXEC_SLOW = REGISTRY.counter("executor_slow_waits_total", "Tasks that waited longer than the slow-wait threshold")
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """
+    Bounded thread pool that carries the caller's contextvars into the worker
+    (run_in_executor does not) and reports queue depth, busy workers and
+    per-task wait/run times under its name.
+    """
+
+    def __init__(self, name: str, max_workers: int, slow_wait: float = 0.5):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.slow_wait = slow_wait
+
+    def submit(self, fn, /, *args, **kwargs):
+        ctx = contextvars.copy_context()
+        queued_at = time.perf_counter()
+        EXEC_QUEUED.inc(pool=self.name)
+
+        def run():
+            started = time.perf_counter()
+            waited = started - queued_at
+            EXEC_QUEUED.dec(pool=self.name)
+            EXEC_ACTIVE.inc(pool=self.name)
+            EXEC_WAIT.observe(waited, pool=self.name)
+            if waited > self.slow_wait:
+                EXEC_SLOW.inc(pool=self.name)
+                logger.warning("Executor %s: %s waited %.0f ms for a worker (queued=%d)",
+                               self.name, getattr(fn, "__name__", fn), waited * 1000,
+                               EXEC_QUEUED.value(pool=self.name))
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                EXEC_ACTIVE.dec(pool=self.name)
+                EXEC_RUN.observe(time.perf_counter() - started, pool=self.name)
+
+        return super().submit(run)
+
+_executors: Dict[str, InstrumentedExecutor] = {}
+_sizes: Dict[str, int] = {}
+_lock = threading.Lock()
+
+def _default_sizes() -> Dict[str, int]:
+    from app.config import EXECUTOR_DB_READ_WORKERS, EXECUTOR_DB_WRITE_WORKERS, EXECUTOR_CPU_WORKERS
+    return {DB_READ: EXECUTOR_DB_READ_WORKERS, DB_WRITE: EXECUTOR_DB_WRITE_WORKERS, CPU: EXECUTOR_CPU_WORKERS}
+
+def get_executor(name: str) -> InstrumentedExecutor:
+    ex = _executors.get(name)
+    if ex is None:
+        with _lock:
+            ex = _executors.get(name)
+            if ex is None:
+                from app.config import EXECUTOR_SLOW_WAIT
+                sizes = {**_default_sizes(), **_sizes}
+                if name not in sizes:
+                    raise KeyError(f"Unknown executor {name!r}")
+                ex = _executors[name] = InstrumentedExecutor(name, sizes[name], EXECUTOR_SLOW_WAIT)
+    return ex
+
+def configure(**sizes: int) -> None:
+    """Resize pools (keyword names use underscores: db_read=32). Existing pools finish their work and are replaced."""
+    with _lock:
+        for key, workers in sizes.items():
+            name = key.replace("_", "-")
+            _sizes[name] = workers
+            old = _executors.pop(name, None)
+            if old is not None:
+                old.shutdown(wait=False)
+
+def shutdown() -> None:
+    with _lock:
+        for ex in _executors.values():
+            ex.shutdown(wait=False)
+        _executors.clear()
+
+async def run_in(pool: str, fn: Callable, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_executor(pool), fn, *args)
+
+__all__ = ["DB_READ", "DB_WRITE", "CPU", "InstrumentedExecutor", "get_executor", "configure", "shutdown", "run_in"]
@@ -1,18 +1,31 @@
 # app/handlers/admin.py
-import asyncio
+import html
 import logging
 from datetime import datetime, date, time, timedelta
 from typing import Dict, List
 
-from aiogram import F, Router
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
+from aiogram.filters import Command, CommandObject
 from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
-from app.config import UZ_TZ, sb
+from app.config import UZ_TZ
+from app.db import (
+    fetch_bookings_starting_between_sync, fetch_service_names_sync,
+    fetch_user_names_sync, fetch_all_users_sync, fetch_user_telegram_ids_sync
+)
 from app.keyboards import admin_days_kb, admin_main_menu
 from app.constants import BTN_ALL_APPTS, BTN_ALL_STUDENTS, BTN_NOTIFY_ALL
+from app.dispatch import table
+from app.callbacks import AdminDayCB
+from app.ratelimit import bulk_lane
+from app.repository import DatabaseUnavailable
+from app.executors import CPU, DB_READ, run_in
+from app.tracing import get_tracer
+from app.whitelist import RosterError, get_rosters
+from app.schedule import ScheduleError, get_store
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -32,42 +45,57 @@ ADMIN_IDS = [
 class AdminBroadcast(StatesGroup):
     waiting_text = State()
 
+# the broadcast prompt takes any text; admin buttons still pre-empt it (they were never meant as a broadcast)
+table.defer_to(AdminBroadcast)
+
 def _is_admin(uid: int) -> bool:
     return uid in ADMIN_IDS
 
+async def answer_blocks(m: Message, blocks: List[str], max_chars: int = 3800, **kwargs) -> None:
+    """Send `blocks` joined by newlines, split into messages between blocks so HTML tags are never cut."""
+    chunk: List[str] = []
+    size = 0
+    for block in blocks:
+        if chunk and size + 1 + len(block) > max_chars:
+            await m.answer("\n".join(chunk), **kwargs)
+            chunk, size = [], 0
+        size += len(block) + (1 if chunk else 0)
+        chunk.append(block)
+    if chunk:
+        await m.answer("\n".join(chunk), **kwargs)
+
 # ========== Admin Home ==========
-@router.message(F.text == BTN_ALL_APPTS)
+@table.text(BTN_ALL_APPTS, any_state=True)
 async def admin_pick_day(m: Message):
     if not _is_admin(m.from_user.id):
         await m.answer("Ushbu bo‘lim faqat administratorlar uchun.")
         return
     await m.answer("Kun tanlang (admin):", reply_markup=admin_days_kb(14))
 
-@router.callback_query(F.data.startswith("all:day:"))
-async def admin_all_day(cq: CallbackQuery):
+@router.message(Command("all"))
+async def admin_all(m: Message):
+    if not _is_admin(m.from_user.id):
+        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
+        return
+    await m.answer("Kun tanlang (admin):", reply_markup=admin_days_kb(14))
+
+table.retire("all")
+
+@table.callback(AdminDayCB)
+async def admin_all_day(cq: CallbackQuery, callback_data: AdminDayCB):
     if not _is_admin(cq.from_user.id):
         await cq.answer("Ruxsat yo‘q.", show_alert=True)
         return
 
-    day_iso = cq.data.split(":", 2)[2]
-    d = date.fromisoformat(day_iso)
+    d = callback_data.day
 
     day_start = datetime.combine(d, time(0, 0), UZ_TZ)
     day_end = day_start + timedelta(days=1)
 
     try:
-        res = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: (
-                sb.table("booking")
-                  .select("id,user_id,service_id,start_at,end_at,status")
-                  .gte("start_at", day_start.isoformat())
-                  .lt("start_at", day_end.isoformat())
-                  .order("start_at")
-                  .execute()
-            )
+        rows: List[Dict] = await run_in(
+            DB_READ, fetch_bookings_starting_between_sync, day_start, day_end
         )
-        rows: List[Dict] = res.data or []
 
         if not rows:
             await cq.message.edit_text(f"{d:%A, %d %b %Y} — bu kunda navbat yo‘q.")
@@ -79,17 +107,15 @@ async def admin_all_day(cq: CallbackQuery):
 
         svc_map: Dict[str, str] = {}
         if svc_ids:
-            svc_rows = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: sb.table("service").select("id,name").in_("id", svc_ids).execute()
+            svc_map = await run_in(
+                DB_READ, fetch_service_names_sync, svc_ids
             )
-            svc_map = {r["id"]: r["name"] for r in (svc_rows.data or [])}
 
         user_map: Dict[str, str] = {}
         if user_ids:
-            user_rows = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: sb.table("app_user").select("id,full_name,email").in_("id", user_ids).execute()
+            user_map = await run_in(
+                DB_READ, fetch_user_names_sync, user_ids
             )
-            user_map = {r["id"]: (r.get("full_name") or "Foydalanuvchi") for r in (user_rows.data or [])}
 
         lines: List[str] = [f"*{d:%A, %d %b %Y}* — kun bo‘yicha barcha navbatlar:"]
         for r in rows:
@@ -101,25 +127,20 @@ async def admin_all_day(cq: CallbackQuery):
 
         await cq.message.edit_text("\n".join(lines), parse_mode="Markdown")
         await cq.answer()
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Admin /all kun yuklashda xatolik: %s", e)
         await cq.answer("Xatolik yuz berdi.", show_alert=True)
 
 # ===== All students =====
-@router.message(F.text == BTN_ALL_STUDENTS)
+@table.text(BTN_ALL_STUDENTS, any_state=True)
 async def admin_all_students(m: Message):
     if m.from_user.id not in ADMIN_IDS:
         await m.answer("Ushbu bo‘lim faqat administratorlar uchun.")
         return
     try:
-        res = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: sb.table("app_user")
-                      .select("id,full_name,email,telegram_user_id,created_at")
-                      .order("created_at")
-                      .execute()
-        )
-        rows: List[Dict] = res.data or []
+        rows: List[Dict] = await run_in(DB_READ, fetch_all_users_sync)
         if not rows:
             await m.answer("Talabalar bazasi bo‘sh.")
             return
@@ -165,12 +186,14 @@ async def admin_all_students(m: Message):
 
         await flush()
 
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Admin: talabalar ro'yxati xatolik: %s", e)
         await m.answer("Talabalarni yuborish davomida xatolik yuz berdi (uzun ro‘yxat).")
 
 # ===== Notify all =====
-@router.message(F.text == BTN_NOTIFY_ALL)
+@table.text(BTN_NOTIFY_ALL, any_state=True)
 async def admin_notify_all(m: Message, state: FSMContext):
     if not _is_admin(m.from_user.id):
         await m.answer("Ushbu bo‘lim faqat administratorlar uchun.")
@@ -189,24 +212,105 @@ async def admin_do_broadcast(m: Message, state: FSMContext):
 
     # Get recipients from app_user (only those with telegram_user_id)
     try:
-        res = await asyncio.get_running_loop().run_in_executor(
-            None, lambda: sb.table("app_user").select("telegram_user_id").not_.is_("telegram_user_id", "null").execute()
-        )
-        ids = [row["telegram_user_id"] for row in (res.data or []) if isinstance(row.get("telegram_user_id"), int)]
+        ids = await run_in(DB_READ, fetch_user_telegram_ids_sync)
         # optionally exclude admins
         ids = [i for i in ids if i not in ADMIN_IDS]
 
         sent, failed = 0, 0
-        for uid in ids:
-            try:
-                await m.bot.send_message(chat_id=uid, text=text)
-                sent += 1
-            except (TelegramForbiddenError, TelegramBadRequest) as e:
-                failed += 1
-            except Exception as e:
-                failed += 1
+        with bulk_lane():
+            for uid in ids:
+                try:
+                    await m.bot.send_message(chat_id=uid, text=text)
+                    sent += 1
+                except (TelegramForbiddenError, TelegramBadRequest) as e:
+                    failed += 1
+                except Exception as e:
+                    failed += 1
 
         await m.answer(f"Yuborildi: {sent} ta ✅\nMuvaffaqiyatsiz: {failed} ta ❌", reply_markup=admin_main_menu())
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Broadcast xatolik: %s", e)
-        await m.answer("Jo‘natish vaqtida xatolik yuz berdi.", reply_markup=admin_main_menu())
\ No newline at end of file
+        await m.answer("Jo‘natish vaqtida xatolik yuz berdi.", reply_markup=admin_main_menu())
+
+# ===== Slow queries =====
+@router.message(Command("slow"))
+async def admin_slow_queries(m: Message, command: CommandObject):
+    """/slow [N]: the N slowest data-layer query shapes since startup (default 10)."""
+    if not _is_admin(m.from_user.id):
+        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
+        return
+    arg = (command.args or "").strip()
+    n = int(arg) if arg.isdigit() else 10
+    top = get_tracer().top_shapes(min(max(n, 1), 50))
+    if not top:
+        await m.answer("Hali so‘rovlar qayd etilmagan.")
+        return
+    lines = [f"<b>Eng sekin {len(top)} ta so‘rov shakli</b> (ishga tushgandan beri):"]
+    for i, t in enumerate(top, start=1):
+        lines.append(
+            f"\n{i}. max {t['max_ms']:.0f} ms · o‘rtacha {t['avg_ms']:.0f} ms · ×{t['count']}"
+            f" · ~{t['avg_rows']:.0f} qator · update {t['max_update_id'] or '—'}\n"
+            f"<code>{html.escape(t['shape'][:300])}</code>"
+        )
+    await answer_blocks(m, lines, parse_mode="HTML")
+
+@router.message(Command("roster"))
+async def admin_roster(m: Message, command: CommandObject):
+    """/roster: loaded whitelist versions; /roster reload [name]: re-read the CSVs and swap them in."""
+    if not _is_admin(m.from_user.id):
+        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
+        return
+    rosters = get_rosters()
+    args = (command.args or "").split()
+    if args and args[0].lower() == "reload":
+        names = args[1:] or list(rosters.paths)
+        lines = []
+        for name in names:
+            try:
+                snap = await run_in(CPU, rosters.reload, name, True)
+            except KeyError:
+                lines.append(f"❌ {html.escape(name)}: bunday ro‘yxat yo‘q")
+            except RosterError as e:
+                lines.append(f"❌ {html.escape(name)}: {html.escape(str(e))} (eski versiya qoldi)")
+            else:
+                lines.append(f"✅ {html.escape(name)} v{snap.version}: {len(snap)} ta ism")
+        await m.answer("\n".join(lines), parse_mode="HTML")
+        return
+    try:
+        snaps = await run_in(CPU, rosters.all)
+    except RosterError as e:
+        await m.answer(f"❌ {html.escape(str(e))}", parse_mode="HTML")
+        return
+    lines = ["<b>Stipendiatlar ro‘yxatlari</b>:"]
+    for snap in snaps:
+        loaded = datetime.fromtimestamp(snap.loaded_at, UZ_TZ).strftime("%d.%m %H:%M:%S")
+        lines.append(f"• <b>{html.escape(snap.name)}</b> v{snap.version} · {len(snap)} ta ism · {loaded}\n"
+                     f"  <code>{html.escape(snap.path)}</code> sha1 {snap.digest}")
+    await m.answer("\n".join(lines), parse_mode="HTML")
+
+@router.message(Command("schedule"))
+async def admin_schedule(m: Message, command: CommandObject):
+    """/schedule: rules version in effect; /schedule reload: re-read SCHEDULE_RULES and swap it in."""
+    if not _is_admin(m.from_user.id):
+        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
+        return
+    store = get_store()
+    if (command.args or "").strip().lower() == "reload":
+        try:
+            await run_in(CPU, store.reload, True)
+        except ScheduleError as e:
+            await m.answer(f"❌ {html.escape(str(e))} (eski jadval qoldi)", parse_mode="HTML")
+            return
+    sched = await run_in(CPU, store.get)
+    days = " ".join(f"{name}:{len(wins)}" for name, wins in zip(("Du", "Se", "Ch", "Pa", "Ju", "Sh", "Ya"), sched.weekdays))
+    await m.answer(
+        f"<b>Ish jadvali</b> v{sched.version} · sha1 {sched.digest}\n"
+        f"<code>{html.escape(sched.source)}</code>\n"
+        f"Oynalar (kun:soni): {days}\n"
+        f"Resurslar: {', '.join(f'{html.escape(r.name)}×{r.capacity}' for r in sched.resources)}\n"
+        f"Qadam: {sched.step_min} daq · kamida {int(sched.min_ahead.total_seconds() // 60)} daq oldin\n"
+        f"Xizmat qoidalari: {len(sched.services)} · bayramlar: {len(sched.holidays)} · yopiq kunlar: {len(sched.closures)}",
+        parse_mode="HTML",
+    )
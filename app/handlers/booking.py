@@ -1,5 +1,4 @@
 # app/handlers/booking.py
-import asyncio
 import logging
 from datetime import datetime, date, time, timedelta
 from typing import Dict, List, Optional
@@ -8,25 +7,29 @@ from aiogram import F, Router
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.filters import Command  # <-- for /all
 
-from app.config import UZ_TZ, sb
-from app.constants import BTN_BOOK, BTN_MY, BTN_SPECIAL_SERVICE  # Uzbek button labels
+from app.config import UZ_TZ
+from app.constants import ARRIVAL_NOTE, BTN_BOOK, BTN_SPECIAL_SERVICE  # Uzbek button labels
+from app.dispatch import table
+from app.callbacks import ServiceCB, EarliestCB, DayCB, TimeCB, CancelCB
 from app.db import (
     is_registered_sync, fetch_services_sync, get_service_sync,
-    fetch_bookings_for_day_sync, create_booking_sync, get_user_record_sync
+    fetch_bookings_for_day_sync, create_booking_sync, get_user_record_sync,
+    get_active_booking_sync, has_service_booking_between_sync, cancel_booking_sync
 )
-from app.keyboards import main_menu, days_kb, times_kb
+from app.keyboards import main_menu, bookable_days, days_kb, times_kb, earliest_kb, offer_kb
 from app.states import BookingFlow
-from app.utils import (
-    list_available_times, MIN_AHEAD, WORK_WINDOWS,
-    build_timeline, is_candidate_ok
-)
+from app.ratelimit import bulk_lane
+from app.repository import DatabaseUnavailable
+from app.schedule import get_schedule, is_forbidden_date
+from app.utils import list_available_times, earliest_available_times
+from app.executors import DB_READ, DB_WRITE, run_in
+from app.waitlist import capacity_freed
 
 logger = logging.getLogger(__name__)
 router = Router()
 
-# === Adminlar ro'yxati (ZIP yuborish oluvchilari va /all komandasi uchun) ===
+# === Adminlar ro'yxati (ZIP yuborish oluvchilari) ===
 ADMIN_IDS = [
     5647574607,
     7560917268,
@@ -45,69 +48,49 @@ SPECIAL_SERVICE_NAME = "Moliyaviy kafillik xati"
 def cancel_kb(booking_id: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="❌ Navbatni bekor qilish", callback_data=f"book:cancel:{booking_id}")]
+            [InlineKeyboardButton(text="❌ Navbatni bekor qilish", callback_data=CancelCB.of(booking_id).pack())]
         ]
     )
 
 # --------- tiny async wrappers over sync DB helpers ----------
 async def is_registered(uid: int) -> bool:
-    return await asyncio.get_running_loop().run_in_executor(None, is_registered_sync, uid)
+    return await run_in(DB_READ, is_registered_sync, uid)
 
 async def fetch_services() -> List[Dict]:
-    return await asyncio.get_running_loop().run_in_executor(None, fetch_services_sync)
+    return await run_in(DB_READ, fetch_services_sync)
 
 async def get_service(svc_id: str):
-    return await asyncio.get_running_loop().run_in_executor(None, get_service_sync, svc_id)
+    return await run_in(DB_READ, get_service_sync, svc_id)
 
 async def fetch_bookings_for_day(day_start: datetime, day_end: datetime):
-    return await asyncio.get_running_loop().run_in_executor(None, fetch_bookings_for_day_sync, day_start, day_end)
+    return await run_in(DB_READ, fetch_bookings_for_day_sync, day_start, day_end)
 
-async def create_booking(user_id: str, service_id: str, start_at: datetime, end_at: datetime):
-    return await asyncio.get_running_loop().run_in_executor(None, create_booking_sync, user_id, service_id, start_at, end_at)
+async def create_booking(user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                         resource_id: Optional[str] = None):
+    return await run_in(DB_WRITE, create_booking_sync, user_id, service_id, start_at, end_at, "booked", resource_id)
 
 async def get_user_record(telegram_user_id: int):
-    return await asyncio.get_running_loop().run_in_executor(None, get_user_record_sync, telegram_user_id)
+    return await run_in(DB_READ, get_user_record_sync, telegram_user_id)
 
 # --------- active booking gate (faqat bitta faol navbat) ----------
 async def has_active_booking(user_id: str) -> Optional[Dict]:
-    now_tz = datetime.now(UZ_TZ).isoformat()
-    res = await asyncio.get_running_loop().run_in_executor(
-        None,
-        lambda: (
-            sb.table("booking")
-              .select("id,service_id,start_at,end_at,status")
-              .eq("user_id", user_id)
-              .eq("status", "booked")
-              .gt("end_at", now_tz)  # hali tugamagan navbat
-              .limit(1)
-              .execute()
-        )
-    )
-    if res.data:
-        return res.data[0]
-    return None
-
-# --------- taqiqlangan sanalar (himoya) ----------
-def is_forbidden_date(d: date) -> bool:
-    # Dam olish kunlari: Shanba(5), Yakshanba(6)
-    if d.weekday() in (5, 6):
-        return True
-    # 1-sentabr (har yil)
-    if d.month == 9 and d.day == 1:
-        return True
-    return False
+    # status=booked va hali tugamagan navbat
+    return await run_in(DB_READ, get_active_booking_sync, user_id)
+
+# --------- vaqtni tekshirish xabarlari (app/schedule.py Schedule.check_start) ----------
+START_ERRORS = {
+    "closed": "Bu sanada navbat yo‘q. Iltimos, boshqa kun tanlang.",
+    "outside": "Ish vaqtidan tashqarida.",
+    "before_break": "Tushlikdan oldin yetarli vaqt yo‘q. Ilgariroq vaqtni tanlang.",
+    "before_close": "Yopilishdan oldin yetarli vaqt yo‘q. Ilgariroq vaqtni tanlang.",
+    "not_offered": "Bu vaqtni tanlab bo‘lmaydi. Boshqa vaqtni tanlang.",
+}
 
 # --------- "message is not modified" ni oldini olish ----------
+# O'zgarmagan ekranlar app/screen_cache.py da API'ga yuborilmaydi; bu yerda faqat kesh bilmagan holat
 async def _safe_edit_day_screen(message, text_md: str, kb):
     try:
-        if message.text == text_md:
-            try:
-                await message.edit_reply_markup(reply_markup=kb)
-            except TelegramBadRequest as e:
-                if "message is not modified" not in str(e):
-                    raise
-        else:
-            await message.edit_text(text_md, parse_mode="Markdown", reply_markup=kb)
+        await message.edit_text(text_md, parse_mode="Markdown", reply_markup=kb)
     except TelegramBadRequest as e:
         if "message is not modified" not in str(e):
             raise
@@ -116,7 +99,7 @@ async def _safe_edit_day_screen(message, text_md: str, kb):
 # ===== USER HANDLERS =====
 # =========================
 
-@router.message(F.text == BTN_SPECIAL_SERVICE)
+@table.text(BTN_SPECIAL_SERVICE)
 async def special_service_entry(m: Message, state: FSMContext):
     # jump straight into the special ZIP flow
     await state.set_state(BookingFlow.uploading_zip)
@@ -134,7 +117,7 @@ async def special_service_entry(m: Message, state: FSMContext):
         disable_web_page_preview=True,
     )
 
-@router.message(F.text == BTN_BOOK)
+@table.text(BTN_BOOK)
 async def book_appointment(m: Message, state: FSMContext):
     if not await is_registered(m.from_user.id):
         await m.answer("Iltimos, avval ro‘yxatdan o‘ting. Boshlash uchun /start yuboring.")
@@ -152,6 +135,14 @@ async def book_appointment(m: Message, state: FSMContext):
 
     # Gate: faqat bitta faol navbat — LEKIN maxsus xizmat (onlayn) doim ruxsat
     active = await has_active_booking(user["id"])
+    if active and active["status"] == "held":
+        # Kutish ro‘yxatidan taklif: avval tasdiqlash yoki rad etish kerak
+        s = datetime.fromisoformat(active["start_at"]).astimezone(UZ_TZ).strftime("%Y-%m-%d %H:%M")
+        await m.answer(
+            f"Sizga {s} uchun navbat taklif qilingan. Avval uni tasdiqlang yoki rad eting.",
+            reply_markup=offer_kb(active["id"]),
+        )
+        return
     if active:
         # Faol navbat detali
         svc_active = await get_service(active["service_id"])
@@ -171,7 +162,7 @@ async def book_appointment(m: Message, state: FSMContext):
         if special:
             kb = InlineKeyboardMarkup(
                 inline_keyboard=[
-                    [InlineKeyboardButton(text=f"{special['name']} (onlayn) — ZIP yuborish", callback_data=f"book:svc:{special['id']}")]
+                    [InlineKeyboardButton(text=f"{special['name']} (onlayn) — ZIP yuborish", callback_data=ServiceCB.of(special['id']).pack())]
                 ]
             )
             await state.set_state(BookingFlow.picking_service)
@@ -196,48 +187,51 @@ async def book_appointment(m: Message, state: FSMContext):
 
     kb = InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text=f"{s['name']} (~{s.get('duration_min','?')} daqiqa)", callback_data=f"book:svc:{s['id']}")]
+            [InlineKeyboardButton(text=f"{s['name']} (~{s.get('duration_min','?')} daqiqa)", callback_data=ServiceCB.of(s['id']).pack())]
             for s in visible_services
         ]
     )
     await state.set_state(BookingFlow.picking_service)
     await m.answer("Xizmatni tanlang:", reply_markup=kb, disable_web_page_preview=True)
 
-@router.callback_query(F.data.startswith("book:cancel:"))
-async def cancel_active_booking(cq: CallbackQuery):
-    booking_id = cq.data.split(":", 2)[2]
+# v0 payloads (book:svc:<uuid>, book:time:<epoch>, ...) from keyboards sent before the codec
+table.retire("book")
+
+@table.callback(CancelCB)
+async def cancel_active_booking(cq: CallbackQuery, callback_data: CancelCB):
+    booking_id = callback_data.booking_id
     user = await get_user_record(cq.from_user.id)
     if not user:
         await cq.answer("Avval /start orqali ro‘yxatdan o‘ting.", show_alert=True)
         return
 
-    now_iso = datetime.now(UZ_TZ).isoformat()
+    now_tz = datetime.now(UZ_TZ)
     try:
-        upd = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: (
-                sb.table("booking")
-                  .update({"status": "cancelled"})
-                  .eq("id", booking_id)
-                  .eq("user_id", user["id"])
-                  .eq("status", "booked")
-                  .gt("end_at", now_iso)
-                  .execute()
-            )
+        upd = await run_in(
+            DB_WRITE, cancel_booking_sync, booking_id, user["id"], now_tz
         )
-        if not upd.data:
+        if not upd:
             await cq.answer("Bekor qilishning imkoni bo‘lmadi.", show_alert=True)
             return
 
+        if upd.get("journaled"):
+            # backend is down; the cancellation is applied when it recovers
+            await cq.message.edit_text("✅ Bekor qilish so‘rovingiz qabul qilindi. Server tiklangach qo‘llanadi.")
+            await cq.answer("Qabul qilindi.")
+            return
+
         await cq.message.edit_text("✅ Faol navbatingiz bekor qilindi.")
         await cq.answer("Bekor qilindi.")
+        capacity_freed(cq.bot, upd)
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Bekor qilishda xatolik: %s", e)
         await cq.answer("Xatolik yuz berdi.", show_alert=True)
 
-@router.callback_query(F.data.startswith("book:svc:"))
-async def pick_service(cq: CallbackQuery, state: FSMContext):
-    svc_id = cq.data.split(":", 2)[2]
+@table.callback(ServiceCB)
+async def pick_service(cq: CallbackQuery, state: FSMContext, callback_data: ServiceCB):
+    svc_id = callback_data.service_id
     svc = await get_service(svc_id)
     if not svc:
         await cq.answer("Xizmat topilmadi.", show_alert=True)
@@ -279,7 +273,7 @@ async def pick_service(cq: CallbackQuery, state: FSMContext):
     await cq.message.edit_text(
         f"Xizmat: *{svc['name']}* (~{svc['duration_min']} daqiqa)\nKun tanlang:",
         parse_mode="Markdown",
-        reply_markup=days_kb(10),  # dam olish kunlari va 1-sentabr yashirilgan
+        reply_markup=days_kb(10, svc_id),  # dam olish kunlari va 1-sentabr yashirilgan
     )
     await cq.answer()
 
@@ -306,16 +300,17 @@ async def receive_special_zip(m: Message, state: FSMContext):
         f"Telegram ID: {m.from_user.id}"
     )
 
-    # Har bir admin user_id ga yuboramiz
-    for admin_id in ADMIN_IDS:
-        try:
-            await m.bot.send_document(
-                chat_id=admin_id,
-                document=doc.file_id,
-                caption=caption
-            )
-        except Exception as e:
-            logger.warning("Admin %s ga yuborib bo'lmadi: %s", admin_id, e)
+    # Har bir admin user_id ga yuboramiz (foydalanuvchi javobidan keyingi navbatda)
+    with bulk_lane():
+        for admin_id in ADMIN_IDS:
+            try:
+                await m.bot.send_document(
+                    chat_id=admin_id,
+                    document=doc.file_id,
+                    caption=caption
+                )
+            except Exception as e:
+                logger.warning("Admin %s ga yuborib bo'lmadi: %s", admin_id, e)
 
     await state.clear()
     await m.answer(
@@ -325,14 +320,15 @@ async def receive_special_zip(m: Message, state: FSMContext):
         disable_web_page_preview=True,
     )
 
+# menu buttons are not routed here (not in table.defer_to): they are the way out of this state
 @router.message(BookingFlow.uploading_zip)
 async def require_zip_only(m: Message):
     await m.answer("Iltimos, faqat *ZIP* fayl yuboring (hujjatlar bitta arxivda).", parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("book:day:"))
-async def pick_day(cq: CallbackQuery, state: FSMContext):
-    day_iso = cq.data.split(":", 2)[2]
-    d = date.fromisoformat(day_iso)
+# Kun tanlash va vaqtlar ekranidagi "Orqaga" tugmasi bir xil DayCB yuboradi
+@table.callback(DayCB)
+async def pick_day(cq: CallbackQuery, state: FSMContext, callback_data: DayCB):
+    d = callback_data.day
 
     # Himoya: taqiqlangan sanalarni rad etish
     if is_forbidden_date(d):
@@ -349,8 +345,8 @@ async def pick_day(cq: CallbackQuery, state: FSMContext):
     day_end = day_start + timedelta(days=1)
     existing = await fetch_bookings_for_day(day_start, day_end)
 
-    valid_times = list_available_times(d, int(svc["duration_min"]), existing)
-    kb = times_kb(d, valid_times)
+    valid_times = list_available_times(d, int(svc["duration_min"]), existing, svc["id"])
+    kb = times_kb(d, valid_times, svc["id"])
 
     new_text = (
         f"Xizmat: *{svc['name']}* (~{svc['duration_min']} daqiqa)\n"
@@ -360,50 +356,45 @@ async def pick_day(cq: CallbackQuery, state: FSMContext):
     await _safe_edit_day_screen(cq.message, new_text, kb)
     await cq.answer()
 
-@router.callback_query(F.data.startswith("book:back:day:"))
-async def back_to_day(cq: CallbackQuery, state: FSMContext):
-    day_iso = cq.data.split(":", 3)[3]
-    d = date.fromisoformat(day_iso)
+# Eng yaqin bo‘sh vaqtlar: butun gorizont bitta so‘rov bilan, kunma-kun bosmasdan
+EARLIEST_N = 6
 
-    if is_forbidden_date(d):
-        await cq.answer("Bu sanada navbat yo‘q. Iltimos, boshqa kun tanlang.", show_alert=True)
-        return
-
-    data = await state.get_data()
-    svc = await get_service(data.get("svc_id", ""))
+@table.callback(EarliestCB)
+async def pick_earliest(cq: CallbackQuery, state: FSMContext, callback_data: EarliestCB):
+    svc = await get_service(callback_data.service_id)
     if not svc:
         await cq.answer("Xizmat topilmadi.", show_alert=True)
         return
+    await state.update_data(svc_id=svc["id"])
 
-    day_start = datetime.combine(d, time(0, 0), UZ_TZ)
-    day_end = day_start + timedelta(days=1)
-    existing = await fetch_bookings_for_day(day_start, day_end)
-    valid_times = list_available_times(d, int(svc["duration_min"]), existing)
-    kb = times_kb(d, valid_times)
+    days = bookable_days(10)
+    horizon_start = datetime.combine(days[0], time(0, 0), UZ_TZ)
+    horizon_end = datetime.combine(days[-1], time(0, 0), UZ_TZ) + timedelta(days=1)
+    existing = await fetch_bookings_for_day(horizon_start, horizon_end)
+    slots = earliest_available_times(days, int(svc["duration_min"]), existing, EARLIEST_N, svc["id"])
 
-    new_text = (
-        f"Xizmat: *{svc['name']}* (~{svc['duration_min']} daqiqa)\n"
-        f"Sana: {d.strftime('%A, %d %b')}\n"
-        f"Boshlanish vaqtini tanlang:"
-    )
-    await _safe_edit_day_screen(cq.message, new_text, kb)
+    if slots:
+        new_text = (
+            f"Xizmat: *{svc['name']}* (~{svc['duration_min']} daqiqa)\n"
+            f"Eng yaqin bo‘sh vaqtlar:"
+        )
+    else:
+        new_text = (
+            f"Xizmat: *{svc['name']}* (~{svc['duration_min']} daqiqa)\n"
+            f"Yaqin {len(days)} ish kunida bo‘sh vaqt yo‘q."
+        )
+    await _safe_edit_day_screen(cq.message, new_text, earliest_kb(slots, svc["id"]))
     await cq.answer()
 
-@router.callback_query(F.data == "book:back:menu")
+@table.callback("book:back:menu", exact=True)
 async def back_to_menu(cq: CallbackQuery, state: FSMContext):
     await state.clear()
     await cq.message.edit_text("Menyu sahifasiga qaytdingiz. Quyidagi tugmalardan foydalaning.")
     await cq.message.answer("Asosiy menyu:", reply_markup=main_menu())
     await cq.answer()
 
-@router.callback_query(F.data.startswith("book:time:"))
-async def pick_time(cq: CallbackQuery, state: FSMContext):
-    try:
-        epoch = int(cq.data.split(":", 2)[2])
-    except Exception:
-        await cq.answer("Vaqt noto‘g‘ri.", show_alert=True)
-        return
-
+@table.callback(TimeCB)
+async def pick_time(cq: CallbackQuery, state: FSMContext, callback_data: TimeCB):
     data = await state.get_data()
     svc_id = data.get("svc_id")
     if not svc_id:
@@ -415,43 +406,39 @@ async def pick_time(cq: CallbackQuery, state: FSMContext):
         await cq.answer("Xizmat topilmadi.", show_alert=True)
         return
 
-    start_local = datetime.fromtimestamp(epoch, UZ_TZ)
+    start_local = callback_data.start
 
-    # Taqiqlangan sanani yakuniy tekshirish
-    if is_forbidden_date(start_local.date()):
-        await cq.answer("Bu sanada navbat yo‘q. Iltimos, boshqa kun tanlang.", show_alert=True)
+    sched = get_schedule()
+    duration_min = int(svc["duration_min"])
+
+    # Taqiqlangan sana / ish vaqti / qadam: hammasi jadval qoidalaridan
+    problem = sched.check_start(start_local, duration_min, svc_id)
+    if problem == "closed":
+        await cq.answer(START_ERRORS[problem], show_alert=True)
         return
 
-    # Kamida 2 soat oldin
-    if start_local < datetime.now(UZ_TZ) + MIN_AHEAD:
+    # Kamida MIN_AHEAD (odatda 2 soat) oldin
+    if start_local < sched.earliest_start():
         await cq.answer("Juda yaqin vaqt. Biroz keyinroq vaqtni tanlang.", show_alert=True)
         return
 
-    dur = timedelta(minutes=int(svc["duration_min"]))
-    end_local = start_local + dur
-
-    in_morning = WORK_WINDOWS[0][0] <= start_local.time() < WORK_WINDOWS[0][1]
-    in_afternoon = WORK_WINDOWS[1][0] <= start_local.time() < WORK_WINDOWS[1][1]
-    if in_morning and end_local.time() > WORK_WINDOWS[0][1]:
-        await cq.answer("Tushlikdan oldin yetarli vaqt yo‘q. Ilgariroq vaqtni tanlang.", show_alert=True)
-        return
-    if in_afternoon and end_local.time() > WORK_WINDOWS[1][1]:
-        await cq.answer("Yopilishdan oldin yetarli vaqt yo‘q. Ilgariroq vaqtni tanlang.", show_alert=True)
-        return
-    if not (in_morning or in_afternoon):
-        await cq.answer("Ish vaqtidan tashqarida.", show_alert=True)
+    if problem:
+        await cq.answer(START_ERRORS[problem], show_alert=True)
         return
 
+    dur = timedelta(minutes=duration_min)
+    end_local = start_local + dur
+
     d = start_local.date()
     day_start = datetime.combine(d, time(0, 0), UZ_TZ)
     day_end = day_start + timedelta(days=1)
     existing = await fetch_bookings_for_day(day_start, day_end)
 
-    counts = build_timeline(existing, d)
-    if not is_candidate_ok(start_local, dur, counts):
+    resource_id = sched.assign(start_local, duration_min, sched.day_indexes(existing).get(d), svc_id)
+    if resource_id is None:
         await cq.answer("Bu vaqt endi band bo‘ldi. Boshqa vaqtni tanlang.", show_alert=True)
-        valid_times = list_available_times(d, int(svc["duration_min"]), existing)
-        kb = times_kb(d, valid_times)
+        valid_times = list_available_times(d, duration_min, existing, svc_id)
+        kb = times_kb(d, valid_times, svc_id)
         new_text = (
             f"Xizmat: *{svc['name']}* (~{svc['duration_min']} daqiqa)\n"
             f"Sana: {d.strftime('%A, %d %b')}\n"
@@ -479,25 +466,18 @@ async def pick_time(cq: CallbackQuery, state: FSMContext):
         return
 
     # Ixtiyoriy: bir kunda bitta xizmatni faqat bir marta
-    same_day_dup = await asyncio.get_running_loop().run_in_executor(
-        None,
-        lambda: (
-            sb.table("booking")
-              .select("id")
-              .eq("user_id", user["id"])
-              .eq("service_id", svc_id)
-              .gte("start_at", day_start.isoformat())
-              .lt("start_at", day_end.isoformat())
-              .limit(1)
-              .execute()
-        )
+    same_day_dup = await run_in(
+        DB_READ, has_service_booking_between_sync, user["id"], svc_id, day_start, day_end
     )
-    if same_day_dup.data:
+    if same_day_dup:
         await cq.answer("Bu xizmatni shu kunda allaqachon band qilgansiz.", show_alert=True)
         return
 
     try:
-        _ = await create_booking(user_id=user["id"], service_id=svc_id, start_at=start_local, end_at=end_local)
+        _ = await create_booking(user_id=user["id"], service_id=svc_id, start_at=start_local, end_at=end_local,
+                                 resource_id=resource_id)
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Navbat yaratishda xatolik: %s", e)
         await cq.answer("Navbat yaratib bo‘lmadi. Boshqa vaqtni tanlab ko‘ring.", show_alert=True)
@@ -513,151 +493,8 @@ async def pick_time(cq: CallbackQuery, state: FSMContext):
     )
     # Manzil/ko‘rsatma
     await cq.message.answer(
-        "📍 Manzil: https://maps.app.goo.gl/phhE5byYBabpnfx97\n"
-        "⏰ Iltimos, *30 daqiqa oldin* keling.\n"
-        "🏢 Xona: *302*.\n\n"
-        "⚠️ Belgilangan vaqtda kelmasangiz, bu keyingi navbatlaringiz va KPI ko‘rsatkichingizga salbiy ta’sir qiladi.",
+        ARRIVAL_NOTE,
         parse_mode="Markdown",
         disable_web_page_preview=True,
     )
     await cq.answer()
-
-@router.message(F.text == BTN_MY)
-async def my_appointments(m: Message):
-    if not await is_registered(m.from_user.id):
-        await m.answer("Iltimos, avval ro‘yxatdan o‘ting. Boshlash uchun /start yuboring.")
-        return
-
-    user = await get_user_record(m.from_user.id)
-    if not user:
-        await m.answer("Iltimos, /start orqali ro‘yxatdan o‘ting.")
-        return
-
-    try:
-        res = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: (
-                sb.table("booking")
-                  .select("id,service_id,start_at,end_at,status")
-                  .eq("user_id", user["id"])
-                  .order("start_at")
-                  .execute()
-            )
-        )
-        rows = res.data or []
-
-        svc_ids = list({r["service_id"] for r in rows})
-        svc_map: Dict[str, str] = {}
-        if svc_ids:
-            svc_rows = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: sb.table("service").select("id,name").in_("id", svc_ids).execute()
-            )
-            svc_map = {r["id"]: r["name"] for r in (svc_rows.data or [])}
-
-        now_tz = datetime.now(UZ_TZ)
-        lines = []
-        for r in rows:
-            s = datetime.fromisoformat(r["start_at"]).astimezone(UZ_TZ)
-            e = datetime.fromisoformat(r["end_at"]).astimezone(UZ_TZ)
-            if e < now_tz:
-                continue
-            nm = svc_map.get(r["service_id"], "Xizmat")
-            lines.append(f"• {s:%Y-%m-%d %H:%M}–{e:%H:%M} — {nm} ({r['status']})")
-
-        await m.answer("\n".join(lines) if lines else "Yaqinlashib kelayotgan navbatlar yo‘q.")
-    except Exception as e:
-        logger.exception("Navbatlarni yuklashda xatolik: %s", e)
-        await m.answer("Navbatlar topilmadi yoki yuklab bo‘lmadi.")
-
-# ===========================
-# ===== ADMIN: /all flow ====
-# ===========================
-
-def admin_days_kb(n: int = 10) -> InlineKeyboardMarkup:
-    """Adminlar uchun kun tanlash (taqiqlangan sanalar yashirilgan)."""
-    today = datetime.now(UZ_TZ).date()
-    rows = []
-    count = 0
-    i = 0
-    while count < n:
-        d = today + timedelta(days=i)
-        i += 1
-        if is_forbidden_date(d):
-            continue
-        rows.append([InlineKeyboardButton(text=d.strftime("%a %d %b"), callback_data=f"all:day:{d.isoformat()}")])
-        count += 1
-    return InlineKeyboardMarkup(inline_keyboard=rows)
-
-@router.message(Command("all"))
-async def admin_all(m: Message):
-    """Adminlar uchun: kun tanlash oynasi."""
-    if m.from_user.id not in ADMIN_IDS:
-        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
-        return
-    await m.answer("Kun tanlang (admin):", reply_markup=admin_days_kb(14))
-
-@router.callback_query(F.data.startswith("all:day:"))
-async def admin_all_day(cq: CallbackQuery):
-    """Admin: tanlangan kun bo‘yicha barcha navbatlar ro‘yxati."""
-    if cq.from_user.id not in ADMIN_IDS:
-        await cq.answer("Ruxsat yo‘q.", show_alert=True)
-        return
-
-    day_iso = cq.data.split(":", 2)[2]
-    d = date.fromisoformat(day_iso)
-
-    # Shu kun oralig‘i
-    day_start = datetime.combine(d, time(0, 0), UZ_TZ)
-    day_end = day_start + timedelta(days=1)
-
-    try:
-        # Kunning barcha bookinglarini olish
-        res = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: (
-                sb.table("booking")
-                  .select("id,user_id,service_id,start_at,end_at,status")
-                  .gte("start_at", day_start.isoformat())
-                  .lt("start_at", day_end.isoformat())
-                  .order("start_at")
-                  .execute()
-            )
-        )
-        rows: List[Dict] = res.data or []
-
-        if not rows:
-            await cq.message.edit_text(f"{d.strftime('%A, %d %b %Y')} — bu kunda navbat yo‘q.")
-            await cq.answer()
-            return
-
-        # Service va User mapping
-        svc_ids = list({r["service_id"] for r in rows})
-        user_ids = list({r["user_id"] for r in rows})
-
-        svc_map: Dict[str, str] = {}
-        if svc_ids:
-            svc_rows = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: sb.table("service").select("id,name").in_("id", svc_ids).execute()
-            )
-            svc_map = {r["id"]: r["name"] for r in (svc_rows.data or [])}
-
-        user_map: Dict[str, str] = {}
-        if user_ids:
-            user_rows = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: sb.table("app_user").select("id,full_name,email").in_("id", user_ids).execute()
-            )
-            user_map = {r["id"]: (r.get("full_name") or "Foydalanuvchi") for r in (user_rows.data or [])}
-
-        lines: List[str] = [f"*{d.strftime('%A, %d %b %Y')}* — kun bo‘yicha barcha navbatlar:"]
-        for r in rows:
-            s = datetime.fromisoformat(r["start_at"]).astimezone(UZ_TZ)
-            e = datetime.fromisoformat(r["end_at"]).astimezone(UZ_TZ)
-            nm = svc_map.get(r["service_id"], "Xizmat")
-            uname = user_map.get(r["user_id"], "Foydalanuvchi")
-            lines.append(f"• {s:%H:%M}–{e:%H:%M} — {nm} — {uname} ({r['status']})")
-
-        await cq.message.edit_text("\n".join(lines), parse_mode="Markdown")
-        await cq.answer()
-    except Exception as e:
-        logger.exception("Admin /all kun yuklashda xatolik: %s", e)
-        await cq.answer("Xatolik yuz berdi.", show_alert=True)
\ No newline at end of file
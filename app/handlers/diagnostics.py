@@ -0,0 +1,80 @@
+# app/handlers/diagnostics.py
+import html
+import logging
+from datetime import datetime
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, Message
+
+from app.config import UZ_TZ
+from app.handlers.admin import ADMIN_IDS, answer_blocks
+from app import profiling
+from app.executors import CPU, run_in
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+MAX_PROFILE_SECONDS = 60
+CAPTION_LIMIT = 1024
+
+def _kib(n: int) -> str:
+    return f"{n / 1024:,.1f} KiB"
+
+# /profile [seconds]: sample every thread, reply with a collapsed-stack file
+@router.message(Command("profile"))
+async def admin_profile(m: Message, command: CommandObject):
+    if m.from_user.id not in ADMIN_IDS:
+        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
+        return
+    arg = (command.args or "").strip()
+    seconds = min(int(arg), MAX_PROFILE_SECONDS) if arg.isdigit() and int(arg) > 0 else 10
+    await m.answer(f"⏱ {seconds} soniya davomida profil yozilmoqda…")
+    try:
+        prof = await profiling.profile(seconds)
+    except RuntimeError:
+        await m.answer("Profil allaqachon yozilmoqda, tugashini kuting.")
+        return
+    stamp = datetime.now(UZ_TZ).strftime("%Y%m%d-%H%M%S")
+    caption = f"{prof.samples} ta namuna, {seconds} s (flamegraph.pl / speedscope)"
+    # whole frames only: a cut inside <pre> makes Telegram reject the caption
+    hottest = []
+    for frame, n in prof.hottest(5):
+        line = f"{n:>5}  {html.escape(frame[:200])}"
+        if len(caption) + len("\n<pre></pre>") + sum(len(x) + 1 for x in hottest) + len(line) > CAPTION_LIMIT:
+            break
+        hottest.append(line)
+    if hottest:
+        caption += "\n<pre>" + "\n".join(hottest) + "</pre>"
+    await m.answer_document(
+        BufferedInputFile(prof.collapsed().encode("utf-8"), filename=f"profile-{stamp}.collapsed"),
+        caption=caption,
+        parse_mode="HTML",
+    )
+
+# /mem start | /mem | /mem stop: tracemalloc growth between snapshots
+@router.message(Command("mem"))
+async def admin_mem(m: Message, command: CommandObject):
+    if m.from_user.id not in ADMIN_IDS:
+        await m.answer("Ushbu buyruq faqat administratorlar uchun.")
+        return
+    arg = (command.args or "").strip().lower()
+    if arg == "start":
+        await run_in(CPU, profiling.mem_start)
+        await m.answer("tracemalloc yoqildi. Keyinroq /mem bilan farqni ko‘ring, /mem stop bilan o‘chiring.")
+        return
+    if arg == "stop":
+        await run_in(CPU, profiling.mem_stop)
+        await m.answer("tracemalloc o‘chirildi.")
+        return
+    try:
+        diff = await run_in(CPU, profiling.mem_diff)
+    except RuntimeError:
+        await m.answer("tracemalloc ishlamayapti. Avval /mem start yuboring.")
+        return
+    lines = [f"Joriy: {_kib(diff['current'])}, eng yuqori: {_kib(diff['peak'])}"]
+    if not diff["rows"]:
+        lines.append("Oxirgi snapshotdan beri o‘sish yo‘q.")
+    for where, size_diff, size, count_diff in diff["rows"]:
+        lines.append(f"+{_kib(size_diff)} (jami {_kib(size)}, +{count_diff} obyekt)\n<code>{html.escape(where)}</code>")
+    await answer_blocks(m, lines, parse_mode="HTML")
@@ -0,0 +1,18 @@
+# app/handlers/errors.py
+import logging
+
+from aiogram.types import ErrorEvent
+
+logger = logging.getLogger(__name__)
+
+TRY_LATER = "⏳ Server hozir javob bermayapti. Iltimos, birozdan so‘ng qayta urinib ko‘ring."
+
+async def on_db_unavailable(event: ErrorEvent):
+    """Registered on the Dispatcher for DatabaseUnavailable: answer at once instead of leaving the user waiting."""
+    logger.warning("DB unavailable while handling update %s: %s", event.update.update_id, event.exception)
+    upd = event.update
+    if upd.callback_query:
+        await upd.callback_query.answer(TRY_LATER, show_alert=True)
+    elif upd.message:
+        await upd.message.answer(TRY_LATER)
+    return True
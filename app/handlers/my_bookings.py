@@ -1,67 +1,52 @@
 # app/handlers/my_bookings.py
-import asyncio
 import logging
 from collections import defaultdict
 from datetime import datetime
 from typing import Dict, List
 from html import escape as html_escape
 
-from aiogram import F, Router
+from aiogram import Router
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
-from app.config import UZ_TZ, sb
-from app.db import get_user_record_sync
+from app.config import UZ_TZ
+from app.db import (
+    get_user_record_sync, fetch_user_bookings_sync, fetch_service_names_sync,
+    get_user_booking_sync, cancel_booking_sync
+)
 from app.keyboards import main_menu
 from app.constants import BTN_MY
+from app.dispatch import table
+from app.callbacks import MyCancelCB
+from app.repository import DatabaseUnavailable
+from app.executors import DB_READ, DB_WRITE, run_in
+from app.waitlist import capacity_freed
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 # ----------------- DB helpers (async wrappers) -----------------
 async def get_user_record(telegram_user_id: int):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, get_user_record_sync, telegram_user_id)
+    return await run_in(DB_READ, get_user_record_sync, telegram_user_id)
 
 async def fetch_user_bookings(user_id: str) -> List[Dict]:
-    loop = asyncio.get_running_loop()
-    res = await loop.run_in_executor(
-        None,
-        lambda: (
-            sb.table("booking")
-              .select("id,service_id,start_at,end_at,status")
-              .eq("user_id", user_id)
-              .order("start_at")
-              .execute()
-        )
-    )
-    return res.data or []
+    return await run_in(DB_READ, fetch_user_bookings_sync, user_id)
 
 async def fetch_services_map(ids: List[str]) -> Dict[str, str]:
     if not ids:
         return {}
-    loop = asyncio.get_running_loop()
-    res = await loop.run_in_executor(
-        None,
-        lambda: (
-            sb.table("service")
-              .select("id,name")
-              .in_("id", ids)
-              .execute()
-        )
-    )
-    return {r["id"]: r["name"] for r in (res.data or [])}
+    return await run_in(DB_READ, fetch_service_names_sync, ids)
 
 # ----------------- Cancel keyboard -----------------
 def cancel_kb(booking_id: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="❌ Navbatni bekor qilish", callback_data=f"my:cancel:{booking_id}")]
+            [InlineKeyboardButton(text="❌ Navbatni bekor qilish", callback_data=MyCancelCB.of(booking_id).pack())]
         ]
     )
 
 # ----------------- Main handler -----------------
 # Handle both Uzbek and old English labels to avoid routing collisions
-@router.message(F.text.in_([BTN_MY, "🗓️ My appointments"]))
+@table.text(BTN_MY, "🗓️ My appointments")
 async def my_appointments(m: Message):
     user = await get_user_record(m.from_user.id)
     if not user:
@@ -122,14 +107,18 @@ async def my_appointments(m: Message):
             )
             await m.answer(txt, parse_mode="HTML", reply_markup=cancel_kb(r["id"]))
 
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Navbatlarni yuklashda xatolik: %s", e)
         await m.answer("Hozircha navbatlarni yuklab bo‘lmadi.", reply_markup=main_menu())
 
 # ----------------- Cancel callback -----------------
-@router.callback_query(F.data.startswith("my:cancel:"))
-async def cancel_booking(cq: CallbackQuery):
-    booking_id = cq.data.split(":", 2)[2]
+table.retire("my")
+
+@table.callback(MyCancelCB)
+async def cancel_booking(cq: CallbackQuery, callback_data: MyCancelCB):
+    booking_id = callback_data.booking_id
 
     user = await get_user_record(cq.from_user.id)
     if not user:
@@ -138,18 +127,9 @@ async def cancel_booking(cq: CallbackQuery):
 
     try:
         # Load by id + user (no time filters in SQL)
-        sel = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: (
-                sb.table("booking")
-                  .select("id,service_id,start_at,end_at,status")
-                  .eq("id", booking_id)
-                  .eq("user_id", user["id"])
-                  .limit(1)
-                  .execute()
-            )
+        row = await run_in(
+            DB_READ, get_user_booking_sync, booking_id, user["id"]
         )
-        row = (sel.data or [None])[0]
         if not row:
             await cq.answer("Bekor qilish uchun mos navbat topilmadi.", show_alert=True)
             return
@@ -164,24 +144,25 @@ async def cancel_booking(cq: CallbackQuery):
             return
 
         # Atomic update: only if still "booked"
-        upd = await asyncio.get_running_loop().run_in_executor(
-            None,
-            lambda: (
-                sb.table("booking")
-                  .update({"status": "cancelled"})
-                  .eq("id", booking_id)
-                  .eq("user_id", user["id"])
-                  .eq("status", "booked")
-                  .execute()
-            )
+        upd = await run_in(
+            DB_WRITE, cancel_booking_sync, booking_id, user["id"]
         )
-        if not upd.data:
+        if not upd:
             await cq.answer("Bekor qilishning imkoni bo‘lmadi (ehtimol allaqachon o‘zgargan).", show_alert=True)
             return
 
+        if upd.get("journaled"):
+            # backend is down; the cancellation is applied when it recovers
+            await cq.message.edit_text("✅ Bekor qilish so‘rovingiz qabul qilindi. Server tiklangach qo‘llanadi.")
+            await cq.answer("Qabul qilindi.")
+            return
+
         await cq.message.edit_text("✅ Navbatingiz bekor qilindi.")
         await cq.answer("Bekor qilindi.")
+        capacity_freed(cq.bot, upd)
 
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Bekor qilishda xatolik: %s", e)
         await cq.answer("Bekor qilishda xatolik yuz berdi.", show_alert=True)
\ No newline at end of file
@@ -1,37 +1,35 @@
-import asyncio
 import logging
 from aiogram import F, Router
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 
-from app.config import AWARD_CSV, SUPPORT_CONTACT
+from app.config import SUPPORT_CONTACT
 from app.db import is_registered_sync, is_name_taken_sync, register_user_sync
 from app.keyboards import main_menu
 from app.states import Reg
 from app.utils import EMAIL_RE, normalize_phone
-from app.whitelist import load_award_map, best_match_90, suggestion_names
+from app.whitelist import get_rosters
 from app.constants import BTN_BOOK, BTN_MY, BTN_SERVICES, BTN_SUPPORT
 from app.keyboards import admin_main_menu
 from app.handlers.admin import ADMIN_IDS
+from app.dispatch import table
+from app.repository import DatabaseUnavailable, UniqueViolation
+from app.executors import CPU, DB_READ, DB_WRITE, run_in
 
 logger = logging.getLogger(__name__)
 router = Router()
-
-AWARD_MAP = load_award_map(AWARD_CSV)
-AWARD_KEYS = list(AWARD_MAP.keys())
+# registration answers are free text, so menu buttons typed mid-registration are answers too
+table.defer_to(Reg)
 
 async def is_registered(uid: int) -> bool:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, is_registered_sync, uid)
+    return await run_in(DB_READ, is_registered_sync, uid)
 
 async def is_name_taken(canon: str) -> bool:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, is_name_taken_sync, canon)
+    return await run_in(DB_READ, is_name_taken_sync, canon)
 
 async def register_user(uid: int, full_name: str, phone: str, email: str, country: str, university: str):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, register_user_sync, uid, full_name, phone, email, country, university)
+    return await run_in(DB_WRITE, register_user_sync, uid, full_name, phone, email, country, university)
 
 @router.message(CommandStart())
 async def start(m: Message, state: FSMContext):
@@ -63,15 +61,18 @@ async def ask_phone(m: Message, state: FSMContext):
     if len(user_input) < 3:
         await m.answer("Ism juda qisqa ko‘rinmoqda. Iltimos, <b>to‘liq ismingizni</b> qayta kiriting.", parse_mode="HTML")
         return
-    match = best_match_90(user_input, AWARD_KEYS, AWARD_MAP)
+    # first call loads the CSVs, so it runs on the cpu pool along with the match itself
+    rosters = get_rosters()
+    match = await run_in(CPU, rosters.best_match, user_input)
     if not match:
-        hints = suggestion_names(user_input, AWARD_KEYS, AWARD_MAP, n=5)
+        hints = await run_in(CPU, rosters.suggestions, user_input, 5)
         if hints:
             await m.answer("❌ Ism 90% aniqlik bilan topilmadi. Qayta urinib ko‘ring.\n\nYaqin variantlar:\n" + "\n".join(f"• {h}" for h in hints))
         else:
             await m.answer("❌ Sizning ismingiz stipendiatlar ro‘yxatida topilmadi. Imloni tekshiring yoki texnik yordamga murojaat qiling.")
         return
-    _, canonical = match
+    snap, _, canonical = match
+    logger.debug("Roster match %r -> %r (%s v%d)", user_input, canonical, snap.name, snap.version)
     if await is_name_taken(canonical):
         await m.answer("⚠️ Bu stipendiat allaqachon ro‘yxatdan o‘tgan. Agar bu siz bo‘lsangiz, texnik yordamga murojaat qiling.")
         return
@@ -86,7 +87,7 @@ async def ask_phone(m: Message, state: FSMContext):
 
 @router.message(Reg.phone, F.contact)
 async def got_contact(m: Message, state: FSMContext):
-    phone = normalize_phone(m.contact.phone_number)
+    phone = await run_in(CPU, normalize_phone, m.contact.phone_number)
     if not phone:
         await m.answer("Telefon raqamni o‘qib bo‘lmadi. Iltimos, +998901234567 ko‘rinishida kiriting.")
         return
@@ -96,7 +97,7 @@ async def got_contact(m: Message, state: FSMContext):
 
 @router.message(Reg.phone)
 async def got_phone_text(m: Message, state: FSMContext):
-    phone = normalize_phone((m.text or "").strip())
+    phone = await run_in(CPU, normalize_phone, (m.text or "").strip())
     if not phone:
         await m.answer("Bu raqam noto‘g‘ri ko‘rinmoqda. +998901234567 shaklida kiriting.")
         return
@@ -130,16 +131,9 @@ async def got_university(m: Message, state: FSMContext):
     if len(university) < 2:
         await m.answer("Iltimos, to‘g‘ri universitet nomini kiriting.")
         return
-    if await is_registered(m.from_user.id):
-        await state.clear()
-        await m.answer("Siz allaqachon ro‘yxatdan o‘tgansiz. ✅", reply_markup=main_menu())
-        return
     data = await state.get_data()
     canonical_name = data["full_name"]
-    if await is_name_taken(canonical_name):
-        await state.clear()
-        await m.answer("⚠️ Bu stipendiat allaqachon ro‘yxatdan o‘tgan.", reply_markup=main_menu())
-        return
+    # one round trip: the unique telegram_user_id and full_name_key constraints decide, not pre-checks
     try:
         rec = await register_user(
             uid=m.from_user.id,
@@ -149,6 +143,15 @@ async def got_university(m: Message, state: FSMContext):
             country=data["country"],
             university=university,
         )
+    except DatabaseUnavailable:
+        raise
+    except UniqueViolation as e:
+        await state.clear()
+        if e.field == "telegram_user_id":
+            await m.answer("Siz allaqachon ro‘yxatdan o‘tgansiz. ✅", reply_markup=main_menu())
+        else:
+            await m.answer("⚠️ Bu stipendiat allaqachon ro‘yxatdan o‘tgan.", reply_markup=main_menu())
+        return
     except Exception as e:
         logger.exception("Insert failed: %s", e)
         await m.answer("❌ Ro‘yxatdan o‘tishda xatolik yuz berdi. Birozdan so‘ng qayta urinib ko‘ring.")
@@ -172,6 +175,6 @@ async def show_menu(m: Message):
         return
     await m.answer("Asosiy menyu:", reply_markup=main_menu())
 
-@router.message(F.text == BTN_SUPPORT)
+@table.text(BTN_SUPPORT)
 async def contact_support(m: Message):
     await m.answer(f"Texnik yordam:\n{SUPPORT_CONTACT}")
\ No newline at end of file
@@ -1,25 +1,28 @@
 # app/handlers/services.py
-import asyncio
 import logging
 from typing import Dict, List
 
-from aiogram import F, Router
+from aiogram import Router
 from aiogram.types import Message
 
 from app.db import fetch_services_sync
 from app.constants import BTN_SERVICES
+from app.dispatch import table
+from app.repository import DatabaseUnavailable
+from app.executors import DB_READ, run_in
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 async def fetch_services() -> List[Dict]:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, fetch_services_sync)
+    return await run_in(DB_READ, fetch_services_sync)
 
-@router.message(F.text == BTN_SERVICES)
+@table.text(BTN_SERVICES)
 async def available_services(m: Message):
     try:
         services = await fetch_services()
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.exception("Xizmatlarni olishda xatolik: %s", e)
         await m.answer("Xizmatlarni hozircha yuklab bo‘lmadi.")
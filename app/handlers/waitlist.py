@@ -0,0 +1,113 @@
+# app/handlers/waitlist.py
+import logging
+from datetime import datetime
+
+from aiogram.types import CallbackQuery
+
+from app.config import UZ_TZ, WAITLIST_HOLD_MIN
+from app.constants import ARRIVAL_NOTE
+from app.dispatch import table
+from app.callbacks import WaitJoinCB, HoldAcceptCB, HoldDeclineCB
+from app.db import (
+    get_user_record_sync, get_active_booking_sync, get_service_sync, join_waitlist_sync,
+    get_waitlist_offer_sync, update_waitlist_sync, set_booking_status_sync
+)
+from app.repository import DatabaseUnavailable, UniqueViolation
+from app.executors import DB_READ, DB_WRITE, run_in
+from app.waitlist import capacity_freed
+
+logger = logging.getLogger(__name__)
+
+@table.callback(WaitJoinCB)
+async def join_waitlist(cq: CallbackQuery, callback_data: WaitJoinCB):
+    user = await run_in(DB_READ, get_user_record_sync, cq.from_user.id)
+    if not user:
+        await cq.answer("Avval /start orqali ro‘yxatdan o‘ting.", show_alert=True)
+        return
+    if await run_in(DB_READ, get_active_booking_sync, user["id"]):
+        await cq.answer("Sizda faol navbat bor. Uni yakunlang yoki bekor qiling.", show_alert=True)
+        return
+    d = callback_data.day
+    if d < datetime.now(UZ_TZ).date():
+        await cq.answer("Bu sana o‘tib ketgan.", show_alert=True)
+        return
+
+    try:
+        await run_in(DB_WRITE, join_waitlist_sync, user["id"], cq.from_user.id, callback_data.service_id, d)
+    except UniqueViolation:
+        await cq.answer("Siz bu kun uchun navbatda turibsiz.", show_alert=True)
+        return
+    except DatabaseUnavailable:
+        raise
+    except Exception as e:
+        logger.exception("Kutish ro‘yxatiga qo‘shishda xatolik: %s", e)
+        await cq.answer("Xatolik yuz berdi.", show_alert=True)
+        return
+
+    await cq.message.edit_text(
+        f"🔔 {d.strftime('%A, %d %b')} uchun kutish ro‘yxatiga qo‘shildingiz.\n\n"
+        f"Joy bo‘shasa xabar beramiz; taklifni {WAITLIST_HOLD_MIN} daqiqa ichida tasdiqlashingiz kerak bo‘ladi."
+    )
+    await cq.answer()
+
+async def _load_offer(cq: CallbackQuery, booking_id: str):
+    """The caller's open offer for `booking_id`, or None after answering the query."""
+    user = await run_in(DB_READ, get_user_record_sync, cq.from_user.id)
+    entry = await run_in(DB_READ, get_waitlist_offer_sync, booking_id)
+    if not user or not entry or entry["user_id"] != user["id"]:
+        await cq.answer("Taklif topilmadi.", show_alert=True)
+        return None
+    if entry["status"] != "offered":
+        await cq.answer("Bu taklif endi amal qilmaydi.", show_alert=True)
+        return None
+    return entry
+
+@table.callback(HoldAcceptCB)
+async def accept_offer(cq: CallbackQuery, callback_data: HoldAcceptCB):
+    booking_id = callback_data.booking_id
+    entry = await _load_offer(cq, booking_id)
+    if not entry:
+        return
+    if datetime.fromisoformat(entry["offer_expires_at"]) < datetime.now(UZ_TZ):
+        await cq.answer("Taklif muddati tugagan.", show_alert=True)
+        return
+    active = await run_in(DB_READ, get_active_booking_sync, entry["user_id"])
+    if active and active["id"] != booking_id:  # the hold itself counts as active
+        await cq.answer("Sizda boshqa faol navbat bor.", show_alert=True)
+        return
+
+    # the entry transition is the race with the sweeper; whoever moves it first decides
+    if not await run_in(DB_WRITE, update_waitlist_sync, entry["id"], "offered", {"status": "promoted"}):
+        await cq.answer("Bu taklif endi amal qilmaydi.", show_alert=True)
+        return
+    row = await run_in(DB_WRITE, set_booking_status_sync, booking_id, "held", "booked")
+    if not row:
+        await cq.answer("Navbatni tasdiqlab bo‘lmadi.", show_alert=True)
+        return
+
+    svc = await run_in(DB_READ, get_service_sync, row["service_id"])
+    s = datetime.fromisoformat(row["start_at"]).astimezone(UZ_TZ)
+    e = datetime.fromisoformat(row["end_at"]).astimezone(UZ_TZ)
+    await cq.message.edit_text(
+        "✅ Navbat tasdiqlandi!\n\n"
+        f"Xizmat: *{svc['name'] if svc else 'Xizmat'}*\n"
+        f"Vaqt: {s:%Y-%m-%d %H:%M}–{e:%H:%M} (Asia/Tashkent)\n",
+        parse_mode="Markdown",
+    )
+    await cq.message.answer(ARRIVAL_NOTE, parse_mode="Markdown", disable_web_page_preview=True)
+    await cq.answer()
+
+@table.callback(HoldDeclineCB)
+async def decline_offer(cq: CallbackQuery, callback_data: HoldDeclineCB):
+    booking_id = callback_data.booking_id
+    entry = await _load_offer(cq, booking_id)
+    if not entry:
+        return
+    if not await run_in(DB_WRITE, update_waitlist_sync, entry["id"], "offered", {"status": "declined"}):
+        await cq.answer("Bu taklif endi amal qilmaydi.", show_alert=True)
+        return
+    row = await run_in(DB_WRITE, set_booking_status_sync, booking_id, "held", "cancelled")
+    await cq.message.edit_text("Taklif rad etildi. Joy navbatdagi foydalanuvchiga beriladi.")
+    await cq.answer()
+    if row:
+        capacity_freed(cq.bot, row)
@@ -0,0 +1,87 @@
+# app/instrumentation.py
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.metrics import REGISTRY
+from app.repository.guarded import DatabaseUnavailable
+from app.tracing import Span, get_tracer
+
+# Round trips per handler invocation: 0..20 covers every handler we have
+DB_CALL_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+HANDLER_LATENCY = REGISTRY.histogram("handler_seconds", "Handler latency, from filter match to return")
+HANDLER_CALLS = REGISTRY.counter("handler_calls_total", "Handler invocations by outcome (ok, error, db_unavailable)")
+HANDLER_DB_CALLS = REGISTRY.histogram("handler_db_calls", "Database round trips per handler invocation",
+                                      buckets=DB_CALL_BUCKETS)
+DB_CALLS = REGISTRY.counter("db_calls_total", "Database round trips")
+DB_LATENCY = REGISTRY.histogram("db_call_seconds", "Database round-trip latency")
+
+# Set for the duration of a handler; the executors copy it into worker threads
+_handler: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("handler_stats", default=None)
+
+def current_handler() -> str:
+    stats = _handler.get()
+    return stats["name"] if stats else "-"
+
+def handler_name(data: Dict[str, Any]) -> str:
+    # table routes all go through DispatchTable._on_*; the real target is the resolved route
+    route = data.get("dispatch_route") or data.get("handler")
+    cb = getattr(route, "callback", None)
+    return getattr(cb, "__name__", None) or repr(cb)
+
+@contextmanager
+def db_call(backend: str, table: str = "?", shape: str = "", filters: str = ""):
+    """
+    Wrap one round trip in a tracing span, attributed to the handler and
+    update running in this context. The caller fills span.rows/bytes.
+    """
+    stats = _handler.get()
+    name = stats["name"] if stats else "-"
+    span = Span(backend, table, shape or table, filters, stats["update_id"] if stats else None, name)
+    t0 = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        span.duration = time.perf_counter() - t0
+        if stats is not None:
+            stats["db"] += 1
+        DB_CALLS.inc(handler=name, backend=backend)
+        DB_LATENCY.observe(span.duration, handler=name, backend=backend)
+        get_tracer().finish(span)
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware (runs only once a handler matched): latency, outcome and DB round trips per handler."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = handler_name(data)
+        update = data.get("event_update")
+        stats = {"name": name, "db": 0, "update_id": update.update_id if update else None}
+        token = _handler.set(stats)
+        outcome = "ok"
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except DatabaseUnavailable:
+            outcome = "db_unavailable"
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            _handler.reset(token)
+            HANDLER_LATENCY.observe(time.perf_counter() - t0, handler=name)
+            HANDLER_CALLS.inc(handler=name, outcome=outcome)
+            HANDLER_DB_CALLS.observe(stats["db"], handler=name)
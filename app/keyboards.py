@@ -1,13 +1,89 @@
 # app/keyboards.py
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta, date
+from typing import Callable, Dict, Hashable, List, Optional
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from app.config import UZ_TZ
+from app.metrics import REGISTRY
+from app.schedule import get_schedule, is_forbidden_date
+from app.callbacks import DayCB, AdminDayCB, TimeCB, ServiceCB, EarliestCB, WaitJoinCB, HoldAcceptCB, HoldDeclineCB
 from app.constants import (
     BTN_BOOK, BTN_MY, BTN_SERVICES, BTN_SUPPORT, BTN_SPECIAL_SERVICE,
     BTN_ALL_APPTS, BTN_ALL_STUDENTS, BTN_NOTIFY_ALL
 )
 
+KEYBOARD_CACHE = REGISTRY.counter("keyboard_cache_total", "Keyboard render cache lookups by keyboard and result (hit, miss)")
+
+# ----------------- Render cache -----------------
+class RenderCache:
+    """
+    Built markups by key, bounded LRU. Markups are shared between replies and
+    never mutated after building. Lookups pass a `scope` (for day pickers:
+    today's date and the schedule version); when it changes the entries
+    built under the old one are dropped, so pickers roll over at Tashkent
+    midnight and after a rules reload.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.hits = self.misses = 0
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._scope: Hashable = None
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], object], scope: Hashable = None):
+        with self._lock:
+            if scope != self._scope:
+                self._entries.clear()
+                self._scope = scope
+            markup = self._entries.get(key)
+            if markup is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if markup is not None:
+            KEYBOARD_CACHE.inc(keyboard=self.name, result="hit")
+            return markup
+        markup = build()
+        with self._lock:
+            self.misses += 1
+            if scope == self._scope:
+                self._entries[key] = markup
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        KEYBOARD_CACHE.inc(keyboard=self.name, result="miss")
+        return markup
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                    "hit_rate": self.hits / total if total else 0.0}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+STATIC_CACHE = RenderCache("static", 8)
+DAYS_CACHE = RenderCache("days", 64)
+TIMES_CACHE = RenderCache("times", 512)
+
+def _day_scope() -> tuple:
+    # day pickers depend on the date and on which days the rules close
+    return datetime.now(UZ_TZ).date(), get_schedule().version
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {c.name: c.stats() for c in (STATIC_CACHE, DAYS_CACHE, TIMES_CACHE)}
+
+# ----------------- Keyboards -----------------
 def main_menu() -> ReplyKeyboardMarkup:
+    return STATIC_CACHE.get("main", _main_menu)
+
+def admin_main_menu() -> ReplyKeyboardMarkup:
+    return STATIC_CACHE.get("admin", _admin_main_menu)
+
+def _main_menu() -> ReplyKeyboardMarkup:
     # User menu (includes the special service)
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -18,7 +94,7 @@ def main_menu() -> ReplyKeyboardMarkup:
         resize_keyboard=True,
     )
 
-def admin_main_menu() -> ReplyKeyboardMarkup:
+def _admin_main_menu() -> ReplyKeyboardMarkup:
     # Admin-only menu (no registration or booking)
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -29,44 +105,71 @@ def admin_main_menu() -> ReplyKeyboardMarkup:
         resize_keyboard=True,
     )
 
-def is_forbidden_date(d: date) -> bool:
-    if d.weekday() in (5, 6):
-        return True
-    if d.month == 9 and d.day == 1:
-        return True
-    return False
-
-def days_kb(n: int = 10) -> InlineKeyboardMarkup:
+def bookable_days(n: int = 10) -> List[date]:
     today = datetime.now(UZ_TZ).date()
-    rows, count, i = [], 0, 0
-    while count < n:
+    days, i = [], 0
+    while len(days) < n:
         d = today + timedelta(days=i); i += 1
         if is_forbidden_date(d): continue
-        rows.append([InlineKeyboardButton(text=d.strftime("%a %d %b"), callback_data=f"book:day:{d.isoformat()}")])
-        count += 1
+        days.append(d)
+    return days
+
+def days_kb(n: int = 10, service_id: str = None) -> InlineKeyboardMarkup:
+    return DAYS_CACHE.get(("user", n, service_id), lambda: _days_kb(n, service_id), _day_scope())
+
+def _days_kb(n: int, service_id: Optional[str]) -> InlineKeyboardMarkup:
+    rows = []
+    if service_id:
+        rows.append([InlineKeyboardButton(text="⚡ Eng yaqin bo‘sh vaqt", callback_data=EarliestCB.of(service_id).pack())])
+    for d in bookable_days(n):
+        rows.append([InlineKeyboardButton(text=d.strftime("%a %d %b"), callback_data=DayCB.of(d).pack())])
     rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data="book:back:menu")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 def admin_days_kb(n: int = 14) -> InlineKeyboardMarkup:
+    return DAYS_CACHE.get(("admin", n), lambda: _admin_days_kb(n), _day_scope())
+
+def _admin_days_kb(n: int) -> InlineKeyboardMarkup:
     today = datetime.now(UZ_TZ).date()
     rows, count, i = [], 0, 0
     while count < n:
         d = today + timedelta(days=i); i += 1
         if is_forbidden_date(d): continue
-        rows.append([InlineKeyboardButton(text=d.strftime("%a %d %b"), callback_data=f"all:day:{d.isoformat()}")])
+        rows.append([InlineKeyboardButton(text=d.strftime("%a %d %b"), callback_data=AdminDayCB.of(d).pack())])
         count += 1
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
-def times_kb(day: date, slots):
+def times_kb(day: date, slots, service_id: str = None):
+    # the same (day, free starts) comes up for every user until the next booking changes it
+    shown = tuple(slots[:40])
+    return TIMES_CACHE.get(("day", day, service_id, shown), lambda: _times_kb(day, shown, service_id))
+
+def _times_kb(day: date, slots, service_id: Optional[str]) -> InlineKeyboardMarkup:
     if not slots:
-        return InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Bo‘sh vaqtlar yo‘q", callback_data="noop")],
-            [InlineKeyboardButton(text="⬅️ Orqaga", callback_data=f"book:back:day:{day.isoformat()}")]
-        ])
+        rows = [[InlineKeyboardButton(text="Bo‘sh vaqtlar yo‘q", callback_data="noop")]]
+        if service_id:
+            rows.append([InlineKeyboardButton(text="🔔 Joy bo‘shasa xabar berish",
+                                              callback_data=WaitJoinCB.of(day, service_id).pack())])
+        rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=DayCB.of(day).pack())])
+        return InlineKeyboardMarkup(inline_keyboard=rows)
     rows = []
-    for t in slots[:40]:
+    for t in slots:
         label = t.strftime("%H:%M")
-        epoch = int(t.timestamp())
-        rows.append([InlineKeyboardButton(text=label, callback_data=f"book:time:{epoch}")])
-    rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=f"book:back:day:{day.isoformat()}")])
-    return InlineKeyboardMarkup(inline_keyboard=rows)
\ No newline at end of file
+        rows.append([InlineKeyboardButton(text=label, callback_data=TimeCB.of(t).pack())])
+    rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=DayCB.of(day).pack())])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def earliest_kb(slots, service_id: str) -> InlineKeyboardMarkup:
+    shown = tuple(slots)
+    return TIMES_CACHE.get(("earliest", service_id, shown), lambda: _earliest_kb(shown, service_id))
+
+def _earliest_kb(slots, service_id: str) -> InlineKeyboardMarkup:
+    rows = [[InlineKeyboardButton(text=t.strftime("%a %d %b, %H:%M"), callback_data=TimeCB.of(t).pack())] for t in slots]
+    rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=ServiceCB.of(service_id).pack())])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def offer_kb(booking_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="✅ Tasdiqlash", callback_data=HoldAcceptCB.of(booking_id).pack()),
+        InlineKeyboardButton(text="❌ Kerak emas", callback_data=HoldDeclineCB.of(booking_id).pack()),
+    ]])
@@ -0,0 +1,162 @@
+# app/metrics.py
+import bisect
+import threading
+from typing import Dict, List, Tuple
+
+# Latency buckets in seconds (Telegram API and DB calls are both in the 10ms..10s range)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Counter:
+    """Monotonic counter split by label values."""
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+class Gauge:
+    """Point-in-time value split by label values (queue depth, busy workers)."""
+
+    def __init__(self, name: str, doc: str):
+        self.name = name
+        self.doc = doc
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+class Histogram:
+    """Cumulative-bucket histogram split by label values."""
+
+    def __init__(self, name: str, doc: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[idx] += 1
+            self._values[key] = (counts, total + value)
+
+    def snapshot(self) -> Dict[LabelKey, Tuple[List[int], float]]:
+        with self._lock:
+            return {k: (list(c), s) for k, (c, s) in self._values.items()}
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, doc: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, doc, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, doc: str) -> Counter:
+        return self._get_or_create(Counter, name, doc)
+
+    def gauge(self, name: str, doc: str) -> Gauge:
+        return self._get_or_create(Gauge, name, doc)
+
+    def histogram(self, name: str, doc: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, doc, buckets=buckets)
+
+    def metrics(self) -> List[object]:
+        with self._lock:
+            return list(self._metrics.values())
+
+REGISTRY = Registry()
+
+# ----------------- Prometheus exposition -----------------
+def _fmt_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+def _fmt_value(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+def render_prometheus(registry: "Registry" = None) -> str:
+    """Text exposition format 0.0.4."""
+    registry = registry or REGISTRY
+    out: List[str] = []
+    for m in sorted(registry.metrics(), key=lambda m: m.name):
+        kind = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}[type(m)]
+        out.append(f"# HELP {m.name} {m.doc}")
+        out.append(f"# TYPE {m.name} {kind}")
+        if isinstance(m, Histogram):
+            for key, (counts, total) in sorted(m.snapshot().items()):
+                running = 0
+                for bound, c in zip(m.buckets + (float("inf"),), counts):
+                    running += c
+                    le = "+Inf" if bound == float("inf") else _fmt_value(bound)
+                    out.append(f"{m.name}_bucket{_fmt_labels(key, (('le', le),))} {running}")
+                out.append(f"{m.name}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+                out.append(f"{m.name}_count{_fmt_labels(key)} {running}")
+        else:
+            for key, v in sorted(m.snapshot().items()):
+                out.append(f"{m.name}{_fmt_labels(key)} {_fmt_value(v)}")
+    return "\n".join(out) + "\n"
+
+async def start_metrics_server(host: str, port: int):
+    """Serve GET /metrics on host:port; returns the aiohttp runner (call .cleanup() on shutdown)."""
+    from aiohttp import web
+
+    async def handle(_request):
+        return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,128 @@
+# app/profiling.py
+import asyncio
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# longest first, so site-packages wins over the stdlib directory that contains it
+_PREFIXES = sorted({_ROOT, *(sysconfig.get_paths()[k] for k in ("purelib", "platlib", "stdlib"))},
+                   key=len, reverse=True)
+
+def short_path(path: str) -> str:
+    for prefix in _PREFIXES:
+        if path.startswith(prefix + os.sep):
+            return path[len(prefix) + 1:]
+    return path
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler over every Python thread (event loop and executor
+    workers alike) via sys._current_frames(). Output is the collapsed-stack
+    format ("thread;outer;...;inner count") read by flamegraph.pl and
+    speedscope. Idle workers show up parked in their queue wait.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def run(self, seconds: float) -> None:
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def hottest(self, n: int = 5) -> List[Tuple[str, int]]:
+        """Leaf frames with the most samples, across all threads."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+_profile_lock = asyncio.Lock()
+
+async def profile(seconds: float, interval: float = 0.005) -> SamplingProfiler:
+    """Sample for `seconds` on a dedicated thread (not a pool worker, so the pools are profiled as they are)."""
+    if _profile_lock.locked():
+        raise RuntimeError("A profile is already running")
+    async with _profile_lock:
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        prof = SamplingProfiler(interval)
+
+        def target():
+            try:
+                prof.run(seconds)
+            finally:
+                loop.call_soon_threadsafe(done.set_result, None)
+
+        threading.Thread(target=target, name="sampling-profiler", daemon=True).start()
+        await done
+        return prof
+
+# ----------------- tracemalloc -----------------
+# snapshots and diffs walk every trace; callers run these on the cpu pool, never on the loop
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+_mem_lock = threading.Lock()
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def mem_start(frames: int = 10) -> None:
+    global _last_snapshot
+    with _mem_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _last_snapshot = _filtered(tracemalloc.take_snapshot())
+
+def mem_stop() -> None:
+    global _last_snapshot
+    with _mem_lock:
+        tracemalloc.stop()
+        _last_snapshot = None
+
+def mem_diff(top: int = 15) -> Dict:
+    """Snapshot now and diff against the previous snapshot; the new one becomes the baseline."""
+    global _last_snapshot
+    with _mem_lock:
+        if not tracemalloc.is_tracing() or _last_snapshot is None:
+            raise RuntimeError("tracemalloc is not running")
+        snap = _filtered(tracemalloc.take_snapshot())
+        stats = snap.compare_to(_last_snapshot, "lineno")
+        _last_snapshot = snap
+        current, peak = tracemalloc.get_traced_memory()
+    growth = [s for s in stats if s.size_diff > 0][:top]
+    return {
+        "current": current,
+        "peak": peak,
+        "rows": [(f"{short_path(s.traceback[0].filename)}:{s.traceback[0].lineno}", s.size_diff, s.size, s.count_diff)
+                 for s in growth],
+    }
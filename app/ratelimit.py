@@ -0,0 +1,169 @@
+# app/ratelimit.py
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetUpdates
+
+from app.config import TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_MAX_RETRIES
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower value is served first
+LANE_INTERACTIVE = 0
+LANE_BULK = 1
+
+_lane: contextvars.ContextVar[int] = contextvars.ContextVar("tg_lane", default=LANE_INTERACTIVE)
+
+@contextmanager
+def bulk_lane():
+    """Send everything inside the block (broadcasts, admin fan-out) behind interactive replies."""
+    token = _lane.set(LANE_BULK)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+TG_LATENCY = REGISTRY.histogram("tg_request_seconds", "Telegram Bot API call latency")
+TG_WAIT = REGISTRY.histogram("tg_throttle_wait_seconds", "Time spent waiting for a rate limit token")
+TG_ERRORS = REGISTRY.counter("tg_request_errors_total", "Telegram Bot API call errors")
+TG_RETRIES = REGISTRY.counter("tg_retry_after_total", "Telegram 429 responses retried after retry_after")
+
+class PriorityTokenBucket:
+    """
+    Token bucket whose waiters are served strictly by (lane, arrival order),
+    so a queued broadcast never overtakes an interactive reply.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return not self._waiters and self._tokens >= self.burst
+
+    async def acquire(self, lane: int) -> None:
+        entry = (lane, next(self._seq))
+        async with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    is_head = self._waiters[0] is entry
+                    if is_head and now >= self._paused_until and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self._cond.notify_all()
+                        return
+                    timeout = None
+                    if is_head:
+                        timeout = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.001)
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+class ThrottlingRequestMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware: every outgoing Bot API call goes through a global bucket
+    and, when it targets a chat, a per-chat bucket. 429s are retried after
+    `retry_after` and pause the affected bucket: the chat's bucket for a call
+    that targets a chat, the global bucket otherwise.
+    """
+
+    MAX_CHAT_BUCKETS = 10_000
+
+    def __init__(
+        self,
+        global_rate: float = TG_GLOBAL_RATE,
+        chat_rate: float = TG_CHAT_RATE,
+        chat_burst: float = TG_CHAT_BURST,
+        max_retries: int = TG_MAX_RETRIES,
+    ):
+        self.global_bucket = PriorityTokenBucket(global_rate, max(global_rate, 1.0))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[int, PriorityTokenBucket] = {}
+
+    def _chat_bucket(self, chat_id) -> Optional[PriorityTokenBucket]:
+        if not isinstance(chat_id, int):
+            return None
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if not b.idle}
+            bucket = PriorityTokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        if isinstance(method, GetUpdates):
+            # Long polling must never queue behind outgoing traffic
+            return await make_request(bot, method)
+
+        lane = _lane.get()
+        chat_bucket = self._chat_bucket(getattr(method, "chat_id", None))
+        attempt = 0
+        while True:
+            t_wait = time.monotonic()
+            if chat_bucket is not None:
+                await chat_bucket.acquire(lane)
+            await self.global_bucket.acquire(lane)
+            t0 = time.monotonic()
+            TG_WAIT.observe(t0 - t_wait, lane="bulk" if lane == LANE_BULK else "interactive")
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                TG_LATENCY.observe(time.monotonic() - t0, method=name)
+                TG_ERRORS.inc(method=name, error="TelegramRetryAfter")
+                # a chat-targeted 429 is that chat's limit; freezing the global bucket would
+                # stall every other user behind one broadcast recipient
+                if chat_bucket is not None:
+                    chat_bucket.pause(e.retry_after)
+                else:
+                    self.global_bucket.pause(e.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                TG_RETRIES.inc(method=name)
+                logger.warning("Telegram 429 on %s, retrying in %ss (attempt %d)", name, e.retry_after, attempt)
+                continue
+            except Exception as e:
+                TG_LATENCY.observe(time.monotonic() - t0, method=name)
+                TG_ERRORS.inc(method=name, error=type(e).__name__)
+                raise
+            TG_LATENCY.observe(time.monotonic() - t0, method=name)
+            return result
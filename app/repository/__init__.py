@@ -0,0 +1,58 @@
+# app/repository/__init__.py
+import asyncio
+import threading
+from typing import List, Optional
+
+from app.repository.base import Repository, UniqueViolation
+from app.repository.guarded import DatabaseUnavailable
+
+_repo: Optional[Repository] = None
+_lock = threading.Lock()
+
+def _build() -> Repository:
+    from app.config import DB_BACKEND, SQLITE_PATH
+    if DB_BACKEND == "sqlite":
+        from app.repository.sqlite_repo import SqliteRepository
+        return SqliteRepository(SQLITE_PATH)
+    if DB_BACKEND == "supabase":
+        from app.config import get_supabase, DB_REPLICA, DB_BREAKER
+        from app.repository.supabase_repo import SupabaseRepository
+        primary = SupabaseRepository(get_supabase())
+        if DB_BREAKER:
+            from app.config import DB_CALL_TIMEOUT, DB_BREAKER_FAILURES, DB_BREAKER_RESET, CANCEL_JOURNAL_PATH
+            from app.repository.guarded import GuardedRepository
+            primary = GuardedRepository(primary, call_timeout=DB_CALL_TIMEOUT, failure_threshold=DB_BREAKER_FAILURES,
+                                        reset_timeout=DB_BREAKER_RESET, journal_path=CANCEL_JOURNAL_PATH)
+        if not DB_REPLICA:
+            return primary
+        from app.config import REPLICA_PATH, REPLICA_MAX_STALENESS, REPLICA_SAFETY_LAG
+        from app.repository.replica import ReplicaRepository
+        from app.repository.sqlite_repo import SqliteRepository
+        return ReplicaRepository(primary, SqliteRepository(REPLICA_PATH, foreign_keys=False),
+                                 max_staleness=REPLICA_MAX_STALENESS, safety_lag=REPLICA_SAFETY_LAG)
+    raise SystemExit(f"Unknown DB_BACKEND {DB_BACKEND!r} (expected 'supabase' or 'sqlite')")
+
+def get_repository() -> Repository:
+    global _repo
+    if _repo is None:
+        with _lock:
+            if _repo is None:
+                _repo = _build()
+    return _repo
+
+def set_repository(repo: Repository) -> None:
+    """Swap the backend (benchmarks, offline runs)."""
+    global _repo
+    with _lock:
+        _repo = repo
+
+def start_background_tasks() -> List[asyncio.Task]:
+    """Called once the event loop runs (bot.main); keeps the read replica in sync."""
+    from app.repository.replica import ReplicaRepository
+    repo = get_repository()
+    if not isinstance(repo, ReplicaRepository):
+        return []
+    from app.config import REPLICA_SYNC_INTERVAL
+    return [asyncio.create_task(repo.run_sync_loop(REPLICA_SYNC_INTERVAL), name="replica-sync")]
+
+__all__ = ["Repository", "DatabaseUnavailable", "UniqueViolation", "get_repository", "set_repository", "start_background_tasks"]
@@ -0,0 +1,129 @@
+# app/repository/base.py
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+# values of these columns never reach query spans (slow-query log, /slow)
+PERSONAL_COLUMNS = ("full_name", "full_name_key", "email", "phone")
+
+class UniqueViolation(Exception):
+    """An insert hit a unique constraint; `field` is the column that clashed."""
+
+    def __init__(self, field: str, message: str = ""):
+        super().__init__(message or f"duplicate {field}")
+        self.field = field
+
+class Repository(ABC):
+    """
+    Every query the bot runs, grouped by table. Rows are plain dicts shaped
+    like the Supabase responses (timestamps as ISO strings), so handlers do
+    not care which backend is behind it.
+
+    Booking semantics shared by all backends: a booking is *active* while
+    its status is "booked" and its end_at is still in the future; day
+    occupancy counts every booking that overlaps the day unless it is
+    "cancelled" (so "held" waitlist offers take capacity too).
+    """
+
+    # --- Users ---
+    @abstractmethod
+    def is_registered(self, telegram_user_id: int) -> bool: ...
+
+    @abstractmethod
+    def is_name_taken(self, canonical_full_name: str) -> bool: ...
+
+    @abstractmethod
+    def register_user(self, telegram_user_id: int, full_name: str, phone: str, email: str,
+                      country: str, university: str) -> Dict:
+        """
+        One insert, no pre-checks. Raises UniqueViolation("telegram_user_id")
+        if this account is registered and UniqueViolation("full_name_key") if
+        the normalized name is.
+        """
+
+    @abstractmethod
+    def fetch_registered_names(self) -> List[str]:
+        """full_name of every registered user (for the in-memory name index)."""
+
+    @abstractmethod
+    def get_user_record(self, telegram_user_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def fetch_user_names(self, user_ids: List[str]) -> Dict[str, str]: ...
+
+    @abstractmethod
+    def fetch_all_users(self) -> List[Dict]: ...
+
+    @abstractmethod
+    def fetch_user_telegram_ids(self) -> List[int]: ...
+
+    # --- Services ---
+    @abstractmethod
+    def fetch_services(self) -> List[Dict]: ...
+
+    @abstractmethod
+    def get_service(self, svc_id: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def fetch_service_names(self, svc_ids: List[str]) -> Dict[str, str]: ...
+
+    # --- Bookings ---
+    @abstractmethod
+    def fetch_bookings_overlapping(self, start: datetime, end: datetime) -> List[Dict]: ...
+
+    @abstractmethod
+    def fetch_bookings_starting_between(self, start: datetime, end: datetime) -> List[Dict]: ...
+
+    @abstractmethod
+    def fetch_user_bookings(self, user_id: str) -> List[Dict]: ...
+
+    @abstractmethod
+    def get_user_booking(self, booking_id: str, user_id: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    def get_active_booking(self, user_id: str, now: datetime) -> Optional[Dict]:
+        """A booked or held (waitlist offer) booking of the user ending after `now`."""
+
+    @abstractmethod
+    def has_service_booking_between(self, user_id: str, service_id: str, start: datetime, end: datetime) -> bool:
+        """Booked or held, not cancelled: a cancelled row does not block booking the service again."""
+
+    @abstractmethod
+    def create_booking(self, user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                       status: str = "booked", resource_id: Optional[str] = None) -> Dict:
+        """`resource_id` is the staff member / desk the schedule assigned (app/schedule.py); None when unassigned."""
+
+    @abstractmethod
+    def set_booking_status(self, booking_id: str, from_status: str, to_status: str) -> Optional[Dict]:
+        """Conditional flip (e.g. a waitlist hold to "booked"); None if the booking was not in `from_status`."""
+
+    @abstractmethod
+    def cancel_booking(self, booking_id: str, user_id: str, ends_after: Optional[datetime] = None) -> Optional[Dict]:
+        """Flip a still-"booked" booking to "cancelled"; returns the updated row, or None if nothing matched."""
+
+    # --- Waitlist ---
+    @abstractmethod
+    def join_waitlist(self, user_id: str, telegram_user_id: int, service_id: str, day: date) -> Dict:
+        """Raises UniqueViolation if the user is already waiting (or holding an offer) for that service and day."""
+
+    @abstractmethod
+    def fetch_waitlist(self, day: Optional[date] = None) -> List[Dict]:
+        """Entries still "waiting" (for `day`, or every day), oldest first."""
+
+    @abstractmethod
+    def update_waitlist(self, entry_id: str, from_status: str, changes: Dict) -> Optional[Dict]:
+        """Apply `changes` only if the entry is still in `from_status`; None otherwise."""
+
+    @abstractmethod
+    def get_waitlist_offer(self, booking_id: str) -> Optional[Dict]:
+        """The entry whose hold is `booking_id`."""
+
+    @abstractmethod
+    def fetch_expired_offers(self, now: datetime) -> List[Dict]:
+        """Entries in "offered" whose hold ran out before `now`."""
+
+    # --- Replication ---
+    @abstractmethod
+    def fetch_changes(self, table: str, since_ts: Optional[str], since_id: Optional[str], limit: int = 1000) -> List[Dict]:
+        """Full rows of `table` with (updated_at, id) strictly after the watermark, in that order
+        (`since_id` None: every row with updated_at at or after `since_ts`)."""
@@ -0,0 +1,338 @@
+# app/repository/guarded.py
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from app.metrics import REGISTRY
+from app.repository.base import Repository, UniqueViolation
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+DB_BREAKER_TRANSITIONS = REGISTRY.counter("db_breaker_transitions_total", "Circuit breaker state changes")
+DB_REJECTED = REGISTRY.counter("db_calls_rejected_total", "Calls refused while the breaker was open")
+DB_TIMEOUTS = REGISTRY.counter("db_call_timeouts_total", "Calls abandoned at the deadline")
+DB_SNAPSHOT_READS = REGISTRY.counter("db_snapshot_reads_total", "Reads answered from the last-known snapshot")
+DB_JOURNALED = REGISTRY.counter("db_journaled_cancellations_total", "Cancellations journaled for replay")
+
+class DatabaseUnavailable(RuntimeError):
+    """The backend is down or too slow and there is no snapshot to answer from."""
+
+_TRANSPORT_ERRORS = ("TransportError", "TimeoutException")
+
+def _is_outage(exc: BaseException) -> bool:
+    # Only a backend we could not reach counts: connection and timeout errors from httpx
+    # (matched by name so importing this module does not pull it in) or from the socket layer.
+    # A PostgREST error response, a constraint violation or a bug in our own code is not.
+    if isinstance(exc, OSError):
+        return True
+    return any(c.__name__ in _TRANSPORT_ERRORS and c.__module__.startswith("httpx") for c in type(exc).__mro__)
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. After `failure_threshold` outages in a row it
+    opens and refuses calls for `reset_timeout` seconds, then lets a single
+    probe through (half-open); the probe's result closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.on_close = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            recovered = self.state != CLOSED
+            if recovered:
+                self._set(CLOSED)
+        if recovered and self.on_close:
+            self.on_close()
+
+    def release(self) -> None:
+        """The call ended without telling whether the backend is up; let the next probe through."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._set(OPEN)
+
+    def _set(self, state: str) -> None:
+        logger.warning("DB circuit breaker: %s -> %s", self.state, state)
+        self.state = state
+        DB_BREAKER_TRANSITIONS.inc(state=state)
+
+class CancelJournal:
+    """Append-only JSONL of cancellations accepted while the backend was down."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def pending(self) -> List[Dict]:
+        with self._lock:
+            if not os.path.exists(self.path):
+                return []
+            with open(self.path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+    def drop(self, count: int) -> None:
+        """Remove the first `count` entries (the ones replayed), keeping anything appended since."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, encoding="utf-8") as f:
+                rest = [line for line in f if line.strip()][count:]
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(rest)
+            os.replace(tmp, self.path)
+
+class GuardedRepository(Repository):
+    """
+    Puts a deadline and a circuit breaker in front of a backend.
+
+    Every call runs on a private pool and the caller waits at most
+    `call_timeout` seconds, so a hung HTTP request can no longer pin the
+    handler's executor thread. Successful reads are remembered (bounded LRU
+    keyed by method and arguments); while the breaker is open, or when a
+    read fails, the last-known result is served instead. Writes without a
+    fallback raise DatabaseUnavailable, except cancellations, which are
+    journaled and replayed once the breaker closes again.
+    """
+
+    def __init__(self, inner: Repository, call_timeout: float = 5.0, failure_threshold: int = 5,
+                 reset_timeout: float = 15.0, journal_path: str = "cancel_journal.jsonl",
+                 snapshot_size: int = 4096, workers: int = 16):
+        self.inner = inner
+        self.call_timeout = call_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.breaker.on_close = self._schedule_replay
+        self.journal = CancelJournal(journal_path)
+        self._snapshots: "OrderedDict[tuple, object]" = OrderedDict()
+        self._snapshot_size = snapshot_size
+        self._snap_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-guard")
+        self._replaying = threading.Lock()
+        if self.journal.pending():
+            self._schedule_replay()
+
+    # --- Plumbing ---
+    def _call(self, name: str, *args):
+        if not self.breaker.allow():
+            DB_REJECTED.inc(method=name)
+            raise DatabaseUnavailable(f"{name}: circuit open")
+        # copy the context so the round trip is still attributed to the calling handler
+        future = self._pool.submit(contextvars.copy_context().run, getattr(self.inner, name), *args)
+        try:
+            result = future.result(timeout=self.call_timeout)
+        except FutureTimeout:
+            future.cancel()
+            DB_TIMEOUTS.inc(method=name)
+            self.breaker.record_failure()
+            raise DatabaseUnavailable(f"{name}: no answer within {self.call_timeout}s")
+        except Exception as e:
+            if _is_outage(e):
+                self.breaker.record_failure()
+                raise DatabaseUnavailable(f"{name}: {e}") from e
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _read(self, name: str, *args, key: Optional[tuple] = None):
+        key = (name, *args) if key is None else key
+        try:
+            result = self._call(name, *args)
+        except DatabaseUnavailable:
+            with self._snap_lock:
+                if key not in self._snapshots:
+                    raise
+                DB_SNAPSHOT_READS.inc(method=name)
+                return self._snapshots[key]
+        with self._snap_lock:
+            self._snapshots[key] = result
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self._snapshot_size:
+                self._snapshots.popitem(last=False)
+        return result
+
+    def _snapshot(self, key: tuple):
+        with self._snap_lock:
+            return self._snapshots.get(key)
+
+    def _schedule_replay(self) -> None:
+        threading.Thread(target=self.replay_journal, name="cancel-journal-replay", daemon=True).start()
+
+    def replay_journal(self) -> int:
+        """Apply journaled cancellations in order; stops at the first outage. Returns how many were applied."""
+        if not self._replaying.acquire(blocking=False):
+            return 0
+        try:
+            done = 0
+            for entry in self.journal.pending():
+                ends_after = datetime.fromisoformat(entry["ends_after"]) if entry.get("ends_after") else None
+                try:
+                    self._call("cancel_booking", entry["booking_id"], entry["user_id"], ends_after)
+                except DatabaseUnavailable:
+                    break
+                except Exception:
+                    logger.exception("Dropping journaled cancellation %s", entry["booking_id"])
+                done += 1
+            if done:
+                self.journal.drop(done)
+                logger.info("Replayed %d journaled cancellations", done)
+            return done
+        finally:
+            self._replaying.release()
+
+    # --- Users ---
+    def is_registered(self, telegram_user_id: int) -> bool:
+        return self._read("is_registered", telegram_user_id)
+
+    def is_name_taken(self, canonical_full_name: str) -> bool:
+        return self._call("is_name_taken", canonical_full_name)
+
+    def register_user(self, telegram_user_id: int, full_name: str, phone: str, email: str,
+                      country: str, university: str) -> Dict:
+        return self._call("register_user", telegram_user_id, full_name, phone, email, country, university)
+
+    def fetch_registered_names(self) -> List[str]:
+        return self._read("fetch_registered_names")
+
+    def get_user_record(self, telegram_user_id: int) -> Optional[Dict]:
+        return self._read("get_user_record", telegram_user_id)
+
+    def fetch_user_names(self, user_ids: List[str]) -> Dict[str, str]:
+        return self._read("fetch_user_names", tuple(user_ids))
+
+    def fetch_all_users(self) -> List[Dict]:
+        return self._read("fetch_all_users")
+
+    def fetch_user_telegram_ids(self) -> List[int]:
+        return self._read("fetch_user_telegram_ids")
+
+    # --- Services ---
+    def fetch_services(self) -> List[Dict]:
+        return self._read("fetch_services")
+
+    def get_service(self, svc_id: str) -> Optional[Dict]:
+        return self._read("get_service", svc_id)
+
+    def fetch_service_names(self, svc_ids: List[str]) -> Dict[str, str]:
+        return self._read("fetch_service_names", tuple(svc_ids))
+
+    # --- Bookings ---
+    def fetch_bookings_overlapping(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._read("fetch_bookings_overlapping", start, end)
+
+    def fetch_bookings_starting_between(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._read("fetch_bookings_starting_between", start, end)
+
+    def fetch_user_bookings(self, user_id: str) -> List[Dict]:
+        return self._read("fetch_user_bookings", user_id)
+
+    def get_user_booking(self, booking_id: str, user_id: str) -> Optional[Dict]:
+        try:
+            return self._read("get_user_booking", booking_id, user_id)
+        except DatabaseUnavailable:
+            # the "my bookings" list the user pressed the button on is usually cached
+            rows = self._snapshot(("fetch_user_bookings", user_id))
+            match = next((r for r in rows or [] if r["id"] == booking_id), None)
+            if match is None:
+                raise
+            return match
+
+    def get_active_booking(self, user_id: str, now: datetime) -> Optional[Dict]:
+        # `now` differs on every call, so the snapshot is per user and re-checked against it
+        row = self._read("get_active_booking", user_id, now, key=("get_active_booking", user_id))
+        if row and datetime.fromisoformat(row["end_at"]) <= now:
+            return None
+        return row
+
+    def has_service_booking_between(self, user_id: str, service_id: str, start: datetime, end: datetime) -> bool:
+        return self._call("has_service_booking_between", user_id, service_id, start, end)
+
+    def create_booking(self, user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                       status: str = "booked", resource_id: Optional[str] = None) -> Dict:
+        return self._call("create_booking", user_id, service_id, start_at, end_at, status, resource_id)
+
+    def set_booking_status(self, booking_id: str, from_status: str, to_status: str) -> Optional[Dict]:
+        return self._call("set_booking_status", booking_id, from_status, to_status)
+
+    def cancel_booking(self, booking_id: str, user_id: str, ends_after: Optional[datetime] = None) -> Optional[Dict]:
+        try:
+            return self._call("cancel_booking", booking_id, user_id, ends_after)
+        except DatabaseUnavailable:
+            pass
+        self.journal.append({
+            "booking_id": booking_id,
+            "user_id": user_id,
+            "ends_after": ends_after.isoformat() if ends_after else None,
+            "journaled_at": datetime.now().astimezone().isoformat(),
+        })
+        DB_JOURNALED.inc()
+        # keep the cached views consistent with what the user was just told
+        with self._snap_lock:
+            for key, rows in self._snapshots.items():
+                if key[0] == "fetch_user_bookings" and key[1] == user_id:
+                    self._snapshots[key] = [dict(r, status="cancelled") if r["id"] == booking_id else r
+                                            for r in rows]
+            self._snapshots.pop(("get_active_booking", user_id), None)
+        return {"id": booking_id, "user_id": user_id, "status": "cancelled", "journaled": True}
+
+    # --- Waitlist ---
+    # not snapshotted: offers and promotions must see the live state
+    def join_waitlist(self, user_id: str, telegram_user_id: int, service_id: str, day: date) -> Dict:
+        return self._call("join_waitlist", user_id, telegram_user_id, service_id, day)
+
+    def fetch_waitlist(self, day: Optional[date] = None) -> List[Dict]:
+        return self._call("fetch_waitlist", day)
+
+    def update_waitlist(self, entry_id: str, from_status: str, changes: Dict) -> Optional[Dict]:
+        return self._call("update_waitlist", entry_id, from_status, changes)
+
+    def get_waitlist_offer(self, booking_id: str) -> Optional[Dict]:
+        return self._call("get_waitlist_offer", booking_id)
+
+    def fetch_expired_offers(self, now: datetime) -> List[Dict]:
+        return self._call("fetch_expired_offers", now)
+
+    # --- Replication ---
+    def fetch_changes(self, table: str, since_ts: Optional[str], since_id: Optional[str], limit: int = 1000) -> List[Dict]:
+        return self._call("fetch_changes", table, since_ts, since_id, limit)
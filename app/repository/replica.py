@@ -0,0 +1,207 @@
+# app/repository/replica.py
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.repository.base import Repository
+from app.repository.sqlite_repo import SqliteRepository
+from app.executors import DB_READ, run_in
+
+logger = logging.getLogger(__name__)
+
+REPLICATED_TABLES = ("app_user", "service", "booking")
+
+def _wm_key(ts: Optional[str], row_id: Optional[str]):
+    if not ts:
+        return None
+    at = datetime.fromisoformat(ts)
+    return (at if at.tzinfo else at.replace(tzinfo=timezone.utc)), row_id or ""
+
+class ReplicaRepository(Repository):
+    """
+    Supabase stays the primary; `local` is an SQLite mirror of app_user,
+    service and booking. Reads are answered from the mirror while the last
+    completed sync is younger than `max_staleness` seconds, otherwise they go
+    to the primary. Writes always go to the primary and the returned row is
+    written through to the mirror, so a user sees their own change at once.
+
+    The mirror is kept current by pulling rows whose (updated_at, id) is past
+    a per-table watermark. updated_at is stamped when the writing transaction
+    starts, so rows do not become visible in that order: a row committed just
+    after a newer one would sit behind the watermark forever. Each pass
+    therefore re-pulls from `safety_lag` seconds before the watermark (the
+    upsert is idempotent); the lag must exceed the longest write transaction.
+    Deletes on the primary are not replicated (the bot never deletes).
+    """
+
+    def __init__(self, primary: Repository, local: SqliteRepository, max_staleness: float = 30.0,
+                 page_size: int = 1000, safety_lag: float = 60.0):
+        self.primary = primary
+        self.local = local
+        self.max_staleness = max_staleness
+        self.page_size = page_size
+        self.safety_lag = safety_lag
+        self._synced_at: Optional[float] = None
+        self._sync_lock = threading.Lock()
+
+    # --- Sync ---
+    def sync_once(self) -> int:
+        """Pull everything past the watermarks; returns the number of rows applied."""
+        with self._sync_lock:
+            started = time.monotonic()
+            applied = 0
+            for table in REPLICATED_TABLES:
+                mark_ts, mark_id = self.local.get_watermark(table)
+                mark = _wm_key(mark_ts, mark_id)
+                since_ts, since_id = self._rewind(mark_ts, mark_id)
+                while True:
+                    rows = self.primary.fetch_changes(table, since_ts, since_id, self.page_size)
+                    if not rows:
+                        break
+                    self.local.upsert_rows(table, rows)
+                    last = rows[-1]
+                    since_ts, since_id = last["updated_at"], last["id"]
+                    if mark is None or _wm_key(since_ts, since_id) > mark:
+                        mark = _wm_key(since_ts, since_id)
+                        self.local.set_watermark(table, since_ts, since_id)
+                    applied += len(rows)
+                    if len(rows) < self.page_size:
+                        break
+            # staleness is measured from the start of the pass: anything committed later may be missing
+            self._synced_at = started
+            return applied
+
+    def _rewind(self, ts: Optional[str], row_id: Optional[str]):
+        """Where a pass starts: `safety_lag` seconds before the watermark, by time alone."""
+        if not ts or self.safety_lag <= 0:
+            return ts, row_id
+        return (datetime.fromisoformat(ts) - timedelta(seconds=self.safety_lag)).isoformat(), None
+
+    @property
+    def staleness(self) -> Optional[float]:
+        return None if self._synced_at is None else time.monotonic() - self._synced_at
+
+    @property
+    def fresh(self) -> bool:
+        s = self.staleness
+        return s is not None and s <= self.max_staleness
+
+    def _reader(self) -> Repository:
+        return self.local if self.fresh else self.primary
+
+    async def run_sync_loop(self, interval: float) -> None:
+        while True:
+            try:
+                n = await run_in(DB_READ, self.sync_once)
+                if n:
+                    logger.debug("Replica applied %d rows", n)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Replica sync failed; reads fall back to the primary once stale")
+            await asyncio.sleep(interval)
+
+    def _write_through(self, table: str, row: Optional[Dict]) -> None:
+        if not row:
+            return
+        try:
+            self.local.upsert_rows(table, [row])
+        except Exception:
+            # the next incremental pull repairs the mirror
+            logger.exception("Replica write-through to %s failed", table)
+
+    # --- Users ---
+    def is_registered(self, telegram_user_id: int) -> bool:
+        return self._reader().is_registered(telegram_user_id)
+
+    def is_name_taken(self, canonical_full_name: str) -> bool:
+        return self._reader().is_name_taken(canonical_full_name)
+
+    def register_user(self, telegram_user_id: int, full_name: str, phone: str, email: str,
+                      country: str, university: str) -> Dict:
+        row = self.primary.register_user(telegram_user_id, full_name, phone, email, country, university)
+        self._write_through("app_user", row)
+        return row
+
+    def fetch_registered_names(self) -> List[str]:
+        return self._reader().fetch_registered_names()
+
+    def get_user_record(self, telegram_user_id: int) -> Optional[Dict]:
+        return self._reader().get_user_record(telegram_user_id)
+
+    def fetch_user_names(self, user_ids: List[str]) -> Dict[str, str]:
+        return self._reader().fetch_user_names(user_ids)
+
+    def fetch_all_users(self) -> List[Dict]:
+        return self._reader().fetch_all_users()
+
+    def fetch_user_telegram_ids(self) -> List[int]:
+        return self._reader().fetch_user_telegram_ids()
+
+    # --- Services ---
+    def fetch_services(self) -> List[Dict]:
+        return self._reader().fetch_services()
+
+    def get_service(self, svc_id: str) -> Optional[Dict]:
+        return self._reader().get_service(svc_id)
+
+    def fetch_service_names(self, svc_ids: List[str]) -> Dict[str, str]:
+        return self._reader().fetch_service_names(svc_ids)
+
+    # --- Bookings ---
+    def fetch_bookings_overlapping(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._reader().fetch_bookings_overlapping(start, end)
+
+    def fetch_bookings_starting_between(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._reader().fetch_bookings_starting_between(start, end)
+
+    def fetch_user_bookings(self, user_id: str) -> List[Dict]:
+        return self._reader().fetch_user_bookings(user_id)
+
+    def get_user_booking(self, booking_id: str, user_id: str) -> Optional[Dict]:
+        return self._reader().get_user_booking(booking_id, user_id)
+
+    def get_active_booking(self, user_id: str, now: datetime) -> Optional[Dict]:
+        return self._reader().get_active_booking(user_id, now)
+
+    def has_service_booking_between(self, user_id: str, service_id: str, start: datetime, end: datetime) -> bool:
+        return self._reader().has_service_booking_between(user_id, service_id, start, end)
+
+    def create_booking(self, user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                       status: str = "booked", resource_id: Optional[str] = None) -> Dict:
+        row = self.primary.create_booking(user_id, service_id, start_at, end_at, status, resource_id)
+        self._write_through("booking", row)
+        return row
+
+    def set_booking_status(self, booking_id: str, from_status: str, to_status: str) -> Optional[Dict]:
+        row = self.primary.set_booking_status(booking_id, from_status, to_status)
+        self._write_through("booking", row)
+        return row
+
+    def cancel_booking(self, booking_id: str, user_id: str, ends_after: Optional[datetime] = None) -> Optional[Dict]:
+        row = self.primary.cancel_booking(booking_id, user_id, ends_after)
+        self._write_through("booking", row)
+        return row
+
+    # --- Waitlist (not mirrored: small, and offers must see the live state) ---
+    def join_waitlist(self, user_id: str, telegram_user_id: int, service_id: str, day: date) -> Dict:
+        return self.primary.join_waitlist(user_id, telegram_user_id, service_id, day)
+
+    def fetch_waitlist(self, day: Optional[date] = None) -> List[Dict]:
+        return self.primary.fetch_waitlist(day)
+
+    def update_waitlist(self, entry_id: str, from_status: str, changes: Dict) -> Optional[Dict]:
+        return self.primary.update_waitlist(entry_id, from_status, changes)
+
+    def get_waitlist_offer(self, booking_id: str) -> Optional[Dict]:
+        return self.primary.get_waitlist_offer(booking_id)
+
+    def fetch_expired_offers(self, now: datetime) -> List[Dict]:
+        return self.primary.fetch_expired_offers(now)
+
+    # --- Replication ---
+    def fetch_changes(self, table: str, since_ts: Optional[str], since_id: Optional[str], limit: int = 1000) -> List[Dict]:
+        return self.primary.fetch_changes(table, since_ts, since_id, limit)
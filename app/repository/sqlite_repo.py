@@ -0,0 +1,381 @@
+# app/repository/sqlite_repo.py
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.instrumentation import db_call
+from app.repository.base import PERSONAL_COLUMNS, Repository, UniqueViolation
+from app.whitelist import normalize_name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_user (
+    id TEXT PRIMARY KEY,
+    telegram_user_id INTEGER,
+    full_name TEXT,
+    phone TEXT,
+    email TEXT,
+    country TEXT,
+    university TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS app_user_tg_idx ON app_user (telegram_user_id);
+
+CREATE TABLE IF NOT EXISTS service (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    duration_min INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS booking (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES app_user (id),
+    service_id TEXT NOT NULL REFERENCES service (id),
+    start_at TEXT NOT NULL,
+    end_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'booked',
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS booking_start_idx ON booking (start_at);
+CREATE INDEX IF NOT EXISTS booking_user_idx ON booking (user_id);
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES app_user (id),
+    telegram_user_id INTEGER NOT NULL,
+    service_id TEXT NOT NULL REFERENCES service (id),
+    day TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'waiting',
+    booking_id TEXT,
+    offer_expires_at TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS waitlist_day_idx ON waitlist (day, status, created_at);
+CREATE INDEX IF NOT EXISTS waitlist_booking_idx ON waitlist (booking_id);
+CREATE UNIQUE INDEX IF NOT EXISTS waitlist_open_uq ON waitlist (user_id, service_id, day)
+    WHERE status IN ('waiting', 'offered');
+
+CREATE TABLE IF NOT EXISTS replica_watermark (
+    table_name TEXT PRIMARY KEY,
+    updated_at TEXT,
+    row_id TEXT
+);
+"""
+
+# Columns added after the first schema; applied with ALTER TABLE on older files
+MIGRATIONS = [
+    ("app_user", "updated_at", "TEXT"),
+    ("service", "updated_at", "TEXT"),
+    ("booking", "updated_at", "TEXT"),
+    ("app_user", "full_name_key", "TEXT"),
+    ("booking", "resource_id", "TEXT"),
+]
+
+TIMESTAMP_COLUMNS = ("start_at", "end_at", "created_at", "updated_at", "offer_expires_at")
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.I)
+_IN_RE = re.compile(r"IN \((?:\?, )*\?\)")
+_WRITE_RE = re.compile(r"\s*(?:INSERT|UPDATE)\b", re.I)
+_PERSONAL_RE = re.compile(r"\b(?:%s)\s*(?:=|LIKE)\s*\?" % "|".join(PERSONAL_COLUMNS), re.I)
+
+def _describe(sql: str) -> Tuple[str, str]:
+    m = _TABLE_RE.search(sql)
+    return (m.group(1) if m else "?"), _IN_RE.sub("IN (...)", " ".join(sql.split()))
+
+def _span_filters(sql: str, params) -> str:
+    # written values are names, phones and emails; the slow-query log and /slow only get their count
+    if _WRITE_RE.match(sql) or _PERSONAL_RE.search(sql):
+        return f"<{len(params)} values>"
+    return repr(params)
+
+def _ts(value) -> str:
+    """
+    Timestamps are stored as fixed-width UTC ISO strings, so SQL string
+    comparison is chronological comparison.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+def _now() -> str:
+    return _ts(datetime.now(timezone.utc))
+
+class SqliteRepository(Repository):
+    """Embedded backend with the same query semantics as SupabaseRepository (offline runs, benchmarks)."""
+
+    def __init__(self, path: str = ":memory:", foreign_keys: bool = True):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # a mirror applies pages table by table, so a booking can land before its user row
+            self._conn.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+            self._columns = {
+                t: [r["name"] for r in self._execute(f"PRAGMA table_info({t})")]
+                for t in ("app_user", "service", "booking")
+            }
+
+    def _migrate(self) -> None:
+        for table, column, decl in MIGRATIONS:
+            cols = {r["name"] for r in self._execute(f"PRAGMA table_info({table})")}
+            if column not in cols:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+                # rows written before the column existed still need a place in the watermark order
+                if column == "updated_at":
+                    fallback = "created_at" if "created_at" in cols else "NULL"
+                    self._conn.execute(f"UPDATE {table} SET {column} = COALESCE({fallback}, ?) WHERE {column} IS NULL",
+                                       (_now(),))
+        for table in ("app_user", "service", "booking"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_updated_idx ON {table} (updated_at, id)")
+        # normalize_name (NFKC, apostrophes, spacing, case) has no SQL equivalent, so the key is filled here
+        for r in self._conn.execute("SELECT id, full_name FROM app_user WHERE full_name_key IS NULL").fetchall():
+            self._conn.execute("UPDATE app_user SET full_name_key = ? WHERE id = ?",
+                               (normalize_name(r["full_name"]) or None, r["id"]))
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS app_user_full_name_key_uq ON app_user (full_name_key)")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS app_user_tg_uq ON app_user (telegram_user_id)")
+
+    def _execute(self, sql: str, params=()) -> List[Dict]:
+        table, shape = _describe(sql)
+        with db_call("sqlite", table, shape, _span_filters(sql, params)) as span, self._lock:
+            rows = [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+            span.record(rows)
+            return rows
+
+    def _insert(self, table: str, row: Dict) -> Dict:
+        now = _now()
+        row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **row}
+        cols = ", ".join(row)
+        marks = ", ".join("?" for _ in row)
+        try:
+            return self._execute(f"INSERT INTO {table} ({cols}) VALUES ({marks}) RETURNING *", tuple(row.values()))[0]
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: app_user.full_name_key" (or "t.a, t.b" for a composite key)
+            msg = str(e)
+            if msg.startswith("UNIQUE constraint failed:"):
+                cols = msg.split(":", 1)[1].split(",")
+                raise UniqueViolation(", ".join(c.strip().split(".", 1)[-1] for c in cols), msg) from e
+            raise
+
+    @staticmethod
+    def _marks(values: List) -> str:
+        return ", ".join("?" for _ in values)
+
+    def upsert_services(self, rows: List[Dict]) -> None:
+        """Services are managed in the Supabase dashboard; offline runs seed them here."""
+        with self._lock:
+            for r in rows:
+                self._execute(
+                    "INSERT INTO service (id, name, duration_min, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET name = excluded.name, duration_min = excluded.duration_min, "
+                    "updated_at = excluded.updated_at",
+                    (r.get("id") or str(uuid.uuid4()), r["name"], int(r["duration_min"]), _now()),
+                )
+
+    # --- Users ---
+    def is_registered(self, telegram_user_id: int) -> bool:
+        return bool(self._execute("SELECT id FROM app_user WHERE telegram_user_id = ? LIMIT 1", (telegram_user_id,)))
+
+    def is_name_taken(self, canonical_full_name: str) -> bool:
+        return bool(self._execute("SELECT id FROM app_user WHERE full_name_key = ? LIMIT 1",
+                                  (normalize_name(canonical_full_name),)))
+
+    def register_user(self, telegram_user_id: int, full_name: str, phone: str, email: str,
+                      country: str, university: str) -> Dict:
+        return self._insert("app_user", {
+            "telegram_user_id": telegram_user_id,
+            "full_name": full_name.strip(),
+            "full_name_key": normalize_name(full_name),
+            "phone": phone,
+            "email": email.lower(),
+            "country": country.strip(),
+            "university": university.strip(),
+        })
+
+    def fetch_registered_names(self) -> List[str]:
+        return [r["full_name"] for r in self._execute("SELECT full_name FROM app_user WHERE full_name IS NOT NULL")]
+
+    def get_user_record(self, telegram_user_id: int) -> Optional[Dict]:
+        rows = self._execute("SELECT * FROM app_user WHERE telegram_user_id = ? LIMIT 1", (telegram_user_id,))
+        return rows[0] if rows else None
+
+    def fetch_user_names(self, user_ids: List[str]) -> Dict[str, str]:
+        if not user_ids:
+            return {}
+        rows = self._execute(f"SELECT id, full_name FROM app_user WHERE id IN ({self._marks(user_ids)})", tuple(user_ids))
+        return {r["id"]: (r.get("full_name") or "Foydalanuvchi") for r in rows}
+
+    def fetch_all_users(self) -> List[Dict]:
+        return self._execute("SELECT id, full_name, email, telegram_user_id, created_at FROM app_user ORDER BY created_at")
+
+    def fetch_user_telegram_ids(self) -> List[int]:
+        rows = self._execute("SELECT telegram_user_id FROM app_user WHERE telegram_user_id IS NOT NULL")
+        return [r["telegram_user_id"] for r in rows if isinstance(r["telegram_user_id"], int)]
+
+    # --- Services ---
+    def fetch_services(self) -> List[Dict]:
+        return self._execute("SELECT id, name, duration_min FROM service ORDER BY name")
+
+    def get_service(self, svc_id: str) -> Optional[Dict]:
+        rows = self._execute("SELECT id, name, duration_min FROM service WHERE id = ?", (svc_id,))
+        return rows[0] if len(rows) == 1 else None
+
+    def fetch_service_names(self, svc_ids: List[str]) -> Dict[str, str]:
+        if not svc_ids:
+            return {}
+        rows = self._execute(f"SELECT id, name FROM service WHERE id IN ({self._marks(svc_ids)})", tuple(svc_ids))
+        return {r["id"]: r["name"] for r in rows}
+
+    # --- Bookings ---
+    def fetch_bookings_overlapping(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._execute(
+            "SELECT id, user_id, service_id, start_at, end_at, status, resource_id FROM booking "
+            "WHERE start_at < ? AND end_at > ? AND status != 'cancelled'",
+            (_ts(end), _ts(start)),
+        )
+
+    def fetch_bookings_starting_between(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._execute(
+            "SELECT id, user_id, service_id, start_at, end_at, status FROM booking "
+            "WHERE start_at >= ? AND start_at < ? ORDER BY start_at",
+            (_ts(start), _ts(end)),
+        )
+
+    def fetch_user_bookings(self, user_id: str) -> List[Dict]:
+        return self._execute(
+            "SELECT id, service_id, start_at, end_at, status FROM booking WHERE user_id = ? ORDER BY start_at",
+            (user_id,),
+        )
+
+    def get_user_booking(self, booking_id: str, user_id: str) -> Optional[Dict]:
+        rows = self._execute(
+            "SELECT id, service_id, start_at, end_at, status FROM booking WHERE id = ? AND user_id = ? LIMIT 1",
+            (booking_id, user_id),
+        )
+        return rows[0] if rows else None
+
+    def get_active_booking(self, user_id: str, now: datetime) -> Optional[Dict]:
+        rows = self._execute(
+            "SELECT id, service_id, start_at, end_at, status FROM booking "
+            "WHERE user_id = ? AND status IN ('booked', 'held') AND end_at > ? LIMIT 1",
+            (user_id, _ts(now)),
+        )
+        return rows[0] if rows else None
+
+    def has_service_booking_between(self, user_id: str, service_id: str, start: datetime, end: datetime) -> bool:
+        return bool(self._execute(
+            "SELECT id FROM booking WHERE user_id = ? AND service_id = ? AND status IN ('booked', 'held') "
+            "AND start_at >= ? AND start_at < ? LIMIT 1",
+            (user_id, service_id, _ts(start), _ts(end)),
+        ))
+
+    def create_booking(self, user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                       status: str = "booked", resource_id: Optional[str] = None) -> Dict:
+        return self._insert("booking", {
+            "user_id": user_id,
+            "service_id": service_id,
+            "start_at": _ts(start_at),
+            "end_at": _ts(end_at),
+            "status": status,
+            "resource_id": resource_id,
+        })
+
+    def set_booking_status(self, booking_id: str, from_status: str, to_status: str) -> Optional[Dict]:
+        rows = self._execute(
+            "UPDATE booking SET status = ?, updated_at = ? WHERE id = ? AND status = ? RETURNING *",
+            (to_status, _now(), booking_id, from_status),
+        )
+        return rows[0] if rows else None
+
+    def cancel_booking(self, booking_id: str, user_id: str, ends_after: Optional[datetime] = None) -> Optional[Dict]:
+        sql = "UPDATE booking SET status = 'cancelled', updated_at = ? WHERE id = ? AND user_id = ? AND status = 'booked'"
+        params = [_now(), booking_id, user_id]
+        if ends_after is not None:
+            sql += " AND end_at > ?"
+            params.append(_ts(ends_after))
+        rows = self._execute(sql + " RETURNING *", tuple(params))
+        return rows[0] if rows else None
+
+    # --- Waitlist ---
+    def join_waitlist(self, user_id: str, telegram_user_id: int, service_id: str, day: date) -> Dict:
+        return self._insert("waitlist", {
+            "user_id": user_id,
+            "telegram_user_id": telegram_user_id,
+            "service_id": service_id,
+            "day": day.isoformat(),
+            "status": "waiting",
+        })
+
+    def fetch_waitlist(self, day: Optional[date] = None) -> List[Dict]:
+        if day is None:
+            return self._execute("SELECT * FROM waitlist WHERE status = 'waiting' ORDER BY created_at, id")
+        return self._execute("SELECT * FROM waitlist WHERE day = ? AND status = 'waiting' ORDER BY created_at, id",
+                             (day.isoformat(),))
+
+    def update_waitlist(self, entry_id: str, from_status: str, changes: Dict) -> Optional[Dict]:
+        changes = {k: (_ts(v) if k in TIMESTAMP_COLUMNS and v else v) for k, v in changes.items()}
+        changes["updated_at"] = _now()
+        sets = ", ".join(f"{k} = ?" for k in changes)
+        rows = self._execute(f"UPDATE waitlist SET {sets} WHERE id = ? AND status = ? RETURNING *",
+                             (*changes.values(), entry_id, from_status))
+        return rows[0] if rows else None
+
+    def get_waitlist_offer(self, booking_id: str) -> Optional[Dict]:
+        rows = self._execute("SELECT * FROM waitlist WHERE booking_id = ? LIMIT 1", (booking_id,))
+        return rows[0] if rows else None
+
+    def fetch_expired_offers(self, now: datetime) -> List[Dict]:
+        return self._execute("SELECT * FROM waitlist WHERE status = 'offered' AND offer_expires_at < ? "
+                             "ORDER BY offer_expires_at", (_ts(now),))
+
+    # --- Replication ---
+    def fetch_changes(self, table: str, since_ts: Optional[str], since_id: Optional[str], limit: int = 1000) -> List[Dict]:
+        if table not in self._columns:
+            raise ValueError(f"unknown table {table!r}")
+        if not since_ts:
+            return self._execute(f"SELECT * FROM {table} ORDER BY updated_at, id LIMIT ?", (limit,))
+        if not since_id:
+            return self._execute(f"SELECT * FROM {table} WHERE updated_at >= ? ORDER BY updated_at, id LIMIT ?",
+                                 (_ts(since_ts), limit))
+        return self._execute(
+            f"SELECT * FROM {table} WHERE (updated_at, id) > (?, ?) ORDER BY updated_at, id LIMIT ?",
+            (_ts(since_ts), since_id or "", limit),
+        )
+
+    def upsert_rows(self, table: str, rows: List[Dict]) -> None:
+        """Mirror rows pulled from (or written to) another backend; unknown columns are dropped and
+        a row older than the stored one (by updated_at) is ignored."""
+        cols = self._columns[table]
+        with self._lock:
+            for r in rows:
+                row = {k: (_ts(v) if k in TIMESTAMP_COLUMNS and v else v) for k, v in r.items() if k in cols}
+                if table == "app_user" and row.get("full_name") and not row.get("full_name_key"):
+                    row["full_name_key"] = normalize_name(row["full_name"])
+                names = ", ".join(row)
+                marks = ", ".join("?" for _ in row)
+                updates = ", ".join(f"{k} = excluded.{k}" for k in row if k != "id")
+                # a re-pulled copy must not undo a newer write-through
+                newer = f" WHERE {table}.updated_at IS NULL OR excluded.updated_at >= {table}.updated_at" if row.get("updated_at") else ""
+                self._conn.execute(
+                    f"INSERT INTO {table} ({names}) VALUES ({marks}) ON CONFLICT (id) DO UPDATE SET {updates}{newer}",
+                    tuple(row.values()),
+                )
+
+    def get_watermark(self, table: str):
+        rows = self._execute("SELECT updated_at, row_id FROM replica_watermark WHERE table_name = ?", (table,))
+        return (rows[0]["updated_at"], rows[0]["row_id"]) if rows else (None, None)
+
+    def set_watermark(self, table: str, updated_at: str, row_id: str) -> None:
+        self._execute(
+            "INSERT INTO replica_watermark (table_name, updated_at, row_id) VALUES (?, ?, ?) "
+            "ON CONFLICT (table_name) DO UPDATE SET updated_at = excluded.updated_at, row_id = excluded.row_id",
+            (table, updated_at, row_id),
+        )
@@ -0,0 +1,261 @@
+# app/repository/supabase_repo.py
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote_plus
+
+from app.instrumentation import db_call
+from app.repository.base import PERSONAL_COLUMNS, Repository, UniqueViolation
+from app.whitelist import normalize_name
+
+# details of a Postgres 23505: 'Key (full_name_key)=(ALIYEV VALI) already exists.'
+_DUP_KEY_RE = re.compile(r"Key \(([\w, ]+)\)=")
+PAGE_SIZE = 1000
+
+def _describe(query) -> Tuple[str, str, str]:
+    """
+    (table, shape, filters) of a PostgREST request; the shape keeps columns and operators, not
+    values, and filters has the values of PERSONAL_COLUMNS masked.
+    """
+    table = (getattr(query, "path", "") or "").lstrip("/") or getattr(query, "table_name", "?")
+    method = getattr(query, "http_method", "GET")
+    filters = str(getattr(query, "params", ""))
+    parts, logged = [], []
+    for key, value in parse_qsl(filters, keep_blank_values=True):
+        if key in PERSONAL_COLUMNS:
+            op = value.split(".", 2)
+            logged.append(f"{key}={'.'.join(op[:2]) if op[0] == 'not' else op[0]}.***")
+        else:
+            logged.append(f"{key}={value}")
+        if key in ("select", "order"):
+            parts.append(f"{key}={value}")
+        elif key in ("or", "and"):
+            parts.append(f"{key}=(...)")
+        elif key in ("limit", "offset"):
+            parts.append(key)
+        else:
+            op = value.split(".", 2)
+            parts.append(f"{key}={'.'.join(op[:2]) if op[0] == 'not' else op[0]}")
+    return table, f"{method} {table}" + (f"?{'&'.join(parts)}" if parts else ""), "&".join(logged)
+
+class SupabaseRepository(Repository):
+    def __init__(self, client):
+        self.sb = client
+
+    def _execute(self, query):
+        # single choke point for every PostgREST round trip
+        table, shape, filters = _describe(query)
+        with db_call("supabase", table, shape, filters) as span:
+            try:
+                res = query.execute()
+            except Exception as e:
+                if getattr(e, "code", None) == "23505":
+                    m = _DUP_KEY_RE.search(getattr(e, "details", None) or "")
+                    raise UniqueViolation(m.group(1) if m else "?", getattr(e, "message", None) or str(e)) from e
+                raise
+            span.record(res.data if res is not None else None)
+            return res
+
+    # --- Users ---
+    def is_registered(self, telegram_user_id: int) -> bool:
+        res = self._execute(self.sb.table("app_user").select("id").eq("telegram_user_id", telegram_user_id).limit(1))
+        return bool(res.data)
+
+    def is_name_taken(self, canonical_full_name: str) -> bool:
+        # equality on the uniquely indexed key (migrations/002), not an ilike scan
+        res = self._execute(self.sb.table("app_user").select("id")
+                            .eq("full_name_key", normalize_name(canonical_full_name)).limit(1))
+        return bool(res.data)
+
+    def register_user(self, telegram_user_id: int, full_name: str, phone: str, email: str,
+                      country: str, university: str) -> Dict:
+        res = self._execute(self.sb.table("app_user").insert({
+            "telegram_user_id": telegram_user_id,
+            "full_name": full_name.strip(),
+            "full_name_key": normalize_name(full_name),
+            "phone": phone,
+            "email": email.lower(),
+            "country": country.strip(),
+            "university": university.strip(),
+        }))
+        if not res.data:
+            raise RuntimeError("Insert returned no data")
+        return res.data[0]
+
+    def fetch_registered_names(self) -> List[str]:
+        names: List[str] = []
+        while True:
+            res = self._execute(self.sb.table("app_user").select("full_name").not_.is_("full_name", "null")
+                                .order("id").range(len(names), len(names) + PAGE_SIZE - 1))
+            page = [r["full_name"] for r in (res.data or [])]
+            names.extend(page)
+            if len(page) < PAGE_SIZE:
+                return names
+
+    def get_user_record(self, telegram_user_id: int) -> Optional[Dict]:
+        res = self._execute(self.sb.table("app_user").select("*").eq("telegram_user_id", telegram_user_id).maybe_single())
+        return res.data if res else None
+
+    def fetch_user_names(self, user_ids: List[str]) -> Dict[str, str]:
+        if not user_ids:
+            return {}
+        res = self._execute(self.sb.table("app_user").select("id,full_name").in_("id", user_ids))
+        return {r["id"]: (r.get("full_name") or "Foydalanuvchi") for r in (res.data or [])}
+
+    def fetch_all_users(self) -> List[Dict]:
+        res = self._execute(self.sb.table("app_user")
+                            .select("id,full_name,email,telegram_user_id,created_at")
+                            .order("created_at"))
+        return res.data or []
+
+    def fetch_user_telegram_ids(self) -> List[int]:
+        res = self._execute(self.sb.table("app_user").select("telegram_user_id").not_.is_("telegram_user_id", "null"))
+        return [r["telegram_user_id"] for r in (res.data or []) if isinstance(r.get("telegram_user_id"), int)]
+
+    # --- Services ---
+    def fetch_services(self) -> List[Dict]:
+        return self._execute(self.sb.table("service").select("id,name,duration_min").order("name")).data or []
+
+    def get_service(self, svc_id: str) -> Optional[Dict]:
+        try:
+            return self._execute(self.sb.table("service").select("id,name,duration_min").eq("id", svc_id).single()).data
+        except Exception:
+            return None
+
+    def fetch_service_names(self, svc_ids: List[str]) -> Dict[str, str]:
+        if not svc_ids:
+            return {}
+        res = self._execute(self.sb.table("service").select("id,name").in_("id", svc_ids))
+        return {r["id"]: r["name"] for r in (res.data or [])}
+
+    # --- Bookings ---
+    def fetch_bookings_overlapping(self, start: datetime, end: datetime) -> List[Dict]:
+        # a multi-day horizon can pass the server's max-rows cap; page in a stable order
+        rows: List[Dict] = []
+        while True:
+            res = self._execute(self.sb.table("booking")
+                                .select("id,user_id,service_id,start_at,end_at,status,resource_id")
+                                .lt("start_at", end.isoformat())
+                                .gt("end_at", start.isoformat())
+                                .neq("status", "cancelled")
+                                .order("start_at").order("id")
+                                .range(len(rows), len(rows) + PAGE_SIZE - 1))
+            page = res.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+
+    def fetch_bookings_starting_between(self, start: datetime, end: datetime) -> List[Dict]:
+        return self._execute(self.sb.table("booking")
+                             .select("id,user_id,service_id,start_at,end_at,status")
+                             .gte("start_at", start.isoformat())
+                             .lt("start_at", end.isoformat())
+                             .order("start_at")).data or []
+
+    def fetch_user_bookings(self, user_id: str) -> List[Dict]:
+        return self._execute(self.sb.table("booking")
+                             .select("id,service_id,start_at,end_at,status")
+                             .eq("user_id", user_id)
+                             .order("start_at")).data or []
+
+    def get_user_booking(self, booking_id: str, user_id: str) -> Optional[Dict]:
+        res = self._execute(self.sb.table("booking")
+                            .select("id,service_id,start_at,end_at,status")
+                            .eq("id", booking_id)
+                            .eq("user_id", user_id)
+                            .limit(1))
+        return (res.data or [None])[0]
+
+    def get_active_booking(self, user_id: str, now: datetime) -> Optional[Dict]:
+        res = self._execute(self.sb.table("booking")
+                            .select("id,service_id,start_at,end_at,status")
+                            .eq("user_id", user_id)
+                            .in_("status", ["booked", "held"])
+                            .gt("end_at", now.isoformat())
+                            .limit(1))
+        return res.data[0] if res.data else None
+
+    def has_service_booking_between(self, user_id: str, service_id: str, start: datetime, end: datetime) -> bool:
+        res = self._execute(self.sb.table("booking")
+                            .select("id")
+                            .eq("user_id", user_id)
+                            .eq("service_id", service_id)
+                            .in_("status", ["booked", "held"])
+                            .gte("start_at", start.isoformat())
+                            .lt("start_at", end.isoformat())
+                            .limit(1))
+        return bool(res.data)
+
+    def create_booking(self, user_id: str, service_id: str, start_at: datetime, end_at: datetime,
+                       status: str = "booked", resource_id: Optional[str] = None) -> Dict:
+        res = self._execute(self.sb.table("booking").insert({
+            "user_id": user_id,
+            "service_id": service_id,
+            "start_at": start_at.isoformat(),
+            "end_at": end_at.isoformat(),
+            "status": status,
+            "resource_id": resource_id,
+        }))
+        if not res.data:
+            raise RuntimeError("Booking insert returned no data")
+        return res.data[0]
+
+    def set_booking_status(self, booking_id: str, from_status: str, to_status: str) -> Optional[Dict]:
+        res = self._execute(self.sb.table("booking").update({"status": to_status})
+                            .eq("id", booking_id).eq("status", from_status))
+        return res.data[0] if res.data else None
+
+    def cancel_booking(self, booking_id: str, user_id: str, ends_after: Optional[datetime] = None) -> Optional[Dict]:
+        q = (self.sb.table("booking")
+               .update({"status": "cancelled"})
+               .eq("id", booking_id)
+               .eq("user_id", user_id)
+               .eq("status", "booked"))
+        if ends_after is not None:
+            q = q.gt("end_at", ends_after.isoformat())
+        res = self._execute(q)
+        return res.data[0] if res.data else None
+
+    # --- Waitlist ---
+    def join_waitlist(self, user_id: str, telegram_user_id: int, service_id: str, day: date) -> Dict:
+        res = self._execute(self.sb.table("waitlist").insert({
+            "user_id": user_id,
+            "telegram_user_id": telegram_user_id,
+            "service_id": service_id,
+            "day": day.isoformat(),
+            "status": "waiting",
+        }))
+        if not res.data:
+            raise RuntimeError("Waitlist insert returned no data")
+        return res.data[0]
+
+    def fetch_waitlist(self, day: Optional[date] = None) -> List[Dict]:
+        q = self.sb.table("waitlist").select("*").eq("status", "waiting")
+        if day is not None:
+            q = q.eq("day", day.isoformat())
+        return self._execute(q.order("created_at")).data or []
+
+    def update_waitlist(self, entry_id: str, from_status: str, changes: Dict) -> Optional[Dict]:
+        payload = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in changes.items()}
+        res = self._execute(self.sb.table("waitlist").update(payload).eq("id", entry_id).eq("status", from_status))
+        return res.data[0] if res.data else None
+
+    def get_waitlist_offer(self, booking_id: str) -> Optional[Dict]:
+        res = self._execute(self.sb.table("waitlist").select("*").eq("booking_id", booking_id).limit(1))
+        return (res.data or [None])[0]
+
+    def fetch_expired_offers(self, now: datetime) -> List[Dict]:
+        return self._execute(self.sb.table("waitlist").select("*")
+                             .eq("status", "offered")
+                             .lt("offer_expires_at", now.isoformat())
+                             .order("offer_expires_at")).data or []
+
+    # --- Replication ---
+    def fetch_changes(self, table: str, since_ts: Optional[str], since_id: Optional[str], limit: int = 1000) -> List[Dict]:
+        q = self.sb.table(table).select("*")
+        if since_ts and since_id:
+            q = q.or_(f'updated_at.gt."{since_ts}",and(updated_at.eq."{since_ts}",id.gt."{since_id}")')
+        elif since_ts:
+            # ids are uuids: there is no "smaller than any id" to compare against
+            q = q.gte("updated_at", since_ts)
+        return self._execute(q.order("updated_at").order("id").limit(limit)).data or []
@@ -0,0 +1,529 @@
+# app/schedule.py
+"""
+Working hours, capacity and closed days as data (SCHEDULE_RULES, JSON).
+
+The rules file is compiled into an immutable `Schedule`; every question the
+booking flow asks ("is this day open", "which starts can a 30-minute service
+take on Tuesday") is answered from that snapshot. Candidate starts are
+compiled once per (date, duration, service) into a `SlotTemplate` and cached
+on the snapshot, so a rules change (new version, new snapshot) drops the
+cache with it and the per-request work is only checking the template's
+starts against the day's bookings.
+
+Bookings are served by resources (staff, desks) with skills: a start is
+free when one resource that handles the service has room for the whole
+booking, and the booking records that resource. Each resource keeps its
+day's bookings as a sorted interval list (`Intervals`) with the runs of the
+day where it still has room, so all of a template's starts are checked in
+one merge pass per resource and a single start in two bisects, however many
+bookings the day has.
+
+    {
+      "min_ahead_min": 120,          # earliest start relative to now
+      "step_min": 5,                 # start granularity (multiple of 5)
+      "capacity": 2,                 # seats of the default "office" resource
+      "resources": [                 # optional; replaces the "office" pool
+        {"id": "desk-1", "name": "1-stol", "services": "*"},
+        {"id": "desk-2", "services": ["<service id>"], "capacity": 1}
+      ],
+      "weekdays": {"mon": [{"start": "09:30", "end": "13:00", "last_start": "12:50"},
+                           {"start": "14:00", "end": "18:00"}], ..., "sun": []},
+      "services": {"<service id>": {"step_min": 15}},
+      "holidays": ["09-01"],         # every year, MM-DD
+      "closures": ["2026-12-31", {"from": "2027-01-01", "to": "2027-01-03"}]
+    }
+
+Bookings are placed on the fixed 5-minute grid of TimeCB: a booking takes
+[start rounded up, end rounded up). Rows without a (known) resource_id,
+i.e. written before resources existed or by a removed resource, are placed
+on the first resource with room that handles their service.
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.callbacks import SLOT_QUANTUM_MIN
+from app.config import UZ_TZ
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+_WORKDAY = [{"start": "09:30", "end": "13:00", "last_start": "12:50"}, {"start": "14:00", "end": "18:00"}]
+# used when the rules file does not exist
+DEFAULT_RULES: Dict = {
+    "min_ahead_min": 120,
+    "step_min": 5,
+    "capacity": 2,
+    "weekdays": {**{d: _WORKDAY for d in WEEKDAYS[:5]}, "sat": [], "sun": []},
+    "services": {},
+    "holidays": ["09-01"],
+    "closures": [],
+}
+
+class ScheduleError(ValueError):
+    """Rules file unreadable or invalid; the current schedule stays in effect."""
+
+# (start, end, last_start) in minutes from local midnight
+Window = Tuple[int, int, int]
+
+DAY_MIN = 24 * 60
+
+class Resource(NamedTuple):
+    id: str
+    name: str
+    capacity: int
+    services: Optional[frozenset]  # None: every service
+
+def _minutes(v, where: str) -> int:
+    try:
+        t = time.fromisoformat(v)
+    except (TypeError, ValueError):
+        raise ScheduleError(f"{where}: bad time {v!r} (expected HH:MM)") from None
+    m = t.hour * 60 + t.minute
+    if m % SLOT_QUANTUM_MIN or t.second:
+        raise ScheduleError(f"{where}: {v} is not on a {SLOT_QUANTUM_MIN}-minute boundary")
+    return m
+
+def _step(v, where: str) -> int:
+    if not isinstance(v, int) or v <= 0 or v % SLOT_QUANTUM_MIN:
+        raise ScheduleError(f"{where}: step_min must be a positive multiple of {SLOT_QUANTUM_MIN}")
+    return v
+
+def _capacity(v, where: str) -> int:
+    if not isinstance(v, int) or v < 1:
+        raise ScheduleError(f"{where}: capacity must be a positive integer")
+    return v
+
+def _date(v, where: str) -> date:
+    try:
+        return date.fromisoformat(v)
+    except (TypeError, ValueError):
+        raise ScheduleError(f"{where}: bad date {v!r} (expected YYYY-MM-DD)") from None
+
+def _windows(raw, where: str) -> Tuple[Window, ...]:
+    out: List[Window] = []
+    for i, w in enumerate(raw or []):
+        at = f"{where}[{i}]"
+        start, end = _minutes(w.get("start"), at), _minutes(w.get("end"), at)
+        last = _minutes(w["last_start"], at) if w.get("last_start") else end
+        if not start < end or not start <= last <= end or (out and start < out[-1][1]):
+            raise ScheduleError(f"{at}: windows must be ordered and non-overlapping, start < end")
+        out.append((start, end, last))
+    return tuple(out)
+
+def _resources(raw, default_capacity: int) -> Tuple[Resource, ...]:
+    if raw is None:
+        return (Resource("office", "office", default_capacity, None),)
+    out: List[Resource] = []
+    for i, r in enumerate(raw):
+        at = f"resources[{i}]"
+        rid = str(r.get("id") or "").strip()
+        if not rid or any(x.id == rid for x in out):
+            raise ScheduleError(f"{at}: id missing or duplicated")
+        svcs = r.get("services", "*")
+        if svcs != "*" and (not isinstance(svcs, list) or not svcs):
+            raise ScheduleError(f"{at}: services must be \"*\" or a non-empty list of service ids")
+        out.append(Resource(rid, str(r.get("name") or rid), _capacity(r.get("capacity", 1), at),
+                            None if svcs == "*" else frozenset(map(str, svcs))))
+    if not out:
+        raise ScheduleError("resources: empty list (omit the key to use the capacity pool)")
+    return tuple(out)
+
+def booking_minutes(b: Dict) -> Iterator[Tuple[date, int, int]]:
+    """(local day, start, end) in grid minutes from that day's midnight, split at midnight."""
+    q = SLOT_QUANTUM_MIN * 60
+    s = datetime.fromisoformat(b["start_at"]).astimezone(UZ_TZ).replace(second=0, microsecond=0)
+    e = datetime.fromisoformat(b["end_at"]).astimezone(UZ_TZ)
+    d = s.date()
+    midnight = datetime.combine(d, time(0, 0), UZ_TZ)
+    first = -(-int((s - midnight).total_seconds()) // q) * SLOT_QUANTUM_MIN
+    last = -(-int((e - midnight).total_seconds()) // q) * SLOT_QUANTUM_MIN
+    while first < last:
+        cut = min(last, (first // DAY_MIN + 1) * DAY_MIN)
+        off = first // DAY_MIN * DAY_MIN
+        yield d + timedelta(days=off // DAY_MIN), first - off, cut - off
+        first = cut
+
+class Intervals:
+    """
+    One resource's bookings on one day: [start, end) minutes sorted by start,
+    plus the load step function they add up to (breakpoints and the number of
+    bookings running from each one), updated in place by add(), and the
+    maximal runs below capacity, rebuilt lazily. The peak load over any window
+    is two bisects and a max over the steps inside it; a sorted batch of
+    candidate starts is matched against the runs in one merge pass.
+    """
+    __slots__ = ("capacity", "starts", "ends", "_xs", "_loads", "_rooms")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self._xs: List[int] = []
+        self._loads: List[int] = []
+        self._rooms: Optional[List[Tuple[int, int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, s: int, e: int) -> None:
+        i = bisect.bisect_right(self.starts, s)
+        self.starts.insert(i, s)
+        self.ends.insert(i, e)
+        # the step function gains breakpoints at s and e and one more booking in between;
+        # rebuilding it instead would make indexing a day quadratic in its bookings
+        xs, loads = self._xs, self._loads
+        for x in (s, e):
+            k = bisect.bisect_left(xs, x)
+            if k == len(xs) or xs[k] != x:
+                xs.insert(k, x)
+                loads.insert(k, loads[k - 1] if k else 0)
+        for k in range(bisect.bisect_left(xs, s), bisect.bisect_left(xs, e)):
+            loads[k] += 1
+        self._rooms = None
+
+    def rooms(self) -> List[Tuple[int, int]]:
+        """Maximal [start, end) runs of the day with load below capacity."""
+        if self._rooms is None:
+            xs, loads = self._xs, self._loads
+            rooms: List[Tuple[int, int]] = []
+            bounds = [0, *xs, DAY_MIN]
+            levels = [0, *loads]
+            for a, b, load in zip(bounds, bounds[1:], levels):
+                if load >= self.capacity or a >= b:
+                    continue
+                if rooms and rooms[-1][1] == a:
+                    rooms[-1] = (rooms[-1][0], b)
+                else:
+                    rooms.append((a, b))
+            self._rooms = rooms
+        return self._rooms
+
+    def peak(self, s: int, e: int) -> int:
+        """Most bookings running at once anywhere in [s, e)."""
+        xs, loads = self._xs, self._loads
+        i = bisect.bisect_right(xs, s) - 1  # step covering s (-1: before the first booking)
+        j = bisect.bisect_left(xs, e)       # steps starting before e
+        return max(loads[max(i, 0):j], default=0)
+
+    def fits(self, s: int, e: int) -> bool:
+        """Room for one more booking over all of [s, e)."""
+        return self.peak(s, e) < self.capacity
+
+    def slack(self, s: int, e: int) -> int:
+        """Idle minutes left on either side of [s, e) in the gap it would go into."""
+        i = bisect.bisect_left(self.starts, s)
+        prev_end = self.ends[i - 1] if i else 0
+        j = bisect.bisect_left(self.starts, e)
+        next_start = self.starts[j] if j < len(self.starts) else DAY_MIN
+        return max(s - prev_end, 0) + max(next_start - e, 0)
+
+class DayIndex:
+    """Per-resource interval lists for one day."""
+    __slots__ = ("resources",)
+
+    def __init__(self, resources: Iterable[Resource]):
+        self.resources: Dict[str, Intervals] = {r.id: Intervals(r.capacity) for r in resources}
+
+    def free_mask(self, candidates: Iterable[str], minutes: Tuple[int, ...], length: int, first: int = 0) -> List[bool]:
+        """For sorted candidate starts: does some resource have room for [m, m + length)? One merge pass per resource."""
+        n = len(minutes)
+        mask = [False] * n
+        for rid in candidates:
+            rooms = self.resources[rid].rooms()
+            k, last = 0, len(rooms)
+            for i in range(first, n):
+                if mask[i]:
+                    continue
+                m = minutes[i]
+                while k < last and rooms[k][1] < m + length:
+                    k += 1
+                if k == last:
+                    break
+                if rooms[k][0] <= m:
+                    mask[i] = True
+        return mask
+
+    def assign(self, candidates: Iterable[str], s: int, e: int) -> Optional[str]:
+        """Resource (of `candidates`) to take [s, e): the one whose free gap it fills most tightly; None if all busy."""
+        best, best_slack = None, None
+        for rid in candidates:
+            iv = self.resources[rid]
+            if iv.fits(s, e):
+                slack = iv.slack(s, e)
+                if best is None or slack < best_slack:
+                    best, best_slack = rid, slack
+        return best
+
+class SlotTemplate:
+    """Candidate starts of one (date, duration, service): rules applied, bookings and 'now' not."""
+    __slots__ = ("starts", "minutes", "length", "resources", "_index")
+
+    def __init__(self, starts: List[datetime], minutes: List[int], length: int, resources: Tuple[str, ...]):
+        self.starts = tuple(starts)
+        self.minutes = tuple(minutes)  # start of each candidate, minutes from midnight
+        self.length = length           # booking length rounded up to the grid
+        self.resources = resources     # ids of the resources that handle the service
+        self._index = {s: i for i, s in enumerate(self.starts)}
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def free(self, index: Optional[DayIndex], after: Optional[datetime] = None) -> Iterator[datetime]:
+        """Starts at or after `after` that some resource has room for, earliest first."""
+        first = bisect.bisect_left(self.starts, after) if after is not None else 0
+        if index is None:
+            yield from self.starts[first:]
+            return
+        mask = index.free_mask(self.resources, self.minutes, self.length, first)
+        for i in range(first, len(self.starts)):
+            if mask[i]:
+                yield self.starts[i]
+
+    def offers(self, start: datetime) -> bool:
+        return start in self._index
+
+    def assign(self, start: datetime, index: Optional[DayIndex]) -> Optional[str]:
+        i = self._index.get(start)
+        if i is None or not self.resources:
+            return None
+        if index is None:
+            return self.resources[0]
+        m = self.minutes[i]
+        return index.assign(self.resources, m, m + self.length)
+
+class Schedule:
+    """One compiled version of the rules. Immutable; templates are cached per snapshot."""
+
+    def __init__(self, rules: Dict, version: int = 1, digest: str = "default", source: str = "<defaults>"):
+        if not isinstance(rules, dict):
+            raise ScheduleError("rules must be a JSON object")
+        self.version, self.digest, self.source = version, digest, source
+        self.min_ahead = timedelta(minutes=int(rules.get("min_ahead_min", 120)))
+        self.step_min = _step(rules.get("step_min", SLOT_QUANTUM_MIN), "step_min")
+        self.capacity = _capacity(rules.get("capacity", 1), "capacity")
+        self.resources = _resources(rules.get("resources"), self.capacity)
+        weekdays = rules.get("weekdays") or {}
+        unknown = set(weekdays) - set(WEEKDAYS)
+        if unknown:
+            raise ScheduleError(f"weekdays: unknown day(s) {sorted(unknown)}")
+        self.weekdays = tuple(_windows(weekdays.get(d), f"weekdays.{d}") for d in WEEKDAYS)
+        self.services: Dict[str, int] = {}
+        for sid, r in (rules.get("services") or {}).items():
+            if "capacity" in r:
+                raise ScheduleError(f"services.{sid}: capacity is set per resource now (resources[].services)")
+            self.services[str(sid)] = _step(r.get("step_min", self.step_min), f"services.{sid}")
+        hol = set()
+        for v in rules.get("holidays") or []:
+            d = _date(f"2000-{v}", "holidays")  # leap year, so 02-29 is accepted
+            hol.add((d.month, d.day))
+        self.holidays = frozenset(hol)
+        closed = set()
+        for v in rules.get("closures") or []:
+            if isinstance(v, dict):
+                lo, hi = _date(v.get("from"), "closures"), _date(v.get("to"), "closures")
+                if hi < lo:
+                    raise ScheduleError(f"closures: {hi} is before {lo}")
+                closed.update(lo + timedelta(days=i) for i in range((hi - lo).days + 1))
+            else:
+                closed.add(_date(v, "closures"))
+        self.closures = frozenset(closed)
+        self._qualified: Dict[Optional[str], Tuple[str, ...]] = {}
+        self.template = lru_cache(maxsize=1024)(self._compile)
+
+    def is_closed(self, d: date) -> bool:
+        return not self.weekdays[d.weekday()] or (d.month, d.day) in self.holidays or d in self.closures
+
+    def windows(self, d: date) -> Tuple[Window, ...]:
+        return () if self.is_closed(d) else self.weekdays[d.weekday()]
+
+    def step_for(self, service_id: Optional[str]) -> int:
+        return self.services.get(str(service_id), self.step_min)
+
+    def qualified(self, service_id: Optional[str]) -> Tuple[str, ...]:
+        """Ids of the resources that handle a service, in configured order."""
+        ids = self._qualified.get(service_id)
+        if ids is None:
+            ids = self._qualified[service_id] = tuple(
+                r.id for r in self.resources if r.services is None or str(service_id) in r.services)
+        return ids
+
+    def _compile(self, d: date, duration_min: int, service_id: Optional[str] = None) -> SlotTemplate:
+        step, resources = self.step_for(service_id), self.qualified(service_id)
+        midnight = datetime.combine(d, time(0, 0), UZ_TZ)
+        starts, minutes = [], []
+        for ws, we, last in self.windows(d) if resources else ():
+            m = ws
+            while m + duration_min <= we and m <= last:
+                starts.append(midnight + timedelta(minutes=m))
+                minutes.append(m)
+                m += step
+        length = -(-int(duration_min) // SLOT_QUANTUM_MIN) * SLOT_QUANTUM_MIN
+        return SlotTemplate(starts, minutes, length, resources)
+
+    def day_indexes(self, bookings: Iterable[Dict]) -> Dict[date, DayIndex]:
+        """Bookings laid out per day and resource; rows without a known resource go where their service fits."""
+        out: Dict[date, DayIndex] = {}
+        floating = []
+        for b in bookings:
+            for d, s, e in booking_minutes(b):
+                index = out.get(d)
+                if index is None:
+                    index = out[d] = DayIndex(self.resources)
+                iv = index.resources.get(b.get("resource_id"))
+                if iv is not None:
+                    iv.add(s, e)
+                else:
+                    floating.append((d, s, e, b.get("service_id")))
+        floating.sort(key=lambda f: (f[0], f[1]))
+        for d, s, e, sid in floating:
+            index = out[d]
+            candidates = self.qualified(sid) or tuple(index.resources)
+            rid = index.assign(candidates, s, e) or candidates[0]  # overbooked rows still take room
+            index.resources[rid].add(s, e)
+        return out
+
+    def earliest_start(self, now: Optional[datetime] = None) -> datetime:
+        return (now or datetime.now(UZ_TZ)) + self.min_ahead
+
+    def free_starts(self, d: date, duration_min: int, index: Optional[DayIndex],
+                    service_id: Optional[str] = None, now: Optional[datetime] = None) -> Iterator[datetime]:
+        return self.template(d, int(duration_min), service_id).free(index, self.earliest_start(now))
+
+    def check_start(self, start: datetime, duration_min: int, service_id: Optional[str] = None) -> Optional[str]:
+        """Why `start` is not a bookable start for this duration, ignoring occupancy: None if it is.
+
+        "closed", "outside", "before_break" (runs past a window that is followed by another),
+        "before_close" (runs past the last window) or "not_offered" (off-step or past last_start).
+        """
+        local = start.astimezone(UZ_TZ)
+        d = local.date()
+        wins = self.windows(d)
+        if not wins:
+            return "closed"
+        m = local.hour * 60 + local.minute
+        for i, (ws, we, _) in enumerate(wins):
+            if ws <= m < we:
+                if m + duration_min > we:
+                    return "before_break" if i < len(wins) - 1 else "before_close"
+                break
+        else:
+            return "outside"
+        if not self.template(d, int(duration_min), service_id).offers(local):
+            return "not_offered"
+        return None
+
+    def assign(self, start: datetime, duration_min: int, index: Optional[DayIndex],
+               service_id: Optional[str] = None) -> Optional[str]:
+        """Resource to book `start` on, or None if it is not offered or every qualified resource is busy."""
+        local = start.astimezone(UZ_TZ)
+        return self.template(local.date(), int(duration_min), service_id).assign(local, index)
+
+def read_rules(path: str) -> Tuple[Dict, str, int]:
+    """(rules, sha1[:12], mtime_ns) of a rules file."""
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        rules = json.loads(data)
+    except (OSError, ValueError) as e:
+        raise ScheduleError(f"{path}: {e}") from e
+    return rules, hashlib.sha1(data).hexdigest()[:12], st.st_mtime_ns
+
+class ScheduleStore:
+    """
+    The current Schedule, rebuilt when the rules file changes. Like the
+    roster registry, the file is parsed and compiled outside the lock and
+    only the swap happens under it; a broken file keeps the previous
+    schedule. Without a file the built-in DEFAULT_RULES apply.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._schedule: Optional[Schedule] = None
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Schedule:
+        sched = self._schedule
+        if sched is None:
+            try:
+                sched = self.reload(force=True) or self._schedule
+            except ScheduleError as e:
+                logger.error("Schedule rules not loaded, using defaults: %s", e)
+                with self._lock:
+                    if self._schedule is None:
+                        self._schedule = Schedule(DEFAULT_RULES)
+                    sched = self._schedule
+        return sched
+
+    def reload(self, force: bool = False) -> Optional[Schedule]:
+        """Recompile if the file changed (or `force`); the new schedule, or None if nothing changed."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._schedule is not None and mtime == self._mtime and not force:
+            return None
+        if mtime is None:
+            rules, digest, source = DEFAULT_RULES, "default", "<defaults>"
+        else:
+            try:
+                rules, digest, mtime = read_rules(self.path)
+                source = self.path
+            except ScheduleError:
+                self._mtime = mtime  # reported once per change, not on every watch tick
+                raise
+        current = self._schedule
+        if current is not None and current.digest == digest and not force:
+            self._mtime = mtime
+            return None
+        try:
+            sched = Schedule(rules, (current.version if current else 0) + 1, digest, source)
+        except ScheduleError as e:
+            self._mtime = mtime
+            raise ScheduleError(f"{source}: {e}") from e
+        with self._lock:
+            self._mtime = mtime
+            self._schedule = sched
+        logger.info("Schedule v%d loaded from %s (sha1 %s)", sched.version, source, digest)
+        return sched
+
+    async def watch(self, interval: float) -> None:
+        from app.executors import CPU, run_in
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in(CPU, self.reload)
+            except asyncio.CancelledError:
+                raise
+            except ScheduleError as e:
+                logger.error("Schedule not reloaded, keeping v%d: %s", self.get().version, e)
+            except Exception:
+                logger.exception("Schedule watch failed")
+
+_store: Optional[ScheduleStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> ScheduleStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from app.config import SCHEDULE_RULES
+                _store = ScheduleStore(SCHEDULE_RULES)
+    return _store
+
+def get_schedule() -> Schedule:
+    return get_store().get()
+
+def is_forbidden_date(d: date) -> bool:
+    return get_schedule().is_closed(d)
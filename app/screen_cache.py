@@ -0,0 +1,146 @@
+# app/screen_cache.py
+"""
+Skip Telegram edits that would not change the message.
+
+Redundant taps (the same day twice, "back" to the screen already shown)
+re-render an identical screen; Telegram answers the edit with "message is
+not modified" after a full round trip. `ScreenCacheMiddleware` sits in the
+bot session, so every edit path goes through it: it remembers a fingerprint
+of the text and inline keyboard last shown on each (chat, message) it sent
+or edited, and answers an edit that matches it locally (the edit methods
+may return True). Entries are bounded (LRU) and expire after a TTL, after
+which the edit simply goes to Telegram again.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, SendMessage
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from app.config import SCREEN_CACHE_SIZE, SCREEN_CACHE_TTL
+from app.metrics import REGISTRY
+
+SCREEN_EDITS = REGISTRY.counter("screen_edits_total", "Message edits by result (sent, skipped, not_modified)")
+
+ScreenKey = Tuple[int, int]
+
+def _digest(s: str) -> bytes:
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=16).digest()
+
+class ScreenCache:
+    """(chat_id, message_id) -> fingerprints of the text and keyboard last rendered there."""
+
+    MARKUP_MEMO = 1024
+
+    def __init__(self, size: int = SCREEN_CACHE_SIZE, ttl: float = SCREEN_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._screens: "OrderedDict[ScreenKey, Tuple[Optional[bytes], bytes, float]]" = OrderedDict()
+        # keyboards are shared between replies (app/keyboards.py RenderCache), so most
+        # fingerprints are of a markup seen before; keyed by id with the object kept alive
+        self._markups: "OrderedDict[int, Tuple[InlineKeyboardMarkup, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def markup_fp(self, markup: Optional[InlineKeyboardMarkup]) -> bytes:
+        if markup is None:
+            return b""
+        with self._lock:
+            hit = self._markups.get(id(markup))
+            if hit is not None and hit[0] is markup:
+                self._markups.move_to_end(id(markup))
+                return hit[1]
+        fp = _digest(markup.model_dump_json(exclude_none=True))
+        with self._lock:
+            self._markups[id(markup)] = (markup, fp)
+            while len(self._markups) > self.MARKUP_MEMO:
+                self._markups.popitem(last=False)
+        return fp
+
+    @staticmethod
+    def text_fp(text: str, parse_mode, entities) -> bytes:
+        # parse_mode may be aiogram's Default sentinel; its repr is stable
+        return _digest(f"{parse_mode!r}\x00{entities!r}\x00{text}")
+
+    def get(self, key: ScreenKey) -> Optional[Tuple[Optional[bytes], bytes]]:
+        with self._lock:
+            entry = self._screens.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._screens[key]
+                return None
+            return entry[0], entry[1]
+
+    def put(self, key: ScreenKey, text_fp: Optional[bytes], markup_fp: bytes) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._screens[key] = (text_fp, markup_fp, time.monotonic() + self.ttl)
+            self._screens.move_to_end(key)
+            while len(self._screens) > self.size:
+                self._screens.popitem(last=False)
+
+    def forget(self, key: ScreenKey) -> None:
+        with self._lock:
+            self._screens.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._screens)
+
+class ScreenCacheMiddleware(BaseRequestMiddleware):
+    """Session middleware; register it before the rate limiter so skipped edits take no tokens."""
+
+    def __init__(self, cache: Optional[ScreenCache] = None):
+        self.cache = cache or ScreenCache()
+
+    def _key(self, method) -> Optional[ScreenKey]:
+        # inline-mode messages and chats addressed by @username are not tracked
+        if getattr(method, "inline_message_id", None) or not isinstance(method.chat_id, int):
+            return None
+        return method.chat_id, method.message_id
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, SendMessage):
+            result = await make_request(bot, method)
+            markup = method.reply_markup
+            if isinstance(result, Message) and (markup is None or isinstance(markup, InlineKeyboardMarkup)):
+                self.cache.put((result.chat.id, result.message_id),
+                               self.cache.text_fp(method.text, method.parse_mode, method.entities),
+                               self.cache.markup_fp(markup))
+            return result
+        if not isinstance(method, (EditMessageText, EditMessageReplyMarkup)):
+            return await make_request(bot, method)
+        key = self._key(method)
+        if key is None:
+            return await make_request(bot, method)
+
+        markup_fp = self.cache.markup_fp(method.reply_markup)
+        text_fp = None
+        if isinstance(method, EditMessageText):
+            text_fp = self.cache.text_fp(method.text, method.parse_mode, method.entities)
+        shown = self.cache.get(key)
+        if shown is not None and shown[1] == markup_fp and (text_fp is None or shown[0] == text_fp):
+            SCREEN_EDITS.inc(result="skipped")
+            return True
+
+        try:
+            result = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                SCREEN_EDITS.inc(result="not_modified")
+                self.cache.put(key, text_fp if text_fp is not None else (shown or (None,))[0], markup_fp)
+            else:
+                self.cache.forget(key)
+            raise
+        except Exception:
+            self.cache.forget(key)
+            raise
+        SCREEN_EDITS.inc(result="sent")
+        # a markup-only edit keeps the text that was there (unknown if the message was never seen)
+        self.cache.put(key, text_fp if text_fp is not None else (shown or (None,))[0], markup_fp)
+        return result
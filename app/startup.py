@@ -0,0 +1,78 @@
+# app/startup.py
+"""
+`python bot.py --profile-startup`: where process start goes, without polling.
+
+Prints the heaviest imports (from a child `python -X importtime -c "import bot"`)
+and then times each startup phase in-process, including the first-use
+initializers that are deferred until the first update needs them.
+"""
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us), int(cum_us)))
+    return rows
+
+def import_profile(statement: str = "import bot") -> List[Tuple[str, int, int]]:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          cwd=ROOT, capture_output=True, text=True, env=os.environ.copy())
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    return parse_importtime(proc.stderr)
+
+def _timed(fn: Callable) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+def phase_timings() -> Dict[str, float]:
+    import bot
+    from app.repository import get_repository
+    from app.schedule import get_schedule
+    from app.utils import normalize_phone
+    from app.whitelist import get_rosters
+
+    phases = {
+        "build_dispatcher": _timed(bot.build_dispatcher),
+        "build_bot": _timed(bot.build_bot),
+        # deferred to first use; listed so a regression back to import time is visible
+        "first use: repository/client": _timed(get_repository),
+        "first use: award rosters": _timed(lambda: get_rosters().all()),
+        "first use: schedule rules": _timed(get_schedule),
+        "first use: phonenumbers": _timed(lambda: normalize_phone("+998901234567")),
+    }
+    return phases
+
+def profile_startup(top: int = 25) -> None:
+    rows = import_profile()
+    total = max((cum for name, _, cum in rows if name == "bot"), default=0)
+    print(f"import bot: {total / 1000:.1f} ms  (python -X importtime, child process)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{cum_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    print()
+    for phase, ms in phase_timings().items():
+        print(f"{ms:>10.1f} ms  {phase}")
+
+def warm_up() -> None:
+    """Run the deferred initializers off the event loop once polling has started."""
+    from app.repository import get_repository
+    from app.schedule import get_schedule
+    from app.utils import normalize_phone
+    from app.whitelist import get_rosters
+
+    get_repository()
+    get_rosters().all()
+    get_schedule()
+    normalize_phone("+998901234567")
@@ -0,0 +1,130 @@
+# app/tracing.py
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+# Dedicated logger so slow queries can go to their own file (configure_slow_log)
+slow_logger = logging.getLogger("eyufbot.slowquery")
+
+class Span:
+    """One data-layer round trip, linked to the Telegram update that caused it."""
+
+    __slots__ = ("backend", "table", "shape", "filters", "update_id", "handler",
+                 "rows", "bytes", "started", "duration", "error")
+
+    def __init__(self, backend: str, table: str, shape: str, filters: str,
+                 update_id: Optional[int], handler: str):
+        self.backend = backend
+        self.table = table
+        self.shape = shape
+        self.filters = filters
+        self.update_id = update_id
+        self.handler = handler
+        self.rows: Optional[int] = None
+        self.bytes: Optional[int] = None
+        self.started = time.time()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def record(self, data) -> None:
+        """Row count and approximate payload size of a response body."""
+        rows = data if isinstance(data, list) else ([] if data is None else [data])
+        self.rows = len(rows)
+        self.bytes = len(json.dumps(data, default=str, separators=(",", ":")))
+
+    def as_dict(self) -> Dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class ShapeStats:
+    __slots__ = ("count", "total", "max", "max_update_id", "max_filters", "rows")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.max_update_id: Optional[int] = None
+        self.max_filters = ""
+        self.rows = 0
+
+class Tracer:
+    """
+    Keeps the most recent spans, aggregates every span by query shape
+    (backend + table + filter columns, values stripped) and sends spans over
+    `slow_ms` to the slow-query log.
+    """
+
+    def __init__(self, slow_ms: float = 250.0, buffer: int = 1000):
+        self.slow_ms = slow_ms
+        self.recent: Deque[Span] = deque(maxlen=buffer)
+        self._shapes: Dict[str, ShapeStats] = {}
+        self._lock = threading.Lock()
+
+    def finish(self, span: Span) -> None:
+        key = f"{span.backend} {span.shape}"
+        with self._lock:
+            self.recent.append(span)
+            st = self._shapes.get(key)
+            if st is None:
+                st = self._shapes[key] = ShapeStats()
+            st.count += 1
+            st.total += span.duration
+            st.rows += span.rows or 0
+            if span.duration >= st.max:
+                st.max = span.duration
+                st.max_update_id = span.update_id
+                st.max_filters = span.filters
+        if span.duration * 1000 >= self.slow_ms:
+            slow_logger.warning(json.dumps({
+                "ts": round(span.started, 3),
+                "ms": round(span.duration * 1000, 1),
+                "backend": span.backend,
+                "table": span.table,
+                "shape": span.shape,
+                "filters": span.filters[:500],
+                "rows": span.rows,
+                "bytes": span.bytes,
+                "update_id": span.update_id,
+                "handler": span.handler,
+                "error": span.error,
+            }, ensure_ascii=False))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span %s %s %.1fms rows=%s update=%s", span.backend, span.shape,
+                         span.duration * 1000, span.rows, span.update_id)
+
+    def top_shapes(self, n: int = 10) -> List[Dict]:
+        """Slowest query shapes since startup, by worst single call."""
+        with self._lock:
+            items = sorted(self._shapes.items(), key=lambda kv: kv[1].max, reverse=True)[:n]
+            return [{
+                "shape": shape,
+                "count": st.count,
+                "avg_ms": st.total / st.count * 1000,
+                "max_ms": st.max * 1000,
+                "avg_rows": st.rows / st.count,
+                "max_update_id": st.max_update_id,
+            } for shape, st in items]
+
+    def spans_for_update(self, update_id: int) -> List[Span]:
+        with self._lock:
+            return [s for s in self.recent if s.update_id == update_id]
+
+_tracer: Optional[Tracer] = None
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        from app.config import SLOW_QUERY_MS, TRACE_BUFFER
+        _tracer = Tracer(SLOW_QUERY_MS, TRACE_BUFFER)
+    return _tracer
+
+def configure_slow_log(path: str) -> None:
+    """Send slow-query records (one JSON object per line) to `path` as well as the main log."""
+    if not path:
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_logger.addHandler(handler)
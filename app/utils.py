@@ -1,12 +1,14 @@
 import re
-import phonenumbers
-from datetime import datetime, date, time, timedelta
-from typing import Dict, List
-from app.config import UZ_TZ
+from functools import lru_cache
+from datetime import datetime, date
+from itertools import chain, islice
+from typing import Dict, List, Optional, Sequence
+from app.schedule import get_schedule
 
 EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
-def normalize_phone(raw: str):
+def _normalize_phone_lib(raw: str):
+    import phonenumbers  # ~100 ms of metadata; only the registration flow needs it
     try:
         parsed = phonenumbers.parse(raw, "UZ")
         if not phonenumbers.is_valid_number(parsed):
@@ -15,77 +17,72 @@ def normalize_phone(raw: str):
     except Exception:
         return None
 
-# Availability
-WORK_WINDOWS = [(time(9,30), time(13,0)), (time(14,0), time(18,0))]
-STEP_MIN = 5
-CAPACITY = 2
-MIN_AHEAD = timedelta(hours=2)
-
-def ceil_dt_to_step(dt: datetime, step_min: int) -> datetime:
-    m = (dt.minute // step_min) * step_min
-    dt0 = dt.replace(second=0, microsecond=0, minute=m)
-    if dt0 < dt:
-        dt0 += timedelta(minutes=step_min)
-    return dt0
-
-def iter_window_candidates(day: date, win_start: time, win_end: time, dur: timedelta) -> List[datetime]:
-    start_dt = datetime.combine(day, win_start, UZ_TZ)
-    end_dt = datetime.combine(day, win_end, UZ_TZ)
-    cur = start_dt
-    out = []
-    while True:
-        if cur + dur <= end_dt:
-            out.append(cur)
-            cur += timedelta(minutes=STEP_MIN)
-        else:
-            break
-    return out
+# Fast path for Uzbek numbers. Only plain digits with common separators are
+# handled here; letters, extensions, foreign codes, odd lengths and anything
+# else fall through to phonenumbers, so the result is always the library's.
+_UZ_SIMPLE = re.compile(r"\+?[\d \-().\u00a0]+")
+_UZ_SEPARATORS = str.maketrans("", "", " -().\u00a0")
+_uz_valid = None
 
-def build_timeline(bookings: List[Dict], day: date) -> Dict[datetime, int]:
-    counts: Dict[datetime, int] = {}
-    for b in bookings:
-        s = datetime.fromisoformat(b["start_at"]).astimezone(UZ_TZ)
-        e = datetime.fromisoformat(b["end_at"]).astimezone(UZ_TZ)
-        cur = ceil_dt_to_step(s.replace(second=0, microsecond=0), STEP_MIN)
-        while cur < e:
-            counts[cur] = counts.get(cur, 0) + 1
-            cur += timedelta(minutes=STEP_MIN)
-    return counts
+def _uz_valid_national():
+    """Fullmatch for a valid UZ national number, compiled from phonenumbers' own UZ metadata."""
+    global _uz_valid
+    if _uz_valid is None:
+        from phonenumbers.phonemetadata import PhoneMetadata
+        import phonenumbers  # noqa: F401  (loads the metadata registry)
+        md = PhoneMetadata.metadata_for_region("UZ")
+        types = [getattr(md, k) for k in ("fixed_line", "mobile", "toll_free", "premium_rate", "shared_cost",
+                                           "personal_number", "voip", "pager", "uan", "voicemail")]
+        type_rx = "|".join(f"(?:{d.national_number_pattern})" for d in types if d and d.national_number_pattern)
+        lengths = set(md.general_desc.possible_length)
+        general = re.compile(md.general_desc.national_number_pattern)
+        by_type = re.compile(type_rx)
+        _uz_valid = lambda nsn: (len(nsn) in lengths and general.fullmatch(nsn) is not None
+                                 and by_type.fullmatch(nsn) is not None)
+    return _uz_valid
 
-def is_candidate_ok(start: datetime, dur: timedelta, counts: Dict[datetime,int]) -> bool:
-    cur = start
-    end = start + dur
-    while cur < end:
-        if counts.get(cur, 0) >= CAPACITY:
+def _uz_fast(raw: str):
+    """E.164 string, None for a definitely invalid UZ number, or False when the library has to decide."""
+    s = raw.strip()
+    if not _UZ_SIMPLE.fullmatch(s) or "+" in s[1:]:
+        return False
+    digits = s.translate(_UZ_SEPARATORS).lstrip("+")
+    if s.startswith("+"):
+        if not digits.startswith("998"):
             return False
-        cur += timedelta(minutes=STEP_MIN)
-    return True
+        nsn = digits[3:]
+    elif digits.startswith("00998"):
+        nsn = digits[5:]
+    elif len(digits) == 12 and digits.startswith("998"):
+        nsn = digits[3:]
+    elif len(digits) == 9:
+        nsn = digits
+    else:
+        return False
+    if len(nsn) != 9 or nsn.startswith("0"):
+        return False
+    return "+998" + nsn if _uz_valid_national()(nsn) else None
 
-def list_available_times(day: date, duration_min: int, existing: List[Dict]) -> List[datetime]:
-    now_local = datetime.now(UZ_TZ)
-    dur = timedelta(minutes=int(duration_min))
-    counts = build_timeline(existing, day)
-    times: List[datetime] = []
-
-    LUNCH_END = time(13, 0)
-    LUNCH_EDGE_50 = time(12, 50)
-    LUNCH_EDGE_55 = time(12, 55)
-
-    for ws, we in WORK_WINDOWS:
-        candidates = iter_window_candidates(day, ws, we, dur)
-        for t0 in candidates:
-            if t0 < now_local + MIN_AHEAD:
-                continue
+@lru_cache(maxsize=4096)
+def normalize_phone(raw: str):
+    fast = _uz_fast(raw)
+    return _normalize_phone_lib(raw) if fast is False else fast
 
-            if ws == WORK_WINDOWS[0][0] and we == LUNCH_END:
-                if t0.time() == LUNCH_EDGE_55:
-                    continue
-                if t0.time() == LUNCH_EDGE_50 and duration_min > 10:
-                    continue
+# Availability (rules and slot templates live in app/schedule.py)
+def list_available_times(day: date, duration_min: int, existing: List[Dict],
+                         service_id: Optional[str] = None) -> List[datetime]:
+    sched = get_schedule()
+    index = sched.day_indexes(existing).get(day)
+    return list(sched.free_starts(day, duration_min, index, service_id))
 
-            if t0 + dur > datetime.combine(day, we, UZ_TZ):
-                continue
-            if not is_candidate_ok(t0, dur, counts):
-                continue
-            times.append(t0)
-    return times
\ No newline at end of file
+def earliest_available_times(days: Sequence[date], duration_min: int, existing: List[Dict], n: int,
+                             service_id: Optional[str] = None) -> List[datetime]:
+    """
+    First `n` free starts across `days`, in order. `existing` covers the whole
+    range (one query) and is indexed per day and resource once; the scan stops at the n-th
+    hit instead of listing each day.
+    """
+    sched = get_schedule()
+    indexes = sched.day_indexes(existing)
+    per_day = (sched.free_starts(d, duration_min, indexes.get(d), service_id) for d in days)
+    return list(islice(chain.from_iterable(per_day), n))
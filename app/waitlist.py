@@ -0,0 +1,153 @@
+# app/waitlist.py
+"""
+Waitlist promotion: when capacity frees up on a day, offer it to the users
+waiting for that day, oldest first.
+
+An offer is a booking with status "held" (it takes capacity like a real
+booking, so nobody else can grab the slot) plus the waitlist entry moving
+from "waiting" to "offered" with an expiry. The user confirms (held ->
+booked) or declines (held -> cancelled); a sweeper cancels holds that ran
+out and offers the slot to the next user. Entry statuses:
+
+    waiting -> offered -> promoted | declined | expired
+    waiting -> left     (booked something else meanwhile, or the day passed)
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+
+from app.config import UZ_TZ, WAITLIST_HOLD_MIN
+from app.db import (
+    create_booking_sync, fetch_bookings_for_day_sync, fetch_expired_offers_sync, fetch_waitlist_sync,
+    get_active_booking_sync, get_service_sync, set_booking_status_sync, update_waitlist_sync,
+)
+from app.executors import DB_READ, DB_WRITE, run_in
+from app.keyboards import offer_kb
+from app.schedule import get_schedule
+
+logger = logging.getLogger(__name__)
+
+# one promotion pass per day at a time, so two cancellations cannot offer the same slot twice
+_day_locks: Dict[date, asyncio.Lock] = defaultdict(asyncio.Lock)
+_tasks: set = set()
+
+async def _offer(bot: Bot, entry: Dict, svc: Dict, start: datetime, resource_id: Optional[str],
+                 existing: List[Dict]) -> bool:
+    active = await run_in(DB_READ, get_active_booking_sync, entry["user_id"])
+    if active and active["status"] == "held":
+        # an offer for another day is pending; stay in line here until it is settled
+        return False
+    if active:
+        # booked something else since joining; one active booking per user
+        await run_in(DB_WRITE, update_waitlist_sync, entry["id"], "waiting", {"status": "left"})
+        return False
+    end = start + timedelta(minutes=int(svc["duration_min"]))
+    hold = await run_in(DB_WRITE, create_booking_sync, entry["user_id"], svc["id"], start, end, "held",
+                        resource_id)
+    expires = datetime.now(UZ_TZ) + timedelta(minutes=WAITLIST_HOLD_MIN)
+    upd = await run_in(DB_WRITE, update_waitlist_sync, entry["id"], "waiting",
+                       {"status": "offered", "booking_id": hold["id"], "offer_expires_at": expires})
+    if not upd:
+        # the user left the queue meanwhile
+        await run_in(DB_WRITE, set_booking_status_sync, hold["id"], "held", "cancelled")
+        return False
+    existing.append(hold)
+    try:
+        await bot.send_message(
+            entry["telegram_user_id"],
+            "🔔 Joy bo‘shadi!\n\n"
+            f"Xizmat: *{svc['name']}*\n"
+            f"Vaqt: {start:%Y-%m-%d %H:%M}–{end:%H:%M} (Asia/Tashkent)\n\n"
+            f"Bu vaqt siz uchun {WAITLIST_HOLD_MIN} daqiqa ({expires:%H:%M} gacha) band qilib turiladi. "
+            "Tasdiqlaysizmi?",
+            parse_mode="Markdown",
+            reply_markup=offer_kb(hold["id"]),
+        )
+    except Exception as e:
+        # blocked the bot / chat gone: the hold simply expires and moves on
+        logger.warning("Waitlist offer to %s not delivered: %s", entry["telegram_user_id"], e)
+    return True
+
+async def promote(bot: Bot, day: date) -> int:
+    """Offer free capacity on `day` to waiting users in FIFO order; returns the number of offers made."""
+    async with _day_locks[day]:
+        entries = await run_in(DB_READ, fetch_waitlist_sync, day)
+        if not entries:
+            return 0
+        day_start = datetime.combine(day, time(0, 0), UZ_TZ)
+        existing = await run_in(DB_READ, fetch_bookings_for_day_sync, day_start, day_start + timedelta(days=1))
+        services: Dict[str, Optional[Dict]] = {}
+        sched = get_schedule()
+        offered = 0
+        for entry in entries:
+            sid = entry["service_id"]
+            if sid not in services:
+                services[sid] = await run_in(DB_READ, get_service_sync, sid)
+            svc = services[sid]
+            if not svc:
+                continue
+            dur = int(svc["duration_min"])
+            index = sched.day_indexes(existing).get(day)
+            start = next(sched.free_starts(day, dur, index, sid), None)
+            if start is None:
+                continue
+            if await _offer(bot, entry, svc, start, sched.assign(start, dur, index, sid), existing):
+                offered += 1
+        if offered:
+            logger.info("Waitlist %s: %d offer(s) made, %d waiting", day, offered, len(entries) - offered)
+        return offered
+
+def capacity_freed(bot: Bot, booking: Dict) -> None:
+    """Called after a booking is cancelled; promotion runs in the background so the reply is not delayed."""
+    start = booking.get("start_at")
+    if not start:
+        return
+    day = datetime.fromisoformat(start).astimezone(UZ_TZ).date()
+    task = asyncio.create_task(promote(bot, day), name=f"waitlist-promote-{day}")
+    _tasks.add(task)
+    task.add_done_callback(_done)
+
+def _done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Waitlist promotion failed", exc_info=task.exception())
+
+async def sweep(bot: Bot) -> None:
+    """Release expired holds, retire entries for past days, and re-run promotion for days with waiters."""
+    days = set()
+    for entry in await run_in(DB_READ, fetch_expired_offers_sync):
+        if not await run_in(DB_WRITE, update_waitlist_sync, entry["id"], "offered", {"status": "expired"}):
+            continue  # confirmed or declined at the last moment
+        await run_in(DB_WRITE, set_booking_status_sync, entry["booking_id"], "held", "cancelled")
+        days.add(date.fromisoformat(entry["day"]))
+        try:
+            await bot.send_message(entry["telegram_user_id"],
+                                   "⌛ Taklif muddati tugadi, joy navbatdagi foydalanuvchiga berildi.")
+        except Exception as e:
+            logger.warning("Waitlist expiry notice to %s not delivered: %s", entry["telegram_user_id"], e)
+    today = datetime.now(UZ_TZ).date()
+    for entry in await run_in(DB_READ, fetch_waitlist_sync, None):
+        day = date.fromisoformat(entry["day"])
+        if day < today:
+            await run_in(DB_WRITE, update_waitlist_sync, entry["id"], "waiting", {"status": "left"})
+        else:
+            # also catches cancellations that bypassed the handlers (journal replay, dashboard edits)
+            days.add(day)
+    for day in sorted(days):
+        await promote(bot, day)
+    for day in [d for d in _day_locks if d < today and not _day_locks[d].locked()]:
+        del _day_locks[day]
+
+async def run_sweeper(bot: Bot, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sweep(bot)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Waitlist sweep failed")
@@ -1,8 +1,19 @@
+import asyncio
+import contextlib
 import csv
 import difflib
+import hashlib
+import io
+import logging
+import os
 import re
+import threading
+import time
 import unicodedata
-from typing import Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
 
 APOSTROPHE_VARIANTS = {"\u02bc", "\u02bb", "\u2018", "\u2019", "\u2032", "\uFF07"}
 
@@ -12,20 +23,39 @@ def normalize_name(name: str) -> str:
         s = s.replace(ch, "'")
     return re.sub(r"\s+", " ", s).strip().upper()
 
-def load_award_map(path: str) -> Dict[str, str]:
-    mp: Dict[str, str] = {}
-    with open(path, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
+class RosterError(ValueError):
+    """The roster file is missing, unreadable or has no usable names."""
+
+def _parse_roster(text: str, path: str) -> Dict[str, str]:
+    try:
+        reader = csv.DictReader(io.StringIO(text))
         if "name" not in (reader.fieldnames or []):
-            raise SystemExit("award_holders.csv must include 'name' header.")
+            raise RosterError(f"{path} must include 'name' header.")
+        mp: Dict[str, str] = {}
         for row in reader:
             raw = (row.get("name") or "").strip()
             if raw:
                 mp[normalize_name(raw)] = raw
+    except csv.Error as e:
+        raise RosterError(f"{path}: {e}") from e
     if not mp:
-        raise SystemExit("award_holders.csv contains no names.")
+        raise RosterError(f"{path} contains no names.")
     return mp
 
+def read_roster(path: str) -> Tuple[Dict[str, str], str, int]:
+    """(award_map, sha1 prefix, mtime_ns) from one read of the file."""
+    try:
+        with open(path, "rb") as f:
+            mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            data = f.read()
+        text = data.decode("utf-8-sig")
+    except (OSError, UnicodeDecodeError) as e:
+        raise RosterError(f"{path}: {e}") from e
+    return _parse_roster(text, path), hashlib.sha1(data).hexdigest()[:12], mtime_ns
+
+def load_award_map(path: str) -> Dict[str, str]:
+    return read_roster(path)[0]
+
 def best_match_90(input_name: str, award_keys: List[str], award_map: Dict[str, str]) -> Optional[Tuple[str, str]]:
     q = normalize_name(input_name)
     cands = difflib.get_close_matches(q, award_keys, n=1, cutoff=0.90)
@@ -36,4 +66,292 @@ def best_match_90(input_name: str, award_keys: List[str], award_map: Dict[str, s
 
 def suggestion_names(input_name: str, award_keys: List[str], award_map: Dict[str, str], n: int = 5) -> List[str]:
     q = normalize_name(input_name)
-    return [award_map[k] for k in difflib.get_close_matches(q, award_keys, n=n, cutoff=0.75)]
\ No newline at end of file
+    return [award_map[k] for k in difflib.get_close_matches(q, award_keys, n=n, cutoff=0.75)]
+
+# ----------------- Token index -----------------
+# "O'G'LI" / "QIZI" (son / daughter of) close an Uzbek patronymic; people often drop or misspell them
+PATRONYMIC_SUFFIXES = frozenset({"OGLI", "UGLI", "OGLY", "QIZI", "KIZI", "QIZ"})
+TOKEN_CUTOFF = 0.8       # per-token similarity for a typo to count as that token
+ACCEPT_SIMILARITY = 0.9  # mean token similarity needed to accept without asking
+ACCEPT_MARGIN = 0.05     # ...and this far ahead of the runner-up
+
+def name_tokens(normalized: str) -> List[str]:
+    """Comparable parts of a normalized name: apostrophes dropped, hyphens split, patronymic suffixes removed."""
+    out = []
+    for t in re.split(r"[\s\-]+", normalized.replace("'", "")):
+        if t and t not in PATRONYMIC_SUFFIXES and t not in out:
+            out.append(t)
+    return out
+
+class TokenIndex:
+    """
+    Word-order-insensitive lookup over roster names. Each name is reduced
+    to its tokens (surname, given name, patronymic); a query matches an
+    entry when every query token matches a distinct entry token, exactly or
+    within TOKEN_CUTOFF, and the surname and given name are among them.
+    So "Name Surname", "Surname Name" and "Name Surname Patronymic o'g'li"
+    all find "SURNAME NAME PATRONYMIC O'G'LI".
+    """
+
+    def __init__(self, award_map: Mapping[str, str]):
+        self.entries: List[Tuple[str, str, Tuple[str, ...]]] = []
+        self.postings: Dict[str, Set[int]] = {}
+        for key, canonical in award_map.items():
+            toks = tuple(name_tokens(key))
+            if len(toks) < 2:
+                continue
+            for t in toks:
+                self.postings.setdefault(t, set()).add(len(self.entries))
+            self.entries.append((key, canonical, toks))
+        self.vocab = list(self.postings)
+
+    def _alternatives(self, token: str) -> Dict[str, float]:
+        if token in self.postings:
+            return {token: 1.0}
+        sm = difflib.SequenceMatcher()
+        sm.set_seq2(token)
+        out = {}
+        for cand in difflib.get_close_matches(token, self.vocab, n=5, cutoff=TOKEN_CUTOFF):
+            sm.set_seq1(cand)
+            out[cand] = sm.ratio()
+        return out
+
+    def search(self, input_name: str, n: int = 5) -> List[Tuple[float, str, str]]:
+        """Ranked (similarity, key, canonical name); similarity is the mean over the query tokens."""
+        query = name_tokens(normalize_name(input_name))
+        if len(query) < 2:
+            return []
+        alts = [self._alternatives(t) for t in query]
+        if not all(alts):
+            return []
+        # entries containing (a variant of) every query token
+        hits: Optional[Set[int]] = None
+        for a in alts:
+            ids = set().union(*(self.postings[t] for t in a))
+            hits = ids if hits is None else hits & ids
+            if not hits:
+                return []
+        ranked = []
+        for i in hits:
+            key, canonical, toks = self.entries[i]
+            used: Set[str] = set()
+            total = 0.0
+            for a in sorted(alts, key=len):
+                best = max(((s, t) for t, s in a.items() if t in toks and t not in used), default=None)
+                if best is None:
+                    break
+                total += best[0]
+                used.add(best[1])
+            else:
+                if toks[0] in used and toks[1] in used:
+                    ranked.append((total / len(query), len(used) / len(toks), key, canonical))
+        # equal similarity: the entry the query covers more of first
+        ranked.sort(key=lambda r: (-r[0], -r[1], r[2]))
+        return [(sim, key, canonical) for sim, _, key, canonical in ranked[:n]]
+
+    def match(self, input_name: str) -> Optional[Tuple[str, str]]:
+        """(key, canonical) when one entry clearly wins, else None (callers fall back / show suggestions)."""
+        ranked = self.search(input_name, 2)
+        if not ranked or ranked[0][0] < ACCEPT_SIMILARITY:
+            return None
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < ACCEPT_MARGIN:
+            return None
+        return ranked[0][1], ranked[0][2]
+
+# ----------------- Versioned roster snapshots -----------------
+class RosterSnapshot:
+    """
+    One fully built roster: names, normalized keys and lookup index. Never
+    mutated after construction, so a handler holding a snapshot keeps a
+    consistent view while a reload builds and swaps in the next one.
+    """
+
+    __slots__ = ("name", "path", "version", "digest", "loaded_at", "award_map", "award_keys", "tokens")
+
+    def __init__(self, name: str, path: str, version: int, digest: str, award_map: Dict[str, str]):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.digest = digest
+        self.loaded_at = time.time()
+        self.award_map: Mapping[str, str] = MappingProxyType(award_map)
+        self.award_keys: Tuple[str, ...] = tuple(award_map)
+        self.tokens = TokenIndex(self.award_map)
+
+    def __len__(self) -> int:
+        return len(self.award_keys)
+
+    def best_match(self, input_name: str) -> Optional[Tuple[str, str]]:
+        """Exact key, then the token index (reordered / partial names), then whole-string difflib."""
+        key = normalize_name(input_name)
+        if key in self.award_map:
+            return key, self.award_map[key]
+        return self.tokens.match(input_name) or best_match_90(input_name, self.award_keys, self.award_map)
+
+    def suggestions(self, input_name: str, n: int = 5) -> List[str]:
+        out = [canonical for _, _, canonical in self.tokens.search(input_name, n)]
+        if len(out) < n:
+            out.extend(h for h in suggestion_names(input_name, self.award_keys, self.award_map, n) if h not in out)
+        return out[:n]
+
+class RosterRegistry:
+    """
+    Named rosters (selection rounds / cohorts) side by side. Each is loaded
+    on first use; reload() parses the file outside the lock and only the
+    reference swap happens under it, so readers never wait on the CSV and
+    never see a half-built roster. A roster that fails to load keeps its
+    previous snapshot.
+    """
+
+    def __init__(self, paths: Dict[str, str]):
+        self.paths = dict(paths)
+        self._snapshots: Dict[str, RosterSnapshot] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: Optional[str] = None) -> RosterSnapshot:
+        name = name or next(iter(self.paths))
+        snap = self._snapshots.get(name)
+        if snap is None:
+            snap = self.reload(name) or self._snapshots[name]
+        return snap
+
+    def all(self) -> List[RosterSnapshot]:
+        return [self.get(name) for name in self.paths]
+
+    def reload(self, name: str, force: bool = False) -> Optional[RosterSnapshot]:
+        """Rebuild `name` if its file changed (or `force`); the new snapshot, or None if nothing changed."""
+        if name not in self.paths:
+            raise KeyError(name)
+        path = self.paths[name]
+        if name in self._snapshots and not force:
+            try:
+                if os.stat(path).st_mtime_ns == self._mtimes.get(name):
+                    return None
+            except OSError as e:
+                raise RosterError(f"{path}: {e}") from e
+        try:
+            award_map, digest, mtime_ns = read_roster(path)
+        except RosterError:
+            # a broken file is reported once per change, not on every watch tick
+            with contextlib.suppress(OSError):
+                self._mtimes[name] = os.stat(path).st_mtime_ns
+            raise
+        with self._lock:
+            self._mtimes[name] = mtime_ns
+            current = self._snapshots.get(name)
+            if current is not None and current.digest == digest and not force:
+                return None  # touched, not changed
+            snap = RosterSnapshot(name, path, (current.version if current else 0) + 1, digest, award_map)
+            self._snapshots[name] = snap
+        logger.info("Roster %s v%d loaded: %d names from %s (sha1 %s)",
+                    name, snap.version, len(snap), path, digest)
+        return snap
+
+    def reload_changed(self) -> List[RosterSnapshot]:
+        swapped = []
+        for name in self.paths:
+            try:
+                snap = self.reload(name)
+            except RosterError as e:
+                logger.error("Roster %s not reloaded, keeping the current snapshot: %s", name, e)
+                continue
+            if snap is not None:
+                swapped.append(snap)
+        return swapped
+
+    def best_match(self, input_name: str) -> Optional[Tuple[RosterSnapshot, str, str]]:
+        """First roster (in configured order) with a 90% match: (snapshot, key, canonical name)."""
+        for snap in self.all():
+            match = snap.best_match(input_name)
+            if match:
+                return snap, match[0], match[1]
+        return None
+
+    def suggestions(self, input_name: str, n: int = 5) -> List[str]:
+        out: List[str] = []
+        for snap in self.all():
+            out.extend(h for h in snap.suggestions(input_name, n) if h not in out)
+        return out[:n]
+
+    async def watch(self, interval: float) -> None:
+        """Poll the roster files and swap in changed ones; runs for the life of the bot."""
+        from app.executors import CPU, run_in
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in(CPU, self.reload_changed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Roster watch failed")
+
+def parse_rosters(spec: str, default_path: str) -> Dict[str, str]:
+    """AWARD_ROSTERS ("round1=a.csv,round2=b.csv") as {name: path}; empty means AWARD_CSV alone."""
+    paths: Dict[str, str] = {}
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, sep, path = part.partition("=")
+        if not sep or not name.strip() or not path.strip():
+            raise SystemExit(f"Bad AWARD_ROSTERS entry: {part!r} (expected name=path.csv)")
+        paths[name.strip()] = path.strip()
+    return paths or {"default": default_path}
+
+_rosters: Optional[RosterRegistry] = None
+_rosters_lock = threading.Lock()
+
+def get_rosters() -> RosterRegistry:
+    global _rosters
+    if _rosters is None:
+        with _rosters_lock:
+            if _rosters is None:
+                from app.config import AWARD_CSV, AWARD_ROSTERS
+                _rosters = RosterRegistry(parse_rosters(AWARD_ROSTERS, AWARD_CSV))
+    return _rosters
+
+# ----------------- Registered names -----------------
+class RegisteredNames:
+    """
+    normalize_name() of every registered user, so the "already registered"
+    check on name entry is a set lookup instead of a query. Loaded on first
+    use and updated on each registration; reloaded after `ttl` seconds to
+    pick up users added or removed elsewhere. The unique full_name_key
+    constraint stays the source of truth: a name this set misses is still
+    refused by the final insert.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[str]], ttl: float = 300.0):
+        self._loader = loader
+        self.ttl = ttl
+        self._keys: Optional[Set[str]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current(self) -> Set[str]:
+        keys = self._keys
+        if keys is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return keys
+        with self._lock:
+            if self._keys is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._keys
+            try:
+                fresh = {normalize_name(n) for n in self._loader() if n}
+            except Exception:
+                if self._keys is None:
+                    raise
+                logger.warning("Registered-name reload failed; keeping %d cached names", len(self._keys), exc_info=True)
+                self._loaded_at = time.monotonic()
+                return self._keys
+            self._keys, self._loaded_at = fresh, time.monotonic()
+            return fresh
+
+    def __contains__(self, full_name: str) -> bool:
+        return normalize_name(full_name) in self._current()
+
+    def __len__(self) -> int:
+        return len(self._current())
+
+    def add(self, full_name: str) -> None:
+        with self._lock:
+            if self._keys is not None:
+                # copy-on-write: a reader iterating the old set is never disturbed
+                self._keys = self._keys | {normalize_name(full_name)}
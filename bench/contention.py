@@ -0,0 +1,188 @@
+# bench/contention.py
+"""
+Booking contention: many users opening the same morning at once.
+
+Every virtual user goes through the real handlers (book button ->
+pick_service -> pick_day -> pick_time) against the in-memory backend with
+the given DB latency, aiming at the first few starts of the first day that
+has any. A "Bu vaqt endi band bo‘ldi" alert sends the user back to the
+refreshed time list (a refetch), up to --retries times. Some users tap the
+time button twice (--double-tap), as happens on slow connections.
+
+Afterwards the booking table is checked against the invariants the flow
+is meant to keep: no resource over its capacity at any minute, and at most
+one active booking per user. Exits non-zero on a violation.
+
+--strategy picks how pick_time is guarded, so alternatives can be compared
+on the same load:
+    none       the handlers as they are (check, then insert)
+    day-lock   pick_time serialized per day within the process
+
+    python -m bench.contention --users 200 --db-latency 0.03
+    python -m bench.contention --users 200 --strategy day-lock --ramp 2
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, List
+
+from bench.harness import Harness
+from bench.loadtest import SERVICES, percentile, seed_users
+
+CONFLICT = "Bu vaqt endi band bo‘ldi"
+
+# ----------------- strategies -----------------
+def day_lock(h: Harness) -> None:
+    from app.callbacks import TimeCB
+    prefix = TimeCB.__prefix__ + TimeCB.__separator__
+    locks: Dict[date, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def serialize(handler, event, data):
+        if event.data and event.data.startswith(prefix):
+            async with locks[TimeCB.unpack(event.data).start.date()]:
+                return await handler(event, data)
+        return await handler(event, data)
+
+    h.dp.callback_query.outer_middleware(serialize)
+
+STRATEGIES = {"none": lambda h: None, "day-lock": day_lock}
+
+# ----------------- users -----------------
+class Stats:
+    def __init__(self):
+        self.outcome: Counter = Counter()
+        self.alerts: Counter = Counter()
+        self.refetches = 0
+        self.time_to_book: List[float] = []
+
+def _times(h: Harness, uid: int) -> List[str]:
+    return [data for _, data in h.session.buttons(uid) if data.startswith("t1:")]
+
+async def book_user(h: Harness, uid: int, args, rnd: random.Random, st: Stats) -> None:
+    from app.constants import BTN_BOOK
+    await asyncio.sleep(rnd.uniform(0, args.ramp))
+    t0 = time.perf_counter()
+    await h.send_text(uid, BTN_BOOK)
+    services = [data for _, data in h.session.buttons(uid) if data.startswith("s1:")]
+    if not services:
+        st.outcome["no_service"] += 1
+        return
+    await h.press(uid, services[0] if args.same_service else rnd.choice(services))
+    for day in [data for _, data in h.session.buttons(uid) if data.startswith("d1:")]:
+        await h.press(uid, day)
+        if _times(h, uid):
+            break
+    times = _times(h, uid)
+    for attempt in range(args.retries + 1):
+        if not times:
+            st.outcome["no_slots"] += 1
+            return
+        if attempt:
+            st.refetches += 1
+        pick = rnd.choice(times[:args.spread])
+        if rnd.random() < args.double_tap:
+            alerts = await asyncio.gather(h.press(uid, pick), h.press(uid, pick))
+        else:
+            alerts = [await h.press(uid, pick)]
+        for a in alerts:
+            if a:
+                st.alerts[a.split(".")[0].split("(")[0].strip()] += 1
+        if any(a is None for a in alerts):
+            st.outcome["booked"] += 1
+            st.time_to_book.append(time.perf_counter() - t0)
+            return
+        if not any(a and a.startswith(CONFLICT) for a in alerts):
+            st.outcome["rejected"] += 1
+            return
+        times = _times(h, uid)  # the conflict alert comes with a refreshed time list
+    st.outcome["gave_up"] += 1
+
+# ----------------- invariants -----------------
+def check_invariants(rows: List[Dict]) -> Dict[str, int]:
+    from app.schedule import booking_minutes, get_schedule
+    capacity = {r.id: r.capacity for r in get_schedule().resources}
+    now = datetime.now(timezone.utc)
+    active = [r for r in rows if r.get("status") in ("booked", "held")
+              and datetime.fromisoformat(r["end_at"]) > now]
+
+    per_user = Counter(r["user_id"] for r in active if r["status"] == "booked")
+    out = {"users_with_2+_active": sum(1 for n in per_user.values() if n > 1),
+           "rows_without_resource": sum(1 for r in active if r.get("resource_id") not in capacity)}
+
+    # minutes where a resource serves more bookings than it has seats
+    load: Dict[tuple, Counter] = defaultdict(Counter)
+    for r in active:
+        for d, s, e in booking_minutes(r):
+            load[(r.get("resource_id"), d)][s] += 1
+            load[(r.get("resource_id"), d)][e] -= 1
+    over = 0
+    for (rid, _), deltas in load.items():
+        running, cap = 0, capacity.get(rid, 0)
+        for x in sorted(deltas):
+            running += deltas[x]
+            if running > cap and rid in capacity:
+                over += 1
+    out["capacity_breaches"] = over
+    return out
+
+# ----------------- run -----------------
+async def run(args) -> int:
+    h = Harness(api_latency=args.api_latency, db_latency=args.db_latency)
+    h.install_executor(args.workers)
+    STRATEGIES[args.strategy](h)
+    h.db.seed("service", SERVICES)
+    uids = [30_000 + i for i in range(args.users)]
+    seed_users(h, uids)
+
+    rnd = random.Random(args.seed)
+    st = Stats()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(book_user(h, uid, args, random.Random(rnd.random()), st) for uid in uids))
+    elapsed = time.perf_counter() - t0
+
+    rows = h.db.tables["booking"]
+    booked = st.outcome["booked"]
+    picks = sum(len(s) for name, s in h.samples.items() if name == "pick_time")
+    conflicts = st.alerts.get(CONFLICT, 0)
+    print(f"strategy {args.strategy}: {args.users} users, db latency {args.db_latency * 1000:.0f} ms, "
+          f"ramp {args.ramp:.1f}s")
+    print(f"\noutcome: {dict(st.outcome)}   booking rows: {len(rows)}")
+    print(f"throughput: {booked / elapsed:.2f} bookings/s ({booked} in {elapsed:.2f}s)")
+    if st.time_to_book:
+        print(f"time to booking p50={percentile(st.time_to_book, 50) * 1000:.0f}ms "
+              f"p95={percentile(st.time_to_book, 95) * 1000:.0f}ms")
+    print(f"pick_time: {picks} presses, {conflicts} conflicts ({conflicts / max(picks, 1):.1%}), "
+          f"{st.refetches} refetches")
+    print(f"db calls: {h.db.calls} total, {h.db.calls / max(booked, 1):.1f} per booking")
+    if st.alerts:
+        print(f"alerts: {dict(st.alerts)}")
+    if h.errors:
+        print(f"handler errors: {dict(h.errors)}")
+
+    inv = check_invariants(rows)
+    print(f"\ninvariants: {inv}")
+    return 1 if inv["users_with_2+_active"] or inv["capacity_breaches"] else 0
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--strategy", choices=sorted(STRATEGIES), default="none")
+    ap.add_argument("--db-latency", type=float, default=0.02, help="seconds per DB round trip")
+    ap.add_argument("--api-latency", type=float, default=0.05, help="seconds per Telegram call")
+    ap.add_argument("--ramp", type=float, default=0.0, help="arrivals spread uniformly over this many seconds")
+    ap.add_argument("--spread", type=int, default=3, help="users pick among the first N offered starts")
+    ap.add_argument("--retries", type=int, default=3, help="re-picks after a conflict before giving up")
+    ap.add_argument("--double-tap", type=float, default=0.05, help="share of time presses sent twice at once")
+    ap.add_argument("--same-service", action="store_true", help="everybody books the first service")
+    ap.add_argument("--workers", type=int, default=32, help="DB executor threads")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    raise SystemExit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
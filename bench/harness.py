@@ -0,0 +1,448 @@
+# bench/harness.py
+"""
+Offline harness around the real Dispatcher from bot.py.
+
+Telegram is replaced by `MockSession` (records every outgoing call, with a
+configurable latency) and Supabase by `FakeSupabase` (an in-memory table
+store that understands the PostgREST builder calls SupabaseRepository
+makes), so the production query code path is what gets measured. Updates
+are fed through `dp.feed_update`, so filters, FSM and middlewares all run
+exactly as in production.
+"""
+import asyncio
+import contextvars
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# app.config refuses to import without these; nothing here talks to the network
+os.environ.setdefault("BOT_TOKEN", "123456:bench-harness-token")
+os.environ.setdefault("SUPABASE_URL", "https://bench.invalid")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-key")
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import AnswerCallbackQuery, GetMe, SendDocument, SendMessage, TelegramMethod
+from aiogram.types import Message, Update, User
+from postgrest.exceptions import APIError
+
+# Per-update accounting shared by the dispatcher middleware and the fake DB
+_update_stats: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("bench_update", default=None)
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """`run_in_executor` does not copy contextvars; this one does, so DB calls know their update."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        ctx = contextvars.copy_context()
+        return super().submit(ctx.run, fn, *args, **kwargs)
+
+# ----------------- Fake Supabase -----------------
+def _as_dt(v):
+    if isinstance(v, str):
+        try:
+            return datetime.fromisoformat(v)
+        except ValueError:
+            return v
+    return v
+
+# tables whose set_updated_at trigger (migrations/) stamps updated_at on every write
+STAMPED = ("app_user", "service", "booking", "waitlist")
+
+_CMP = {"eq": lambda a, b: a == b, "neq": lambda a, b: a != b, "gt": lambda a, b: a > b,
+        "gte": lambda a, b: a >= b, "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b}
+
+def _split_top(s: str) -> List[str]:
+    """Split a PostgREST logic list on the commas outside parentheses and quotes."""
+    out, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(s):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "()":
+            depth += 1 if ch == "(" else -1
+        elif not quoted and ch == "," and depth == 0:
+            out.append(s[start:i])
+            start = i + 1
+    out.append(s[start:])
+    return out
+
+def _logic(op: str, body: str):
+    preds = [_logic_term(t) for t in _split_top(body)]
+    if op == "and":
+        return lambda r: all(p(r) for p in preds)
+    return lambda r: any(p(r) for p in preds)
+
+def _logic_term(term: str):
+    m = re.fullmatch(r"(and|or)\((.*)\)", term)
+    if m:
+        return _logic(m.group(1), m.group(2))
+    col, op, value = term.split(".", 2)
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    _check_value(col, value)
+    cmp = _CMP[op]
+    return lambda r: r.get(col) is not None and cmp(_as_dt(r[col]), _as_dt(value))
+
+def _check_value(col: str, value) -> None:
+    # ids are uuid columns in Postgres; an empty string is rejected before any row is read
+    if col == "id" and value == "":
+        raise APIError({"code": "22P02", "message": 'invalid input syntax for type uuid: ""'})
+
+# unique indexes of the production schema (migrations/), enforced on insert like Postgres would
+UNIQUE = {"app_user": ("telegram_user_id", "full_name_key")}
+# multi-column partial unique indexes: table -> (columns, row predicate)
+PARTIAL_UNIQUE = {"waitlist": (("user_id", "service_id", "day"), lambda r: r.get("status") in ("waiting", "offered"))}
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self._filters = []
+        self._negate = False
+        self._cols: Optional[List[str]] = None
+        self._order: List[tuple] = []
+        self._limit = None
+        self._offset = 0
+        self._single = False
+        self._maybe = False
+        self._op = "select"
+        self._payload = None
+        # PostgREST-style query string, so tracing sees the same shapes as in production
+        self._params: List[str] = []
+
+    # -- builders --
+    def select(self, cols: str = "*"):
+        self._cols = None if cols.strip() == "*" else [c.strip() for c in cols.split(",")]
+        return self
+
+    def insert(self, payload):
+        self._op, self._payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self._op, self._payload = "update", payload
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _add(self, pred, col: str, op: str, value):
+        _check_value(col, value)
+        neg, self._negate = self._negate, False
+        self._filters.append((lambda r: not pred(r)) if neg else pred)
+        self._params.append(f"{col}={'not.' if neg else ''}{op}.{value}")
+        return self
+
+    @property
+    def path(self) -> str:
+        return "/" + self.table_name
+
+    @property
+    def http_method(self) -> str:
+        return {"select": "GET", "insert": "POST", "update": "PATCH"}[self._op]
+
+    @property
+    def params(self) -> str:
+        head = [f"select={','.join(self._cols) if self._cols else '*'}"] if self._op == "select" else []
+        tail = []
+        if self._order:
+            tail.append("order=" + ",".join(f"{c}.{'desc' if d else 'asc'}" for c, d in self._order))
+        if self._offset:
+            tail.append(f"offset={self._offset}")
+        if self._limit is not None:
+            tail.append(f"limit={self._limit}")
+        return "&".join(head + self._params + tail)
+
+    def eq(self, col, v):
+        return self._add(lambda r: r.get(col) == v, col, "eq", v)
+
+    def neq(self, col, v):
+        return self._add(lambda r: r.get(col) != v, col, "neq", v)
+
+    def lt(self, col, v):
+        return self._add(lambda r: r.get(col) is not None and _as_dt(r[col]) < _as_dt(v), col, "lt", v)
+
+    def gt(self, col, v):
+        return self._add(lambda r: r.get(col) is not None and _as_dt(r[col]) > _as_dt(v), col, "gt", v)
+
+    def gte(self, col, v):
+        return self._add(lambda r: r.get(col) is not None and _as_dt(r[col]) >= _as_dt(v), col, "gte", v)
+
+    def in_(self, col, values):
+        vs = set(values)
+        return self._add(lambda r: r.get(col) in vs, col, "in", f"({','.join(map(str, values))})")
+
+    def is_(self, col, v):
+        return self._add(lambda r: r.get(col) is None if v == "null" else r.get(col) == v, col, "is", v)
+
+    def ilike(self, col, pattern):
+        rx = re.compile("^" + re.escape(pattern).replace("%", ".*").replace("_", ".") + "$", re.I)
+        return self._add(lambda r: isinstance(r.get(col), str) and rx.match(r[col]) is not None, col, "ilike", pattern)
+
+    def or_(self, filters: str):
+        pred = _logic("or", filters)
+        self._filters.append(pred)
+        self._params.append(f"or=({filters})")
+        return self
+
+    def order(self, col, desc: bool = False):
+        # chained calls add tiebreak columns, as postgrest-py does
+        self._order.append((col, desc))
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    def maybe_single(self):
+        self._single = self._maybe = True
+        return self
+
+    # -- execution --
+    def _project(self, row):
+        return dict(row) if self._cols is None else {c: row.get(c) for c in self._cols}
+
+    def execute(self):
+        return self.db._execute(self)
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict]] = defaultdict(list)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def seed(self, table: str, rows: List[Dict]) -> None:
+        stamp = {"updated_at": datetime.now(timezone.utc).isoformat()} if table in STAMPED else {}
+        with self._lock:
+            self.tables[table].extend({**stamp, **r} for r in rows)
+
+    def _execute(self, q: FakeQuery) -> _Result:
+        if self.latency:
+            time.sleep(self.latency)
+        stats = _update_stats.get()
+        with self._lock:
+            self.calls += 1
+            if stats is not None:
+                stats["db"] += 1
+            rows = self.tables[q.table_name]
+            if q._op == "insert":
+                payloads = q._payload if isinstance(q._payload, list) else [q._payload]
+                out = []
+                for p in payloads:
+                    for col in UNIQUE.get(q.table_name, ()):
+                        if p.get(col) is not None and any(r.get(col) == p[col] for r in rows):
+                            raise APIError({"code": "23505",
+                                            "message": f'duplicate key value violates unique constraint "{q.table_name}_{col}_key"',
+                                            "details": f"Key ({col})=({p[col]}) already exists."})
+                    if q.table_name in PARTIAL_UNIQUE:
+                        cols, where = PARTIAL_UNIQUE[q.table_name]
+                        if where(p) and any(where(r) and all(r.get(c) == p.get(c) for c in cols) for r in rows):
+                            raise APIError({"code": "23505",
+                                            "message": f'duplicate key value violates unique constraint "{q.table_name}_open_uq"',
+                                            "details": f"Key ({', '.join(cols)})=({', '.join(str(p.get(c)) for c in cols)}) already exists."})
+                    now = datetime.now(timezone.utc).isoformat()
+                    row = {"id": str(uuid.uuid4()), "created_at": now, **p}
+                    if q.table_name in STAMPED:
+                        row["updated_at"] = now
+                    rows.append(row)
+                    out.append(dict(row))
+                return _Result(out)
+            matched = [r for r in rows if all(f(r) for f in q._filters)]
+            if q._op == "update":
+                stamp = {"updated_at": datetime.now(timezone.utc).isoformat()} if q.table_name in STAMPED else {}
+                for r in matched:
+                    r.update(q._payload, **stamp)
+                return _Result([dict(r) for r in matched])
+            # stable sorts from the last key to the first; nulls sort last ascending, first descending
+            for col, desc in reversed(q._order):
+                matched.sort(key=lambda r: (r.get(col) is None, _as_dt(r.get(col)) if r.get(col) is not None else 0),
+                             reverse=desc)
+            if q._offset or q._limit is not None:
+                matched = matched[q._offset:None if q._limit is None else q._offset + q._limit]
+            data = [q._project(r) for r in matched]
+        if q._single:
+            if q._maybe and not data:
+                return None
+            if len(data) != 1:
+                raise APIError({"code": "PGRST116", "message": f"JSON object requested, {len(data)} rows returned"})
+            return _Result(data[0])
+        return _Result(data)
+
+# ----------------- Mock Telegram session -----------------
+class MockSession(BaseSession):
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: List[TelegramMethod] = []
+        self.by_method: Dict[str, int] = defaultdict(int)
+        # callback_query_id -> show_alert text
+        self.alerts: Dict[str, str] = {}
+        # (chat_id, message_id) -> last reply_markup / text shown on that message
+        self.screens: Dict[tuple, Any] = {}
+        self.texts: Dict[tuple, Optional[str]] = {}
+        self.last_message_id: Dict[int, int] = {}
+        self._ids = itertools.count(1000)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError("file downloads are not simulated")
+
+    def next_message_id(self) -> int:
+        return next(self._ids)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls.append(method)
+        self.by_method[type(method).__name__] += 1
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bench", username="bench_bot")
+        if isinstance(method, (SendMessage, SendDocument)):
+            mid = next(self._ids)
+            chat_id = method.chat_id
+            self.screens[(chat_id, mid)] = method.reply_markup
+            self.texts[(chat_id, mid)] = getattr(method, "text", None)
+            self.last_message_id[chat_id] = mid
+            return Message.model_validate(
+                {"message_id": mid, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+                 "text": getattr(method, "text", None)},
+                context={"bot": bot},
+            )
+        if isinstance(method, AnswerCallbackQuery):
+            if method.show_alert and method.text:
+                self.alerts[method.callback_query_id] = method.text
+            return True
+        if hasattr(method, "message_id") and hasattr(method, "reply_markup"):
+            # edit_text / edit_reply_markup keep the message id; Telegram rejects edits that change nothing
+            key = (method.chat_id, method.message_id)
+            text = getattr(method, "text", self.texts.get(key))
+            if key in self.screens and self.screens[key] == method.reply_markup and self.texts.get(key) == text:
+                raise TelegramBadRequest(method, "Bad Request: message is not modified")
+            self.screens[key] = method.reply_markup
+            self.texts[key] = text
+            self.last_message_id[method.chat_id] = method.message_id
+        return True
+
+    def buttons(self, chat_id: int, message_id: Optional[int] = None) -> List[tuple]:
+        """(text, callback_data) pairs of the keyboard currently on a message (default: latest)."""
+        mid = message_id or self.last_message_id.get(chat_id)
+        markup = self.screens.get((chat_id, mid))
+        rows = getattr(markup, "inline_keyboard", None) or []
+        return [(b.text, b.callback_data) for row in rows for b in row if b.callback_data]
+
+# ----------------- Harness -----------------
+class Harness:
+    def __init__(self, api_latency: float = 0.0, db_latency: float = 0.0, throttle: bool = False,
+                 screen_cache: bool = False, replica: bool = False):
+        import app.config as config
+        from app.repository import set_repository
+        from app.repository.supabase_repo import SupabaseRepository
+        self.db = FakeSupabase(db_latency)
+        self.repo = SupabaseRepository(self.db)
+        if replica:
+            # the production read path: SQLite mirror in front of the (fake) primary, synced by the caller
+            from app.repository.replica import ReplicaRepository
+            from app.repository.sqlite_repo import SqliteRepository
+            self.repo = ReplicaRepository(self.repo, SqliteRepository(foreign_keys=False))
+        set_repository(self.repo)
+
+        import bot as bot_module
+        self.session = MockSession(api_latency)
+        self.bot = Bot(config.BOT_TOKEN, session=self.session)
+        if screen_cache:
+            from app.screen_cache import ScreenCacheMiddleware
+            self.bot.session.middleware(ScreenCacheMiddleware())
+        if throttle:
+            from app.ratelimit import ThrottlingRequestMiddleware
+            self.bot.session.middleware(ThrottlingRequestMiddleware())
+        self.dp = bot_module.build_dispatcher()
+        # root-router inner middlewares also wrap every included router's handlers
+        self.dp.message.middleware(self._track_handler)
+        self.dp.callback_query.middleware(self._track_handler)
+
+        self._update_ids = itertools.count(1)
+        # handler name -> list of (latency, db_calls)
+        self.samples: Dict[str, List[tuple]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    async def _track_handler(handler, event, data):
+        stats = _update_stats.get()
+        if stats is not None:
+            route = data.get("dispatch_route")
+            cb = route.callback if route is not None else data["handler"].callback
+            stats["handler"] = getattr(cb, "__name__", repr(cb))
+        return await handler(event, data)
+
+    def install_executor(self, workers: int = 32) -> None:
+        asyncio.get_running_loop().set_default_executor(ContextThreadPoolExecutor(max_workers=workers))
+        # handlers submit DB work to the named pools; size them like the default one
+        from app import executors
+        executors.configure(db_read=workers, db_write=workers)
+
+    async def _feed(self, payload: Dict) -> None:
+        stats = {"handler": None, "db": 0}
+        token = _update_stats.set(stats)
+        update = Update.model_validate({"update_id": next(self._update_ids), **payload}, context={"bot": self.bot})
+        t0 = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors[stats["handler"] or "unhandled"] += 1
+        finally:
+            _update_stats.reset(token)
+        self.samples[stats["handler"] or "unhandled"].append((time.perf_counter() - t0, stats["db"]))
+
+    @staticmethod
+    def _user(uid: int) -> Dict:
+        return {"id": uid, "is_bot": False, "first_name": f"user{uid}"}
+
+    async def send_text(self, uid: int, text: str) -> None:
+        await self._feed({"message": {
+            "message_id": self.session.next_message_id(), "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"}, "from": self._user(uid), "text": text,
+        }})
+
+    async def send_contact(self, uid: int, phone: str) -> None:
+        await self._feed({"message": {
+            "message_id": self.session.next_message_id(), "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"}, "from": self._user(uid),
+            "contact": {"phone_number": phone, "first_name": "u", "user_id": uid},
+        }})
+
+    async def press(self, uid: int, data: str, message_id: Optional[int] = None) -> Optional[str]:
+        """Press an inline button; returns the alert text the bot answered with, if any."""
+        mid = message_id or self.session.last_message_id.get(uid) or self.session.next_message_id()
+        cq_id = f"cq{next(self._update_ids)}"
+        await self._feed({"callback_query": {
+            "id": cq_id, "from": self._user(uid), "chat_instance": str(uid), "data": data,
+            "message": {"message_id": mid, "date": int(time.time()), "chat": {"id": uid, "type": "private"}, "text": "…"},
+        }})
+        return self.session.alerts.pop(cq_id, None)
@@ -0,0 +1,166 @@
+# bench/loadtest.py
+"""
+Offline load test: registration storms and booking rushes against the real
+Dispatcher with a mocked Telegram session and in-memory database.
+
+    python -m bench.loadtest --users 200 --db-latency 0.03 --api-latency 0.05
+    python -m bench.loadtest --scenario booking --users 100
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from bench.harness import Harness
+
+SERVICES = [
+    {"id": str(uuid.uuid4()), "name": "Hujjat topshirish", "duration_min": 15},
+    {"id": str(uuid.uuid4()), "name": "Shartnoma imzolash", "duration_min": 30},
+    {"id": "84db3cdc-62c4-407e-a951-415bfc416e81", "name": "Moliyaviy kafillik xati", "duration_min": 10},
+]
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, round(p / 100 * (len(s) - 1))))
+    return s[k]
+
+def seed_users(h: Harness, uids: List[int]) -> None:
+    now = datetime.now(timezone.utc).isoformat()
+    h.db.seed("app_user", [
+        {"id": str(uuid.uuid4()), "telegram_user_id": uid, "full_name": f"BENCH USER {uid}",
+         "full_name_key": f"BENCH USER {uid}",
+         "phone": "+998901234567", "email": f"u{uid}@example.com", "country": "UK",
+         "university": "Bench", "created_at": now}
+        for uid in uids
+    ])
+
+# ----------------- scenarios -----------------
+async def register_user(h: Harness, uid: int, name: str) -> None:
+    await h.send_text(uid, "/start")
+    await h.send_text(uid, name)
+    await h.send_text(uid, f"+99890{uid % 10_000_000:07d}")
+    await h.send_text(uid, f"user{uid}@example.com")
+    await h.send_text(uid, "United Kingdom")
+    await h.send_text(uid, "University of Birmingham")
+
+async def registration_storm(h: Harness, n: int) -> Dict[str, int]:
+    from app.whitelist import get_rosters
+    names = list(get_rosters().get().award_map.values())
+    random.shuffle(names)
+    uids = [10_000 + i for i in range(min(n, len(names)))]
+    await asyncio.gather(*(register_user(h, uid, names[i]) for i, uid in enumerate(uids)))
+    return {"registered": len(h.db.tables["app_user"])}
+
+async def book_user(h: Harness, uid: int, outcome: Dict[str, int]) -> None:
+    from app.constants import BTN_BOOK
+    await h.send_text(uid, BTN_BOOK)
+    svc_buttons = [data for _, data in h.session.buttons(uid) if data.startswith("s1:")]
+    if not svc_buttons:
+        outcome["no_service"] += 1
+        return
+    await h.press(uid, random.choice(svc_buttons))
+    days = [data for _, data in h.session.buttons(uid) if data.startswith("d1:")]
+    for day in days:
+        await h.press(uid, day)
+        times = [data for _, data in h.session.buttons(uid) if data.startswith("t1:")]
+        if not times:
+            continue
+        # everybody aims at the first few slots of the morning
+        alert = await h.press(uid, random.choice(times[:3]))
+        outcome["conflict" if alert else "booked"] += 1
+        return
+    outcome["no_slots"] += 1
+
+async def booking_rush(h: Harness, n: int) -> Dict[str, int]:
+    h.db.seed("service", SERVICES)
+    uids = [20_000 + i for i in range(n)]
+    seed_users(h, uids)
+    outcome: Dict[str, int] = {"booked": 0, "conflict": 0, "no_slots": 0, "no_service": 0}
+    await asyncio.gather(*(book_user(h, uid, outcome) for uid in uids))
+    outcome["booking_rows"] = len(h.db.tables["booking"])
+    return outcome
+
+# ----------------- report -----------------
+def report(h: Harness, elapsed: float, outcome: Dict[str, int]) -> None:
+    all_lat = [lat for samples in h.samples.values() for lat, _ in samples]
+    total = len(all_lat)
+    print(f"\nupdates: {total} in {elapsed:.2f}s -> {total / elapsed:.1f} updates/sec")
+    print(f"latency p50={percentile(all_lat, 50) * 1000:.1f}ms "
+          f"p95={percentile(all_lat, 95) * 1000:.1f}ms p99={percentile(all_lat, 99) * 1000:.1f}ms")
+    print(f"db calls: {h.db.calls}   telegram calls: {dict(h.session.by_method)}")
+    print(f"outcome: {outcome}")
+    if h.errors:
+        print(f"handler errors: {dict(h.errors)}")
+    print(f"\n{'handler':<28}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db/upd':>8}")
+    for name, samples in sorted(h.samples.items(), key=lambda kv: -len(kv[1])):
+        lats = [lat for lat, _ in samples]
+        db = sum(c for _, c in samples) / len(samples)
+        print(f"{name:<28}{len(samples):>6}{percentile(lats, 50) * 1000:>9.1f}"
+              f"{percentile(lats, 95) * 1000:>9.1f}{percentile(lats, 99) * 1000:>9.1f}{db:>8.2f}")
+
+async def replica_sync(h: Harness, interval: float, stats: Dict[str, int]) -> None:
+    """The replica sync loop, counting passes and failures instead of only logging them."""
+    from app.executors import DB_READ, run_in
+    while True:
+        try:
+            stats["rows"] += await run_in(DB_READ, h.repo.sync_once)
+            stats["passes"] += 1
+        except Exception:
+            stats["failures"] += 1
+            logging.getLogger(__name__).exception("replica sync failed")
+        await asyncio.sleep(interval)
+
+def replica_diff(h: Harness) -> Dict[str, int]:
+    """Rows per replicated table whose mirror copy is missing or differs in updated_at."""
+    from app.repository.replica import REPLICATED_TABLES
+    out = {}
+    for table in REPLICATED_TABLES:
+        local = {r["id"]: r["updated_at"] for r in h.repo.local._execute(f"SELECT id, updated_at FROM {table}")}
+        out[table] = sum(1 for r in h.db.tables[table]
+                         if r["id"] not in local or datetime.fromisoformat(local[r["id"]]) != datetime.fromisoformat(r["updated_at"]))
+    return out
+
+async def run(args) -> None:
+    h = Harness(api_latency=args.api_latency, db_latency=args.db_latency, throttle=args.throttle,
+                screen_cache=args.screen_cache, replica=args.replica)
+    h.install_executor(args.workers)
+    sync, sync_stats = None, Counter()
+    if args.replica:
+        sync = asyncio.create_task(replica_sync(h, args.replica_interval, sync_stats))
+    t0 = time.perf_counter()
+    if args.scenario == "registration":
+        outcome = await registration_storm(h, args.users)
+    else:
+        outcome = await booking_rush(h, args.users)
+    report(h, time.perf_counter() - t0, outcome)
+    if sync is not None:
+        sync.cancel()
+        h.repo.sync_once()
+        print(f"\nreplica: {dict(sync_stats)}, rows behind after a final pass: {replica_diff(h)}")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", choices=["registration", "booking"], default="registration")
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--db-latency", type=float, default=0.02, help="seconds per DB round trip")
+    ap.add_argument("--api-latency", type=float, default=0.05, help="seconds per Telegram call")
+    ap.add_argument("--workers", type=int, default=32, help="default executor threads")
+    ap.add_argument("--throttle", action="store_true", help="enable the outbound rate limiter")
+    ap.add_argument("--screen-cache", action="store_true", help="skip no-op edits (app/screen_cache.py)")
+    ap.add_argument("--replica", action="store_true", help="serve reads from the SQLite mirror (app/repository/replica.py)")
+    ap.add_argument("--replica-interval", type=float, default=0.5, help="seconds between replica sync passes")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    random.seed(args.seed)
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
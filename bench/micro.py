@@ -0,0 +1,233 @@
+# bench/micro.py
+"""
+Microbenchmarks for the CPU-bound helpers the handlers call on every
+update: availability, roster name matching, phone normalization and
+keyboard building. Inputs are synthetic and seeded (dense booking days,
+a roster grown from the real one, messy phone input), so two runs on
+the same machine measure the same work.
+
+Results are stored as a JSON baseline; a later run compared against it
+prints the relative delta per benchmark and exits non-zero when one got
+slower than --threshold. Baselines are per machine, so save one before
+the change and compare after it on the same host.
+
+    python -m bench.micro --save                 # writes micro_baseline.json
+    python -m bench.micro --compare              # ... and compares against it
+    python -m bench.micro -k roster --compare other.json --threshold 0.2
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time as _time
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app import keyboards, utils
+from app.config import AWARD_CSV, UZ_TZ
+from app.schedule import get_schedule
+from app.whitelist import RosterSnapshot, best_match_90, normalize_name, read_roster, suggestion_names
+from bench.names import impostors, variants
+from bench.phone import corpus as phone_corpus, random_corpus as random_phones
+from bench.schedule import DURATIONS, random_day_bookings
+
+DEFAULT_BASELINE = "micro_baseline.json"
+
+class Bench(NamedTuple):
+    name: str
+    fn: Callable[[], object]
+    ops: int   # operations done by one call of fn; results are per operation
+
+# ----------------- data generators -----------------
+def first_open_day(start: date) -> date:
+    sched = get_schedule()
+    d = start
+    while sched.is_closed(d) or not sched.windows(d):
+        d += timedelta(days=1)
+    return d
+
+def booking_days(rnd: random.Random, first: date, days: int, per_day: int) -> List[Dict]:
+    """`per_day` random bookings on each of `days` open days from `first`, services mixed."""
+    out, d = [], first
+    for _ in range(days):
+        d = first_open_day(d)
+        out.extend(random_day_bookings(rnd, d, per_day))
+        d += timedelta(days=1)
+    return out
+
+def large_roster(base: Dict[str, str], rnd: random.Random, size: int) -> Dict[str, str]:
+    """The real roster plus names recombined from its surnames, given names and patronymics."""
+    parts = [v.split() for v in base.values() if len(v.split()) >= 3]
+    out = dict(base)
+    while len(out) < size:
+        name = " ".join([rnd.choice(parts)[0], rnd.choice(parts)[1], *rnd.choice(parts)[2:]])
+        out.setdefault(normalize_name(name), name)
+    return out
+
+def name_queries(roster: Dict[str, str], rnd: random.Random, count: int) -> List[str]:
+    names = rnd.sample(list(roster.values()), min(count, len(roster)))
+    out = [q for canonical in names for q in variants(canonical, rnd).values()]
+    out += impostors(names, rnd, len(names) // 4)
+    rnd.shuffle(out)
+    return out[:count]
+
+# ----------------- benchmarks -----------------
+def build(args) -> List[Bench]:
+    rnd = random.Random(args.seed)
+    # far enough ahead that MIN_AHEAD never trims the day
+    day = first_open_day(datetime.now(UZ_TZ).date() + timedelta(days=7))
+    light = random_day_bookings(rnd, day, 5)
+    dense = random_day_bookings(rnd, day, 120)
+    horizon = booking_days(rnd, day, 10, 60)
+    horizon_days = sorted({datetime.fromisoformat(b["start_at"]).astimezone(UZ_TZ).date() for b in horizon})
+    sched = get_schedule()
+    starts = list(sched.template(day, 30).starts) or [datetime.combine(day, time(10, 0), UZ_TZ)]
+
+    base, _, _ = read_roster(args.roster)
+    roster = large_roster(base, rnd, args.roster_size)
+    snap = RosterSnapshot("bench", args.roster, 1, "bench", roster)
+    keys = list(roster)
+    queries = name_queries(roster, rnd, 200)
+    slow_queries = queries[:20]  # difflib over the whole roster is milliseconds per call
+    raw_names = [q.lower() + "  " for q in queries]
+
+    phones = phone_corpus() + random_phones(2000, args.seed)
+    kb_slots = starts[:40]
+    kb_earliest = starts[:6]
+
+    def each(fn: Callable, inputs: List) -> Callable[[], None]:
+        def run():
+            for x in inputs:
+                fn(x)
+        return run
+
+    def phone_warm():
+        for raw in phones:
+            utils.normalize_phone(raw)
+
+    return [
+        # availability
+        Bench("availability/list_available_times light day",
+              lambda: [utils.list_available_times(day, dur, light) for dur in DURATIONS], len(DURATIONS)),
+        Bench("availability/list_available_times dense day",
+              lambda: [utils.list_available_times(day, dur, dense) for dur in DURATIONS], len(DURATIONS)),
+        Bench("availability/earliest_available_times 10-day horizon",
+              lambda: utils.earliest_available_times(horizon_days, 30, horizon, 6), 1),
+        Bench("availability/day_indexes dense day", lambda: sched.day_indexes(dense), 1),
+        Bench("availability/check_start", each(lambda s: sched.check_start(s, 30), starts), len(starts)),
+        # roster
+        Bench("roster/normalize_name", each(normalize_name, raw_names), len(raw_names)),
+        Bench("roster/snapshot best_match", each(snap.best_match, queries), len(queries)),
+        Bench("roster/snapshot suggestions", each(snap.suggestions, queries), len(queries)),
+        Bench("roster/best_match_90 (difflib)",
+              each(lambda q: best_match_90(q, keys, roster), slow_queries), len(slow_queries)),
+        Bench("roster/suggestion_names (difflib)",
+              each(lambda q: suggestion_names(q, keys, roster), slow_queries), len(slow_queries)),
+        Bench("roster/snapshot build", lambda: RosterSnapshot("bench", args.roster, 1, "bench", roster), 1),
+        # phones
+        Bench("phone/normalize_phone uncached", each(utils.normalize_phone.__wrapped__, phones), len(phones)),
+        Bench("phone/normalize_phone warm cache", phone_warm, len(phones)),
+        # keyboards
+        Bench("keyboards/times_kb 40 slots", lambda: keyboards.times_kb(day, kb_slots, "svc"), 1),
+        Bench("keyboards/times_kb empty day", lambda: keyboards.times_kb(day, [], "svc"), 1),
+        Bench("keyboards/days_kb", lambda: keyboards.days_kb(10, "svc"), 1),
+        Bench("keyboards/earliest_kb", lambda: keyboards.earliest_kb(kb_earliest, "svc"), 1),
+        Bench("keyboards/times_kb 40 slots, uncached", lambda: keyboards._times_kb(day, kb_slots, "svc"), 1),
+        Bench("keyboards/days_kb, uncached", lambda: keyboards._days_kb(10, "svc"), 1),
+    ]
+
+# ----------------- timing -----------------
+def measure(bench: Bench, rounds: int, min_time: float) -> Dict[str, float]:
+    """Per-operation microseconds: calls per sample grow until one sample takes `min_time`."""
+    bench.fn()  # warm caches and lazy imports
+    number = 1
+    while True:
+        t0 = _time.perf_counter()
+        for _ in range(number):
+            bench.fn()
+        elapsed = _time.perf_counter() - t0
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed * 10 > min_time else 10
+    samples = [elapsed]
+    for _ in range(rounds - 1):
+        t0 = _time.perf_counter()
+        for _ in range(number):
+            bench.fn()
+        samples.append(_time.perf_counter() - t0)
+    per_op = [s / number / bench.ops * 1e6 for s in samples]
+    return {"best_us": min(per_op), "median_us": statistics.median(per_op), "samples": len(per_op)}
+
+def load_baseline(path: str) -> Optional[Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-k", dest="pattern", default="", help="only benchmarks whose name contains this")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.05, help="seconds per timing sample")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--roster", default=AWARD_CSV)
+    ap.add_argument("--roster-size", type=int, default=5000)
+    ap.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, metavar="PATH", help="write results as the baseline")
+    ap.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, metavar="PATH", help="report deltas against a baseline")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    args = ap.parse_args()
+
+    baseline = None
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline is None:
+            sys.exit(f"no baseline at {args.compare}; run with --save first")
+    benches = [b for b in build(args) if args.pattern in b.name]
+
+    results: Dict[str, Dict[str, float]] = {}
+    regressions = []
+    print(f"{'benchmark':<54}{'best us':>10}{'median':>10}" + (f"{'baseline':>10}{'delta':>9}" if baseline else ""))
+    for b in benches:
+        r = results[b.name] = measure(b, args.rounds, args.min_time)
+        line = f"{b.name:<54}{r['best_us']:>10.2f}{r['median_us']:>10.2f}"
+        old = (baseline or {}).get("results", {}).get(b.name)
+        if old:
+            delta = r["best_us"] / old["best_us"] - 1
+            flag = ""
+            if delta > args.threshold:
+                flag = "  SLOWER"
+                regressions.append((b.name, delta))
+            elif delta < -args.threshold:
+                flag = "  faster"
+            line += f"{old['best_us']:>10.2f}{delta:>+8.1%}{flag}"
+        elif baseline:
+            line += f"{'-':>10}{'new':>9}"
+        print(line)
+
+    if args.save:
+        doc = {
+            "created": datetime.now(UZ_TZ).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()} {platform.node()}",
+            "params": {"seed": args.seed, "roster_size": args.roster_size, "rounds": args.rounds},
+            # keep entries for benchmarks filtered out with -k
+            "results": {**((load_baseline(args.save) or {}).get("results", {})), **results},
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        print(f"\nbaseline written to {args.save}")
+    if baseline:
+        if baseline.get("python") != platform.python_version():
+            print(f"\nnote: baseline is from Python {baseline.get('python')}, this is {platform.python_version()}")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for name, delta in regressions:
+                print(f"  {name}: {delta:+.1%}")
+            sys.exit(1)
+        print(f"\nno regressions over {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# bench/names.py
+"""
+Roster name matching: match rate and latency of the whole-string difflib
+matcher (best_match_90) against the snapshot matcher (exact key, token
+index, then difflib).
+
+Queries are generated from the roster itself in the ways students type
+their names: reordered, patronymic dropped, lower case, apostrophes
+missing, one-letter typos. "Impostor" queries pair one holder's surname
+with another's given name and must not match anyone.
+
+    python -m bench.names
+    python -m bench.names --roster award_holders.csv --seed 3
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import AWARD_CSV
+from app.whitelist import (
+    RosterSnapshot, best_match_90, name_tokens, normalize_name, read_roster,
+)
+
+def _typo(word: str, rnd: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    i = rnd.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:] if rnd.random() < 0.5 else word[:i] + word[i + 1:]
+
+def variants(canonical: str, rnd: random.Random) -> Dict[str, str]:
+    parts = canonical.split()
+    surname, given, rest = parts[0], parts[1], parts[2:]
+    plain = lambda s: s.replace("‘", "").replace("'", "").replace("ʻ", "")
+    return {
+        "exact": canonical,
+        "lower case": canonical.lower(),
+        "no apostrophes": plain(canonical),
+        "given surname": f"{given} {surname}",
+        "surname given": f"{surname} {given}",
+        "given surname patronymic": " ".join([given, surname, *rest]),
+        "no patronymic suffix": " ".join(p for p in parts if name_tokens(normalize_name(p))),
+        "typo in surname": " ".join([_typo(surname, rnd), given, *rest]),
+        "given surname, typo": f"{given} {_typo(surname, rnd)}".lower(),
+    }
+
+def impostors(names: List[str], rnd: random.Random, count: int) -> List[str]:
+    pairs = set()
+    taken = {tuple(name_tokens(normalize_name(n))[:2]) for n in names}
+    while len(pairs) < count:
+        a, b = rnd.sample(names, 2)
+        s, g = a.split()[0], b.split()[1]
+        if (normalize_name(s), normalize_name(g)) not in taken:
+            pairs.add(f"{g} {s}")
+    return sorted(pairs)
+
+def run(label: str, fn: Callable[[str], Optional[Tuple[str, str]]], cases: List[Tuple[str, str, Optional[str]]]):
+    by_kind: Dict[str, List[int]] = {}
+    times = []
+    for kind, query, expected in cases:
+        t0 = time.perf_counter()
+        got = fn(query)
+        times.append(time.perf_counter() - t0)
+        ok = (got is None) if expected is None else (got is not None and got[1] == expected)
+        by_kind.setdefault(kind, []).append(ok)
+    return label, by_kind, times
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--roster", default=AWARD_CSV)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    award_map, digest, _ = read_roster(args.roster)
+    snap = RosterSnapshot("bench", args.roster, 1, digest, award_map)
+    keys = list(award_map)
+    names = list(award_map.values())
+    cases = [(kind, q, canonical) for canonical in names for kind, q in variants(canonical, rnd).items()]
+    cases += [("impostor (must not match)", q, None) for q in impostors(names, rnd, len(names))]
+
+    results = [
+        run("difflib (before)", lambda q: best_match_90(q, keys, award_map), cases),
+        run("snapshot (after)", snap.best_match, cases),
+    ]
+    kinds = list(dict.fromkeys(kind for kind, _, _ in cases))
+    print(f"{len(names)} roster names, {len(cases)} queries\n")
+    print(f"{'query kind':<28}" + "".join(f"{label:>18}" for label, _, _ in results))
+    for kind in kinds:
+        print(f"{kind:<28}" + "".join(f"{sum(r[kind]) / len(r[kind]):>17.0%} " for _, r, _ in results))
+    print(f"{'overall':<28}" + "".join(
+        f"{sum(sum(v) for v in r.values()) / len(cases):>17.1%} " for _, r, _ in results))
+    for label, _, times in results:
+        ms = sorted(t * 1000 for t in times)
+        print(f"\n{label}: mean {statistics.mean(ms):.3f} ms, p50 {ms[len(ms) // 2]:.3f} ms, "
+              f"p99 {ms[int(len(ms) * 0.99)]:.3f} ms per query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench/phone.py
+"""
+normalize_phone: equivalence check and timing of the UZ fast path.
+
+Builds a corpus of the formats people actually send (Telegram contacts
+without "+", typed numbers with spaces, dashes, brackets, "00" prefixes,
+bare national numbers, foreign and junk input) plus random separator
+noise, and asserts the fast path returns exactly what phonenumbers does
+for every entry. Exits non-zero on the first mismatch.
+
+    python -m bench.phone
+    python -m bench.phone --random 50000 --rounds 5
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Callable, List
+
+from app import utils
+
+# National numbers: current mobile and fixed-line ranges, plus some that
+# the metadata rejects
+NATIONAL = [
+    "901234567", "911234567", "931234567", "941234567", "951234567", "971234567",
+    "981234567", "991234567", "331234567", "881234567", "771234567", "501234567",
+    "551234567", "201234567", "712345678", "662345678", "652345678", "612345678",
+    "691234567", "751234567", "791234567", "621234567", "731234567", "761234567",
+    "001234567", "101234567", "301234567", "401234567", "811234567", "891234567",
+]
+
+FORMATS = [
+    "+998{n}", "998{n}", "00998{n}", "{n}", "+998 {a} {b} {c} {d}", "+998 ({a}) {b}-{c}-{d}",
+    "998 {a} {b} {c} {d}", "({a}) {b}-{c}-{d}", "{a} {b} {c} {d}", "{a}-{b}-{c}-{d}",
+    "+998-{a}-{b}-{c}-{d}", "8 {a} {b} {c} {d}", "8{n}", "0{n}", "+998 {n}", " +998{n} ",
+    "+998.{a}.{b}.{c}.{d}", "+998 {a} {b} {c} {d}", "+ 998 {n}",
+    "+998{n}1", "+998{short}", "998{short}", "+998 {n} ext. 12", "tel: +998{n}",
+    "+998{n}+", "998+{n}", "++998{n}", "+998 {a} ABC {d}", "(+998) {n}",
+]
+
+OTHER = [
+    "", " ", "+", "-", "12", "abc", "+7 912 345-67-89", "+44 20 7946 0958", "+1 (415) 555-2671",
+    "+90 532 123 45 67", "+992 93 123 4567", "+996 555 123 456", "+82 10-1234-5678",
+    "0044 20 7946 0958", "+9989012345678", "+99890123456", "99890123456", "9989012345678",
+    "+998000000000", "+998 99 999 99 99", "+998 20 000 00 00", "998998998998", "998 998 998 998",
+    "+998901234567;ext=1", "+998 90 123 45 67 / 68",
+]
+
+def corpus() -> List[str]:
+    out = list(OTHER)
+    for n in NATIONAL:
+        parts = {"n": n, "a": n[:2], "b": n[2:5], "c": n[5:7], "d": n[7:], "short": n[:-1]}
+        out.extend(f.format(**parts) for f in FORMATS)
+    return out
+
+def random_corpus(count: int, seed: int = 1) -> List[str]:
+    """Digits with random prefixes and separators, weighted towards plausible UZ input."""
+    rnd = random.Random(seed)
+    prefixes = ["+998", "998", "00998", "", "+", "8", "0", "+7", "+99", "00"]
+    seps = ["", " ", "-", "(", ")", ".", " ", "  "]
+    out = []
+    for _ in range(count):
+        digits = rnd.choice(["9", "3", "2", "5", "6", "7", "8", "0", "1"]) + \
+            "".join(rnd.choice("0123456789") for _ in range(rnd.choice([7, 8, 8, 8, 9, 10])))
+        s = rnd.choice(prefixes)
+        for ch in digits:
+            s += ch + (rnd.choice(seps) if rnd.random() < 0.3 else "")
+        out.append(s)
+    return out
+
+def check(inputs: List[str]) -> int:
+    """Mismatch count between the fast path (uncached) and the library-only reference."""
+    bad = 0
+    for raw in inputs:
+        fast, ref = utils.normalize_phone.__wrapped__(raw), utils._normalize_phone_lib(raw)
+        if fast != ref:
+            bad += 1
+            print(f"MISMATCH {raw!r}: fast={fast!r} phonenumbers={ref!r}")
+    return bad
+
+def timed(fn: Callable, inputs: List[str], rounds: int) -> float:
+    """Best per-call time in microseconds over `rounds` passes."""
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for raw in inputs:
+            fn(raw)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(inputs) * 1e6
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--random", type=int, default=20000, help="extra randomly generated inputs")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    real = corpus()
+    noise = random_corpus(args.random)
+    bad = check(real) + check(noise)
+    print(f"equivalence: {len(real)} real-world + {len(noise)} random inputs, {bad} mismatches")
+    if bad:
+        sys.exit(1)
+
+    uz = [raw for raw in real if utils._uz_fast(raw) is not False]
+    print(f"fast path decides {len(uz)}/{len(real)} of the real-world corpus")
+    for label, inputs in (("whole corpus", real), ("UZ inputs only", uz)):
+        utils.normalize_phone.cache_clear()
+        rows = [
+            ("phonenumbers only", timed(utils._normalize_phone_lib, inputs, args.rounds)),
+            ("fast path, uncached", timed(utils.normalize_phone.__wrapped__, inputs, args.rounds)),
+            ("fast path + LRU (warm)", timed(utils.normalize_phone, inputs, args.rounds)),
+        ]
+        print(f"\n{label:<24} {'us/call':>9} {'speedup':>8}")
+        for name, us in rows:
+            print(f"{name:<24} {us:>9.2f} {rows[0][1] / us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
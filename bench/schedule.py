@@ -0,0 +1,181 @@
+# bench/schedule.py
+"""
+Slot availability: equivalence with the pre-rules code and timing.
+
+`legacy_available_times` is the hardcoded algorithm the schedule rules
+replaced (WORK_WINDOWS, STEP_MIN, CAPACITY, lunch-edge special cases). With
+the default rules, the compiled templates must return exactly the same
+starts for every (day, duration, random occupancy) in the corpus. Exits
+non-zero on any mismatch.
+
+`--resources N` adds a scaling run: N resources with random skills over a
+handful of services and days carrying hundreds of bookings, timing the full
+list of free starts and the resource assignment per (day, duration).
+
+    python -m bench.schedule
+    python -m bench.schedule --days 60 --rounds 5
+    python -m bench.schedule --resources 30
+"""
+import argparse
+import random
+import sys
+import time as _time
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+
+from app.config import UZ_TZ
+from app.schedule import DEFAULT_RULES, Schedule
+
+DURATIONS = (5, 10, 15, 20, 25, 30, 40, 45, 60, 90)
+
+# ----------------- reference: the code before app/schedule.py -----------------
+WORK_WINDOWS = [(time(9, 30), time(13, 0)), (time(14, 0), time(18, 0))]
+STEP_MIN = 5
+CAPACITY = 2
+MIN_AHEAD = timedelta(hours=2)
+
+def _ceil(dt: datetime) -> datetime:
+    m = (dt.minute // STEP_MIN) * STEP_MIN
+    dt0 = dt.replace(second=0, microsecond=0, minute=m)
+    return dt0 + timedelta(minutes=STEP_MIN) if dt0 < dt else dt0
+
+def legacy_available_times(day: date, duration_min: int, existing: List[Dict], now: datetime) -> List[datetime]:
+    if day.weekday() in (5, 6) or (day.month == 9 and day.day == 1):
+        return []
+    dur = timedelta(minutes=duration_min)
+    counts: Dict[datetime, int] = {}
+    for b in existing:
+        s = datetime.fromisoformat(b["start_at"]).astimezone(UZ_TZ)
+        e = datetime.fromisoformat(b["end_at"]).astimezone(UZ_TZ)
+        cur = _ceil(s.replace(second=0, microsecond=0))
+        while cur < e:
+            counts[cur] = counts.get(cur, 0) + 1
+            cur += timedelta(minutes=STEP_MIN)
+    out = []
+    for ws, we in WORK_WINDOWS:
+        cur, end = datetime.combine(day, ws, UZ_TZ), datetime.combine(day, we, UZ_TZ)
+        while cur + dur <= end:
+            t0, cur = cur, cur + timedelta(minutes=STEP_MIN)
+            if t0 < now + MIN_AHEAD:
+                continue
+            if we == time(13, 0) and (t0.time() == time(12, 55) or (t0.time() == time(12, 50) and duration_min > 10)):
+                continue
+            c, ok = t0, True
+            while c < t0 + dur:
+                if counts.get(c, 0) >= CAPACITY:
+                    ok = False
+                    break
+                c += timedelta(minutes=STEP_MIN)
+            if ok:
+                out.append(t0)
+    return out
+
+# ----------------- corpus -----------------
+def random_day_bookings(rnd: random.Random, day: date, n: int) -> List[Dict]:
+    """Bookings of random length on and off the 5-minute grid, some spilling outside working hours."""
+    out = []
+    for _ in range(n):
+        start = datetime.combine(day, time(9, 0), UZ_TZ) + timedelta(minutes=rnd.randrange(0, 10 * 60),
+                                                                      seconds=rnd.choice([0, 0, 0, 30]))
+        out.append({"start_at": start.isoformat(), "end_at": (start + timedelta(minutes=rnd.choice(DURATIONS))).isoformat()})
+    return out
+
+def resource_rules(rnd: random.Random, n: int, services: List[str]) -> Dict:
+    """DEFAULT_RULES with `n` resources, each handling a random subset of `services`."""
+    resources = [{"id": f"r{i}", "capacity": rnd.choice((1, 1, 2)),
+                  "services": rnd.sample(services, rnd.randint(1, len(services)))} for i in range(n)]
+    return {**DEFAULT_RULES, "resources": resources}
+
+def run_resources(args, rnd: random.Random, first: date, now: datetime) -> None:
+    services = [f"svc-{i}" for i in range(6)]
+    sched = Schedule(resource_rules(rnd, args.resources, services))
+    cases = []
+    for i in range(args.days):
+        day = first + timedelta(days=i)
+        for load in (0, 10 * args.resources, 25 * args.resources):
+            bookings = random_day_bookings(rnd, day, load)
+            for b in bookings:
+                b["service_id"] = rnd.choice(services)
+            cases.append((day, bookings))
+
+    def run():
+        for day, bookings in cases:
+            index = sched.day_indexes(bookings).get(day)
+            for dur in DURATIONS:
+                sid = services[dur % len(services)]
+                free = list(sched.free_starts(day, dur, index, sid, now=now))
+                for start in free[:3]:
+                    sched.assign(start, dur, index, sid)
+
+    calls = len(cases) * len(DURATIONS)
+    best = float("inf")
+    for _ in range(args.rounds):
+        t0 = _time.perf_counter()
+        run()
+        best = min(best, _time.perf_counter() - t0)
+    peak = max(len(b) for _, b in cases)
+    print(f"\n{args.resources} resources, up to {peak} bookings/day: {best / calls * 1e6:.1f} us per "
+          f"(index, free starts, 3 assignments)")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--days", type=int, default=40, help="consecutive days checked, weekends and 09-01 included")
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--resources", type=int, default=0, help="also time N skilled resources on busy days")
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    sched = Schedule(DEFAULT_RULES)
+    first = date(2026, 8, 20)  # spans 09-01
+    now = datetime.combine(first, time(10, 7), UZ_TZ)
+    cases = []
+    for i in range(args.days):
+        day = first + timedelta(days=i)
+        for load in (0, 5, 25, 60, 120):
+            cases.append((day, random_day_bookings(rnd, day, load)))
+
+    bad = checked = 0
+    for day, bookings in cases:
+        index = sched.day_indexes(bookings).get(day)
+        for dur in DURATIONS:
+            ref = legacy_available_times(day, dur, bookings, now)
+            got = list(sched.free_starts(day, dur, index, now=now))
+            checked += 1
+            if ref != got:
+                bad += 1
+                print(f"MISMATCH {day} dur={dur} bookings={len(bookings)}: legacy={len(ref)} compiled={len(got)}")
+    print(f"equivalence: {checked} (day, duration, occupancy) cases, {bad} mismatches")
+    if bad:
+        sys.exit(1)
+
+    def run_legacy():
+        for day, bookings in cases:
+            for dur in DURATIONS:
+                legacy_available_times(day, dur, bookings, now)
+
+    def run_compiled(s: Schedule):
+        for day, bookings in cases:
+            index = s.day_indexes(bookings).get(day)
+            for dur in DURATIONS:
+                list(s.free_starts(day, dur, index, now=now))
+
+    calls = len(cases) * len(DURATIONS)
+    rows = []
+    for label, fn in (("legacy", run_legacy),
+                      ("compiled, cold templates", lambda: run_compiled(Schedule(DEFAULT_RULES))),
+                      ("compiled, cached templates", lambda: run_compiled(sched))):
+        best = float("inf")
+        for _ in range(args.rounds):
+            t0 = _time.perf_counter()
+            fn()
+            best = min(best, _time.perf_counter() - t0)
+        rows.append((label, best / calls * 1e6))
+    print(f"\n{'':<28}{'us/call':>9}{'speedup':>9}")
+    for label, us in rows:
+        print(f"{label:<28}{us:>9.1f}{rows[0][1] / us:>8.1f}x")
+    if args.resources:
+        run_resources(args, rnd, first, now)
+
+if __name__ == "__main__":
+    main()
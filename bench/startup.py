@@ -0,0 +1,67 @@
+# bench/startup.py
+"""
+Cold-start benchmark: time from process spawn to the first handled update.
+
+Each run is a fresh interpreter that imports the bot through the offline
+harness, builds the dispatcher and feeds one /start from a registered
+user (so the first DB call, and every lazy initializer behind it, is on
+the clock). Reports the median and worst of each milestone.
+
+    python -m bench.startup --runs 7
+    python -m bench.startup --runs 7 --json > startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child; T0 is the parent's wall clock right before spawning it
+CHILD = r"""
+import asyncio, json, os, sys, time
+t0 = float(os.environ["BENCH_T0"])
+marks = {"interpreter": time.time() - t0}
+from bench.harness import Harness
+from bench.loadtest import seed_users
+marks["imports"] = time.time() - t0
+h = Harness()
+marks["dispatcher_built"] = time.time() - t0
+seed_users(h, [1])
+asyncio.run(h.send_text(1, "/start"))
+marks["first_update"] = time.time() - t0
+assert h.session.calls, "no reply to /start"
+print(json.dumps(marks))
+"""
+
+MILESTONES = ("interpreter", "imports", "dispatcher_built", "first_update")
+
+def run_once() -> dict:
+    env = {**os.environ, "BENCH_T0": repr(time.time())}
+    proc = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--json", action="store_true", help="print the raw runs and summary as JSON")
+    args = ap.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {m: {"median_ms": statistics.median(r[m] for r in runs) * 1000,
+                   "max_ms": max(r[m] for r in runs) * 1000} for m in MILESTONES}
+    if args.json:
+        print(json.dumps({"runs": runs, "summary": summary}, indent=2))
+        return
+    print(f"{args.runs} cold starts (ms since spawn)")
+    print(f"{'milestone':<18} {'median':>8} {'max':>8}")
+    for m in MILESTONES:
+        print(f"{m:<18} {summary[m]['median_ms']:>8.0f} {summary[m]['max_ms']:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,112 @@
 import asyncio
 import logging
+import sys
 
 from aiogram import Bot, Dispatcher
-from app.config import BOT_TOKEN
+from aiogram.filters import ExceptionTypeFilter
+from app import executors
+from app.config import (
+    BOT_TOKEN, METRICS_HOST, METRICS_PORT, ROSTER_WATCH_INTERVAL, SCHEDULE_WATCH_INTERVAL, SLOW_QUERY_LOG,
+    WAITLIST_SWEEP_INTERVAL,
+)
+from app.instrumentation import HandlerMetricsMiddleware
+from app.metrics import start_metrics_server
+from app.tracing import configure_slow_log
+from app.startup import warm_up
+from app.whitelist import RosterError, get_rosters
+from app.schedule import get_store
+from app.waitlist import run_sweeper
+from app.ratelimit import ThrottlingRequestMiddleware
+from app.screen_cache import ScreenCacheMiddleware
+from app.dispatch import table
+from app.repository import DatabaseUnavailable, start_background_tasks
+from app.handlers.errors import on_db_unavailable
 from app.handlers.registration import router as reg_router
 from app.handlers.booking import router as booking_router
 from app.handlers.my_bookings import router as my_bookings_router
 from app.handlers import services
 from app.handlers import admin as admin_handlers
+from app.handlers import diagnostics
+from app.handlers import waitlist as waitlist_handlers  # noqa: F401 -- callbacks register on `table`
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger("elyurt-bot")
 
-async def main() -> None:
-    bot = Bot(BOT_TOKEN)
+def build_dispatcher() -> Dispatcher:
+    # Routers are module-level singletons, so this can only be called once per process
     dp = Dispatcher()
+    # exact-text buttons and callback prefixes resolve here in O(1); stateful handlers follow,
+    # and button texts typed in a text-input state (table.defer_to) fall through to them
+    dp.include_router(table.router)
     dp.include_router(admin_handlers.router)
+    dp.include_router(diagnostics.router)
     dp.include_router(reg_router)
     dp.include_router(booking_router)
     dp.include_router(my_bookings_router)
     dp.include_router(services.router)
+    # breaker open / deadline hit and no snapshot to serve: fast "try later" reply
+    dp.errors.register(on_db_unavailable, ExceptionTypeFilter(DatabaseUnavailable))
+    # inner middlewares on the root router wrap the handlers of every included router
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    logger.info("Dispatch table: %d routes", len(table.routes()))
+    return dp
+
+def build_bot(**kwargs) -> Bot:
+    bot = Bot(BOT_TOKEN, **kwargs)
+    # outermost first: an edit answered from the screen cache never waits for a rate-limit token
+    bot.session.middleware(ScreenCacheMiddleware())
+    bot.session.middleware(ThrottlingRequestMiddleware())
+    return bot
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+async def main() -> None:
+    configure_slow_log(SLOW_QUERY_LOG)
+    bot = build_bot()
+    dp = build_dispatcher()
+    # registration cannot work without the award roster: load it alongside getMe and refuse to start on errors
+    rosters = asyncio.create_task(executors.run_in(executors.CPU, get_rosters().all))
     me = await bot.get_me()
+    try:
+        await rosters
+    except RosterError as e:
+        logger.error("Award roster failed to load: %s", e)
+        raise SystemExit(1)
     logger.info("Bot started as @%s (id=%s)", me.username, me.id)
-    await dp.start_polling(bot)
+    background = start_background_tasks()
+    # polling starts right away; clients, schedule and phonenumbers load on the cpu pool meanwhile
+    warm = asyncio.create_task(executors.run_in(executors.CPU, warm_up), name="warm-up")
+    warm.add_done_callback(_log_failure)
+    if ROSTER_WATCH_INTERVAL > 0:
+        background.append(asyncio.create_task(get_rosters().watch(ROSTER_WATCH_INTERVAL), name="roster-watch"))
+    if SCHEDULE_WATCH_INTERVAL > 0:
+        background.append(asyncio.create_task(get_store().watch(SCHEDULE_WATCH_INTERVAL), name="schedule-watch"))
+    if WAITLIST_SWEEP_INTERVAL > 0:
+        background.append(asyncio.create_task(run_sweeper(bot, WAITLIST_SWEEP_INTERVAL), name="waitlist-sweep"))
+    metrics_runner = None
+    if METRICS_PORT:
+        metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        logger.info("Metrics on http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        for task in [warm, *background]:
+            task.cancel()
+        executors.shutdown()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv[1:]:
+        from app.startup import profile_startup
+        profile_startup()
+        raise SystemExit(0)
     try:
         asyncio.run(main())
-    except (KeyboardInterrupt, SystemExit):
-        logger.info("Bot stopped.")
\ No newline at end of file
+    except (KeyboardInterrupt, SystemExit) as e:
+        logger.info("Bot stopped.")
+        if isinstance(e, SystemExit) and e.code:
+            raise
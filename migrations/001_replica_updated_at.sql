@@ -0,0 +1,27 @@
+-- Watermark column for the local read replica (app/repository/replica.py).
+-- The replica pulls rows ordered by (updated_at, id), so every write must bump updated_at.
+
+create or replace function set_updated_at() returns trigger as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$ language plpgsql;
+
+alter table app_user add column if not exists updated_at timestamptz not null default now();
+alter table service  add column if not exists updated_at timestamptz not null default now();
+alter table booking  add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists app_user_set_updated_at on app_user;
+create trigger app_user_set_updated_at before update on app_user
+  for each row execute function set_updated_at();
+drop trigger if exists service_set_updated_at on service;
+create trigger service_set_updated_at before update on service
+  for each row execute function set_updated_at();
+drop trigger if exists booking_set_updated_at on booking;
+create trigger booking_set_updated_at before update on booking
+  for each row execute function set_updated_at();
+
+create index if not exists app_user_updated_idx on app_user (updated_at, id);
+create index if not exists service_updated_idx  on service  (updated_at, id);
+create index if not exists booking_updated_idx  on booking  (updated_at, id);
@@ -0,0 +1,16 @@
+-- Unique normalized name for app_user, so "already registered" is decided by the database
+-- instead of an unanchored ilike scan. The bot writes full_name_key = app.whitelist.normalize_name(full_name):
+-- NFKC, apostrophe variants folded to ', whitespace collapsed, upper-cased.
+
+alter table app_user add column if not exists full_name_key text;
+
+-- Backfill existing rows with the same folding (NFKC needs PostgreSQL 13+)
+update app_user
+   set full_name_key = upper(btrim(regexp_replace(
+         translate(normalize(full_name, NFKC), U&'\02BC\02BB\2018\2019\2032\FF07', ''''''''''''''),
+         '\s+', ' ', 'g')))
+ where full_name_key is null and full_name is not null;
+
+-- Fails if two users already share a name; resolve those rows first:
+--   select full_name_key, count(*) from app_user group by 1 having count(*) > 1;
+create unique index if not exists app_user_full_name_key_key on app_user (full_name_key);
@@ -0,0 +1,6 @@
+-- One account per Telegram user, enforced by the database so registration is a single
+-- insert: a 23505 on this index means "already registered" (app/handlers/registration.py).
+
+-- Fails if an account was registered twice; keep the oldest row of each pair first:
+--   select telegram_user_id, count(*) from app_user group by 1 having count(*) > 1;
+create unique index if not exists app_user_telegram_user_id_key on app_user (telegram_user_id);
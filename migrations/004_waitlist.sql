@@ -0,0 +1,29 @@
+-- Waitlist for full days (app/waitlist.py). When a booking is cancelled the freed slot is
+-- offered to the oldest waiting entry as a booking with status 'held', which counts toward
+-- occupancy like 'booked'; the user confirms (held -> booked) or the hold is cancelled after
+-- WAITLIST_HOLD_MIN minutes and offered to the next entry.
+--
+-- entry status: waiting -> offered -> promoted | declined | expired; waiting -> left
+
+create table if not exists waitlist (
+  id uuid primary key default gen_random_uuid(),
+  user_id uuid not null references app_user (id),
+  telegram_user_id bigint not null,
+  service_id uuid not null references service (id),
+  day date not null,
+  status text not null default 'waiting',
+  booking_id uuid references booking (id),
+  offer_expires_at timestamptz,
+  created_at timestamptz not null default now(),
+  updated_at timestamptz not null default now()
+);
+
+drop trigger if exists waitlist_set_updated_at on waitlist;
+create trigger waitlist_set_updated_at before update on waitlist
+  for each row execute function set_updated_at();
+
+create index if not exists waitlist_day_idx on waitlist (day, status, created_at);
+create index if not exists waitlist_booking_idx on waitlist (booking_id);
+-- one open entry per user, service and day; a 23505 here means "already waiting"
+create unique index if not exists waitlist_open_uq on waitlist (user_id, service_id, day)
+  where status in ('waiting', 'offered');
@@ -0,0 +1,7 @@
+-- Bookings record the resource (desk, staff member) that serves them; resources are
+-- configured in the schedule rules (app/schedule.py, SCHEDULE_RULES). Rows without a
+-- resource_id, or with one no longer configured, are placed on any resource that handles
+-- their service when availability is computed, so existing rows need no backfill.
+alter table booking add column if not exists resource_id text;
+
+create index if not exists booking_resource_start_idx on booking (resource_id, start_at);